@@ -2,21 +2,37 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 import ctypes
+import atexit
 import logging
+import logging.handlers
+import queue
+import threading
+import multiprocessing
 import utils
-from monitor import MonitorThread
+import metrics
+from pdf_export import PDF_PRESETS
+from thumbnails import export_contact_sheet
+from manager import MonitorManager
+from capture_process import ProcessMonitorManager
+from sources import WindowSource, DisplaySource
 from config import load_settings, save_settings
 
 # --- 配置日志 ---
 log_file = 'PPTSlicer.log'
-# 每次启动前清空旧日志，保持清爽
-if os.path.exists(log_file): 
-    try:
-        os.remove(log_file)
-    except Exception:
-        pass # 如果文件被占用则跳过
+metrics_file = 'pptslicer_metrics'  # 导出为 pptslicer_metrics.json / pptslicer_metrics.prom
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', handlers=[logging.FileHandler(log_file, encoding='utf-8')])
+def setup_logging():
+    """
+    日志按大小轮转（保留最近 3 份）而不是每次启动时清空；
+    各线程只把记录放进队列，由单独的监听线程写文件，磁盘慢时不会阻塞监控线程。
+    """
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=2 * 1024 * 1024, backupCount=3, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
 
 try:
     ctypes.windll.shcore.SetProcessDpiAwareness(2)
@@ -38,7 +54,8 @@ class MainApplication(tk.Tk):
         # ---------------------------------------------------
 
         self.window_handles = {}
-        self.monitor_thread = None
+        self.monitor_manager = None
+        self.metrics_exporter = None
         self.saved_count = 0
         self.hotkey = "ctrl"
 
@@ -52,6 +69,8 @@ class MainApplication(tk.Tk):
 
         self._create_widgets(main_frame)
         self._apply_settings()
+        if self.settings.get("metrics", False):
+            self._start_metrics()
         
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
 
@@ -87,6 +106,11 @@ class MainApplication(tk.Tk):
         self.threshold_scale.grid(row=0, column=0, sticky="ew")
         self.threshold_label = ttk.Label(thresh_frame, text="", width=6)
         self.threshold_label.grid(row=0, column=1, sticky="e", padx=(10, 0))
+        # 自动阈值：按画面噪声自动校准，取消勾选后滑块的手动值生效
+        self.auto_threshold_var = tk.BooleanVar()
+        self.auto_threshold_check = ttk.Checkbutton(thresh_frame, text="自动", variable=self.auto_threshold_var,
+                                                    command=self._toggle_auto_threshold_ui)
+        self.auto_threshold_check.grid(row=0, column=2, sticky="e", padx=(10, 0))
         
         # 4. 超时 & 自动模式
         ttk.Label(parent_frame, text="快捷键超时(秒):").grid(row=3, column=0, sticky="w", pady=8)
@@ -122,27 +146,51 @@ class MainApplication(tk.Tk):
         status_bar = ttk.Label(self, textvariable=self.status_var, relief="sunken", anchor="w", padding=8)
         status_bar.pack(side="bottom", fill="x")
 
+    def _start_metrics(self):
+        """启用各阶段计时：定期导出指标文件，并在状态栏下方显示各阶段平均耗时"""
+        metrics.registry.enabled = True
+        self.metrics_exporter = metrics.MetricsExporter(metrics.registry, metrics_file)
+        self.metrics_exporter.start()
+        self.metrics_var = tk.StringVar(value="性能：暂无数据")
+        ttk.Label(self, textvariable=self.metrics_var, anchor="w", padding=(8, 2)).pack(side="bottom", fill="x")
+        self._update_metrics_line()
+
+    def _update_metrics_line(self):
+        self.metrics_var.set("性能：" + metrics.registry.summary_line())
+        self.after(2000, self._update_metrics_line)
+
     def _toggle_auto_mode_ui(self):
         """当勾选全自动模式时，禁用超时设置"""
         is_auto = self.auto_mode_var.get()
         state = "disabled" if is_auto else "normal"
         self.timeout_spinbox.config(state=state)
 
+    def _toggle_auto_threshold_ui(self):
+        """自动阈值时滑块不起作用，禁用它"""
+        self.threshold_scale.config(state="disabled" if self.auto_threshold_var.get() else "normal")
+
     def _apply_settings(self):
         self.path_var.set(self.settings.get("save_path", ""))
         self.threshold_var.set(self.settings.get("threshold", 5.0))
         self.timeout_var.set(self.settings.get("hotkey_timeout", 5))
         self.auto_mode_var.set(self.settings.get("auto_mode", False)) 
+        self.auto_threshold_var.set(self.settings.get("auto_threshold", False))
         self._update_threshold_label(self.threshold_var.get())
         self._toggle_auto_mode_ui() 
+        self._toggle_auto_threshold_ui()
 
     def _collect_settings(self):
-        return {
+        # 在原有配置上更新界面可调的项，保留只能在 settings.json 中修改的高级配置
+        settings = dict(self.settings)
+        settings.update({
             "save_path": self.path_var.get(),
             "threshold": self.threshold_var.get(),
+            "auto_threshold": self.auto_threshold_var.get(),
             "hotkey_timeout": self.timeout_var.get(),
-            "auto_mode": self.auto_mode_var.get() 
-        }
+            "auto_mode": self.auto_mode_var.get(),
+            "pdf_preset": self.pdf_preset_var.get()
+        })
+        return settings
 
     def _start_monitoring(self):
         selected_title = self.window_combo.get()
@@ -155,26 +203,90 @@ class MainApplication(tk.Tk):
             return
 
         self.saved_count = 0
+        options = dict(
+            dedup_mode=self.settings.get("dedup_mode", "off"),
+            build_mode=self.settings.get("build_mode", "off"),
+            recall_hotkey=self.settings.get("recall_hotkey", "f8"),
+            history_mb=self.settings.get("history_mb", 0),
+            image_format=self.settings.get("image_format", "png"),
+            image_quality=self.settings.get("image_quality"),
+            max_poll_interval=self.settings.get("max_poll_interval", 1.0),
+            stable_threshold=self.settings.get("stable_threshold", 0.5),
+            required_stable_count=self.settings.get("required_stable_count", 2),
+            auto_mask=self.settings.get("auto_mask", True),
+            slide_region=self.settings.get("slide_region", "off"),
+            auto_threshold=self.auto_threshold_var.get(),
+            live_pdf=self.settings.get("live_pdf", False),
+            thumbnail_mb=self.settings.get("thumbnail_mb", 0),
+            pdf_preset=self.pdf_preset_var.get()
+        )
         try:
             hwnd = self.window_handles[selected_title]
-            self.monitor_thread = MonitorThread(
+            manager_class = ProcessMonitorManager if self.settings.get("capture_process", False) else MonitorManager
+            self.monitor_manager = manager_class()
+            self.monitor_manager.add(
                 hwnd, save_path, 
                 self.threshold_var.get(), 
                 self.hotkey, 
                 self.timeout_var.get(),
                 self.auto_mode_var.get(), 
-                self.update_status, 
-                self.increment_saved_count
+                self.post_status, 
+                self.post_saved,
+                ignore_regions=self.settings.get("ignore_regions", []),
+                **options
             )
-            self.monitor_thread.start()
+            for spec in self.settings.get("extra_sources", []):
+                self._add_extra_source(spec, options)
+            self.monitor_manager.start()
             self._set_ui_state(monitoring=True)
         except Exception as e:
+            if self.monitor_manager:
+                self.monitor_manager.stop()
             logging.error(f"启动失败: {e}", exc_info=True)
             messagebox.showerror("错误", f"无法启动监控: {e}")
 
+    def _add_extra_source(self, spec, options):
+        """
+        添加 settings.json 中 extra_sources 配置的附加来源，例如:
+        {"window": "Zoom", "save_path": "D:/会议", "threshold": 3.0, "hotkey": "ctrl+2"} 或 {"display": 2}。
+        未指定的项沿用界面上的设置；ignore_regions 按来源单独指定；指定了 threshold 的来源使用手动阈值。
+        """
+        if "display" in spec:
+            displays = list(utils.get_displays().items())
+            index = int(spec["display"]) - 1
+            if not 0 <= index < len(displays):
+                raise ValueError(f"找不到显示器 {spec['display']}")
+            name, rect = displays[index]
+            source = DisplaySource(rect, name)
+        else:
+            keyword = spec.get("window", "")
+            matches = [hwnd for title, hwnd in self.window_handles.items() if keyword and keyword in title]
+            if not matches:
+                matches = [hwnd for title, hwnd in utils.get_visible_windows().items() if keyword and keyword in title]
+            if not matches:
+                raise ValueError(f"找不到附加窗口: {keyword}")
+            name, source = keyword, WindowSource(matches[0])
+
+        save_path = spec.get("save_path") or self.path_var.get()
+        os.makedirs(save_path, exist_ok=True)
+        self.monitor_manager.add(
+            source, save_path,
+            spec.get("threshold", self.threshold_var.get()),
+            spec.get("hotkey", self.hotkey),
+            spec.get("hotkey_timeout", self.timeout_var.get()),
+            spec.get("auto_mode", self.auto_mode_var.get()),
+            lambda message: self.post_status(f"[{name}] {message}"),
+            self.post_saved,
+            label=name,
+            ignore_regions=spec.get("ignore_regions", []),
+            # 回溯快捷键只在附加来源单独指定时注册，避免按一次同时补存所有来源
+            **dict(options, auto_threshold=options["auto_threshold"] and "threshold" not in spec,
+                   recall_hotkey=spec.get("recall_hotkey"))
+        )
+
     def _stop_monitoring(self):
-        if self.monitor_thread and self.monitor_thread.is_alive():
-            self.monitor_thread.stop()
+        if self.monitor_manager and self.monitor_manager.is_alive():
+            self.monitor_manager.stop()
         self._set_ui_state(monitoring=False)
 
     def _set_ui_state(self, monitoring: bool):
@@ -182,8 +294,11 @@ class MainApplication(tk.Tk):
         self.start_button.config(state="disabled" if monitoring else "normal")
         self.stop_button.config(state="normal" if monitoring else "disabled")
         
-        for widget in [self.refresh_button, self.browse_button, self.threshold_scale, self.auto_mode_check]:
+        for widget in [self.refresh_button, self.browse_button, self.threshold_scale, self.auto_mode_check,
+                       self.auto_threshold_check]:
             widget.config(state=state)
+        if not monitoring:
+            self._toggle_auto_threshold_ui()
             
         if not monitoring and not self.auto_mode_var.get():
              self.timeout_spinbox.config(state="normal")
@@ -200,6 +315,13 @@ class MainApplication(tk.Tk):
         file_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="文件", menu=file_menu)
         file_menu.add_command(label="导出图片为PDF...", command=self._export_to_pdf)
+        file_menu.add_command(label="导出概览图...", command=self._export_contact_sheet)
+        # PDF 质量预设（决定目标 DPI 与 JPEG 质量，从而控制 PDF 体积）
+        self.pdf_preset_var = tk.StringVar(value=self.settings.get("pdf_preset", "original"))
+        preset_menu = tk.Menu(file_menu, tearoff=0)
+        for key, (label, _, _) in PDF_PRESETS.items():
+            preset_menu.add_radiobutton(label=label, value=key, variable=self.pdf_preset_var)
+        file_menu.add_cascade(label="PDF 质量", menu=preset_menu)
         file_menu.add_separator()
         file_menu.add_command(label="退出", command=self._on_closing)
 
@@ -209,14 +331,66 @@ class MainApplication(tk.Tk):
         output_pdf = filedialog.asksaveasfilename(initialdir=image_folder, defaultextension=".pdf", filetypes=[("PDF", "*.pdf")])
         if not output_pdf: return
         self.update_status("正在导出PDF...")
-        self.update_idletasks()
-        try:
-            utils.export_images_to_pdf(image_folder, output_pdf)
-            messagebox.showinfo("成功", "PDF导出成功！")
-            self.update_status("导出成功。")
-        except Exception as e:
-            messagebox.showerror("失败", str(e))
-            self.update_status("导出失败。")
+        self.menu_bar.entryconfig("文件", state="disabled")
+        preset = self.pdf_preset_var.get()
+
+        # 在后台线程导出，进度和结果通过 after() 交回 Tk 主线程，界面不会卡住
+        def on_progress(done, total):
+            self.after(0, self.update_status, f"正在导出PDF... {done}/{total}")
+
+        def on_finished(error):
+            self.menu_bar.entryconfig("文件", state="normal")
+            if error is None:
+                messagebox.showinfo("成功", "PDF导出成功！")
+                self.update_status("导出成功。")
+            else:
+                messagebox.showerror("失败", str(error))
+                self.update_status("导出失败。")
+
+        def run():
+            error = None
+            try:
+                utils.export_images_to_pdf(image_folder, output_pdf, preset, on_progress)
+            except Exception as e:
+                logging.error(f"导出PDF失败: {e}")
+                error = e
+            self.after(0, on_finished, error)
+
+        threading.Thread(target=run, daemon=True, name="PdfExport").start()
+
+    def _export_contact_sheet(self):
+        """每页排列多张缩略图的概览图，缩略图取自截图目录的缓存，缺失的在进程池中补齐"""
+        image_folder = filedialog.askdirectory(initialdir=self.path_var.get())
+        if not image_folder: return
+        output = filedialog.asksaveasfilename(initialdir=image_folder, defaultextension=".pdf",
+                                              filetypes=[("PDF", "*.pdf"), ("JPEG", "*.jpg")])
+        if not output: return
+        self.update_status("正在导出概览图...")
+        self.menu_bar.entryconfig("文件", state="disabled")
+        max_mb = self.settings.get("thumbnail_mb", 64) or 64
+
+        def on_progress(done, total):
+            self.after(0, self.update_status, f"正在导出概览图... {done}/{total}")
+
+        def on_finished(error):
+            self.menu_bar.entryconfig("文件", state="normal")
+            if error is None:
+                messagebox.showinfo("成功", "概览图导出成功！")
+                self.update_status("导出成功。")
+            else:
+                messagebox.showerror("失败", str(error))
+                self.update_status("导出失败。")
+
+        def run():
+            error = None
+            try:
+                export_contact_sheet(image_folder, output, progress_callback=on_progress, max_mb=max_mb)
+            except Exception as e:
+                logging.error(f"导出概览图失败: {e}")
+                error = e
+            self.after(0, on_finished, error)
+
+        threading.Thread(target=run, daemon=True, name="ContactSheet").start()
 
     def _refresh_window_list(self):
         self.update_idletasks()
@@ -238,15 +412,21 @@ class MainApplication(tk.Tk):
         self.threshold_label.config(text=f"{float(value):.1f}%")
 
     def _on_closing(self):
-        if self.monitor_thread and self.monitor_thread.is_alive():
+        if self.monitor_manager and self.monitor_manager.is_alive():
             if messagebox.askokcancel("退出", "监控中，确定退出？"):
-                self.monitor_thread.stop()
-                self.monitor_thread.join(timeout=1)
-                save_settings(self._collect_settings())
-                self.destroy()
+                self.monitor_manager.stop()
+                # 留出时间让后台写入线程把队列中的截图写完
+                self.monitor_manager.join(timeout=5)
+                self._shutdown()
         else:
-            save_settings(self._collect_settings())
-            self.destroy()
+            self._shutdown()
+
+    def _shutdown(self):
+        if self.metrics_exporter:
+            # 退出前最后导出一次指标
+            self.metrics_exporter.stop()
+        save_settings(self._collect_settings())
+        self.destroy()
 
     def update_status(self, message):
         self.status_var.set(message)
@@ -255,6 +435,16 @@ class MainApplication(tk.Tk):
         self.saved_count += 1
         self.update_status(f"已保存 {self.saved_count} 张。")
 
+    # 监控回调在监控、写入或转发线程中调用，转到 Tk 主线程执行
+    def post_status(self, message):
+        self.after(0, self.update_status, message)
+
+    def post_saved(self):
+        self.after(0, self.increment_saved_count)
+
 if __name__ == "__main__":
+    # PDF 导出使用进程池，打包为 exe 后需要 freeze_support
+    multiprocessing.freeze_support()
+    setup_logging()
     app = MainApplication()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from monitor import MonitorThread
+from sources import FastClock, VideoFileSource
+
+# ---------------------------------------------------
+#  录像批量提取
+#  把一段录像按时间切成若干段，交给进程池并行检测（每段用 VideoFileSource 定位到起点，
+#  用与实时监控完全相同的 MonitorThread 检测翻页与等待静止），主进程再按时间顺序拼接结果，
+#  经同一套去重、写入、会话清单保存，输出与实时监控相同的截图文件夹。
+#
+#  段边界的处理：
+#  - 一段检测到自己的终点之后，只要还在等待静止就继续读下去（最多再读 max_settle_time 秒），
+#    跨越边界的翻页由开始它的那一段负责，不会丢失；
+#  - 一段最后一次轮询可能晚于终点，与下一段开头检测到的是同一次翻页，
+#    主进程把每段开头的幻灯片与上一张保存的幻灯片逐块比较，相同的丢弃，不会重复。
+# ---------------------------------------------------
+
+
+class _ChunkScanner(MonitorThread):
+    """在工作进程中检测录像的一段：只记录检测到的稳定画面，不保存"""
+    def __init__(self, source, end, threshold, ignore_regions, auto_mask, auto_threshold, scratch_path):
+        super().__init__(source, scratch_path, threshold,
+                         hotkey=None, hotkey_timeout=0, is_auto_mode=True,
+                         status_callback=lambda message: None, saved_callback=lambda: None,
+                         clock=FastClock(source.start), dedup_mode="off",
+                         ignore_regions=ignore_regions, auto_mask=auto_mask, auto_threshold=auto_threshold)
+        self.end = end
+        self.slides = []
+
+    def poll(self):
+        # 虚拟时钟从段起点开始计时，clock.now() 即录像中的位置
+        if self.settling is None and self.poller.last_poll >= self.end:
+            return None
+        return super().poll()
+
+    def _trigger_screenshot_process(self, stable_frame):
+        self.slides.append((self.clock.now(), self.trigger_score, stable_frame.bgr.copy()))
+
+
+def _scan_chunk(path, start, end, threshold, ignore_regions, auto_mask, auto_threshold, settle_margin):
+    """工作进程入口：返回 [(录像位置, 差异分数, BGR 图像), ...]"""
+    source = VideoFileSource(path, start=start, end=end + settle_margin)
+    with tempfile.TemporaryDirectory(prefix="pptslicer_chunk_") as scratch_path:
+        scanner = _ChunkScanner(source, end, threshold, ignore_regions, auto_mask, auto_threshold, scratch_path)
+        scanner.run()
+    return scanner.slides
+
+
+def plan_chunks(duration, workers, chunk_seconds=None):
+    """
+    把 [0, duration) 切成若干段，返回 [(start, end), ...]。
+    :param chunk_seconds: 每段时长，默认让每个进程分到约 4 段（段数多一些负载更均衡），且每段至少 60 秒。
+    """
+    if chunk_seconds is None:
+        chunk_seconds = max(60.0, duration / (workers * 4))
+    count = max(1, int(round(duration / chunk_seconds)))
+    bounds = [duration * i / count for i in range(count + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def extract_video(video_path, save_path, threshold=5.0, workers=None, chunk_seconds=None,
+                  status_callback=None, ignore_regions=None, auto_mask=True, auto_threshold=False, **options):
+    """
+    并行提取一段录像中的幻灯片，保存到 save_path（文件名、会话清单、去重与实时监控相同）。
+    :param workers: 进程数，默认 CPU 核数；为 1 时在当前进程中逐段处理。
+    :param chunk_seconds: 每段时长（秒），见 plan_chunks。
+    :param auto_threshold: 各段按画面噪声自动校准阈值（每段开头几秒使用 threshold）。
+    :param options: 传给保存端 MonitorSession 的其它参数，如 dedup_mode、build_mode、image_format、live_pdf。
+    :return: 保存的截图数量。
+    """
+    status_callback = status_callback or (lambda message: logging.info(message))
+    os.makedirs(save_path, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    probe = VideoFileSource(video_path)
+    duration = probe.frame_count / probe.fps
+    if duration <= 0:
+        probe.close()
+        raise ValueError(f"无法获取录像时长: {video_path}")
+    chunks = plan_chunks(duration, workers, chunk_seconds)
+
+    saved = []
+    # 保存端：一个不轮询的监控会话，只用它的去重、写入线程、会话清单和实时 PDF
+    sink = MonitorThread(probe, save_path, threshold,
+                         hotkey=None, hotkey_timeout=0, is_auto_mode=True,
+                         status_callback=status_callback, saved_callback=lambda: saved.append(1),
+                         ignore_regions=ignore_regions, auto_mask=False, **options)
+    # 批量提取不能丢图：写入跟不上时让拼接等待，而不是像实时监控那样超时丢弃
+    sink.writer.block_timeout = None
+    sink.begin()
+    probe.close()
+    settle_margin = sink.poller.max_settle_time + sink.poller.max_interval
+    args = [(video_path, start, end, threshold, ignore_regions, auto_mask, auto_threshold, settle_margin) for start, end in chunks]
+    logging.info(f"批量提取 {os.path.basename(video_path)}: 时长 {duration:.0f} 秒，分为 {len(chunks)} 段，{workers} 个进程。")
+
+    start_time = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(chunks) > 1 else None
+    try:
+        results = executor.map(_scan_chunk, *zip(*args)) if executor else (_scan_chunk(*a) for a in args)
+        last_kept = None
+        detected = 0
+        for index, slides in enumerate(results):
+            for position, score, image in slides:
+                detected += 1
+                frame = sink.detector.frame(image)
+                frame.detach()
+                # 段开头与上一段结尾检测到的是同一张幻灯片时丢弃
+                if last_kept is not None and last_kept.shape == frame.shape \
+                        and sink.detector.compare(last_kept, frame).changed_count == 0:
+                    frame.release()
+                    continue
+                if last_kept is not None:
+                    last_kept.release()
+                last_kept = frame
+                logging.info(f"[{position // 60:.0f}:{position % 60:04.1f}] 检测到幻灯片 (差异: {score:.2%})")
+                sink.submit_slide(image, score)
+            status_callback(f"状态：批量提取中 {index + 1}/{len(chunks)} 段，已保存 {len(saved)} 张...")
+        if last_kept is not None:
+            last_kept.release()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        sink.finish()
+
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"批量提取完成: 检测到 {detected} 次翻页，保存 {len(saved)} 张，耗时 {elapsed:.1f} 秒 "
+                 f"({duration / elapsed:.0f} 倍速)。")
+    return len(saved)
@@ -0,0 +1,109 @@
+"""
+缓冲池基准：用回放来源驱动 MonitorThread，对比启用/禁用缓冲池时的吞吐量与大数组分配量。
+
+    python benchmarks/bench_buffers.py                     # 内置合成幻灯片 (默认 3840x2160)
+    python benchmarks/bench_buffers.py lecture.mp4         # 回放录像
+    python benchmarks/bench_buffers.py frames/ --fps 2     # 回放帧图片文件夹
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor import MonitorThread
+from sources import FastClock, FrameSource, open_replay_source
+
+
+class SyntheticSlides(FrameSource):
+    """内存中的合成幻灯片：每 slide_seconds 秒换一页，排除解码开销，只测检测路径"""
+    is_live = False
+
+    def __init__(self, width, height, slides=20, slide_seconds=5.0):
+        self.slide_seconds = slide_seconds
+        self.pages = []
+        for i in range(slides):
+            page = np.full((height, width, 3), 245, np.uint8)
+            cv2.putText(page, f"Slide {i}", (width // 20, height // 6), cv2.FONT_HERSHEY_SIMPLEX,
+                        height / 250, (40, 40, 40), max(2, height // 200))
+            self.pages.append(page)
+        self._origin = None
+
+    def read(self, now, out=None):
+        if self._origin is None:
+            self._origin = now
+        index = int((now - self._origin) / self.slide_seconds)
+        if index >= len(self.pages):
+            return None
+        page = self.pages[index]
+        if out is not None and out.shape == page.shape:
+            np.copyto(out, page)
+            return out
+        return page.copy()
+
+
+class CountingSource(FrameSource):
+    """统计读取帧数的包装来源"""
+    def __init__(self, inner):
+        self.inner = inner
+        self.is_live = inner.is_live
+        self.frames = 0
+
+    def read(self, now, out=None):
+        frame = self.inner.read(now, out)
+        if frame is not None:
+            self.frames += 1
+        return frame
+
+    def close(self):
+        self.inner.close()
+
+
+def run_once(make_source, use_pool):
+    source = CountingSource(make_source())
+    with tempfile.TemporaryDirectory() as save_path:
+        monitor = MonitorThread(
+            source, save_path, threshold=0.1, hotkey=None, hotkey_timeout=0, is_auto_mode=True,
+            status_callback=lambda message: None, saved_callback=lambda: None,
+            clock=FastClock(), dedup_mode="off",
+        )
+        monitor.pool.enabled = use_pool
+        start = time.perf_counter()
+        monitor.run()
+        elapsed = time.perf_counter() - start
+    stats = monitor.pool.stats()
+    return {
+        "frames": source.frames,
+        "fps": source.frames / elapsed,
+        "alloc_mb_per_frame": stats["allocated_mb"] / max(1, source.frames),
+        "allocations": stats["allocated"],
+        "acquired": stats["acquired"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缓冲池吞吐量/分配基准")
+    parser.add_argument("recording", nargs="?", help="视频文件或帧图片文件夹；省略则使用合成幻灯片")
+    parser.add_argument("--fps", type=float, default=2.0, help="帧图片文件夹的帧率")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    args = parser.parse_args()
+
+    if args.recording:
+        make_source = lambda: open_replay_source(args.recording, fps=args.fps)
+    else:
+        make_source = lambda: SyntheticSlides(args.width, args.height)
+
+    for use_pool in (False, True):
+        r = run_once(make_source, use_pool)
+        label = "缓冲池" if use_pool else "无缓冲池"
+        print(f"{label}: {r['frames']} 帧, {r['fps']:.1f} 帧/秒, "
+              f"新分配 {r['allocations']}/{r['acquired']} 次, 平均每帧 {r['alloc_mb_per_frame']:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
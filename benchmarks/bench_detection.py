@@ -0,0 +1,182 @@
+"""
+检测引擎基准与准确率测试：在合成幻灯片上运行 MonitorThread（虚拟时钟，无需桌面环境），报告
+每帧 CPU 时间、从切换结束到保存的检测延迟、保存结果的精确率/召回率。
+
+    python benchmarks/bench_detection.py                       # 全部场景
+    python benchmarks/bench_detection.py --scenario fades builds
+    python benchmarks/bench_detection.py --json result.json --min-recall 0.9 --max-cpu-ms 15
+
+指定 --min-recall / --min-precision / --max-cpu-ms / --max-latency 时，任一场景不达标即以非零状态退出，
+可直接用于 CI 中拦截性能或准确率回退。默认参数（阈值 1.0%、--seed 0、--slides 12）下各场景的召回率、
+精确率另有回归下限 (RECALL_FLOORS / PRECISION_FLOORS)，noisy 的最大延迟另有上限 (LATENCY_CEILINGS)，
+不指定门限也会检查。
+
+已知局限：固定阈值下 build 动画每一步只新增一行要点，差异低于触发阈值，大多不会触发保存
+（builds 召回率约 0.25，mixed 约 0.45）；下限按实际达到的水平设定，只用于拦截回退。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor import MonitorThread
+from manifest import IMAGE_EXTENSIONS
+from builds import BUILD_MODES
+from sources import FastClock
+from synthetic_deck import SCENARIOS, SyntheticDeck, SyntheticDeckSource
+
+
+# 默认参数（固定阈值 1.0%）下各场景的回归下限/上限：无论是否指定门限都会检查，
+# 按 960x540 与 1920x1080 下实际达到的水平设定（留出一张幻灯片左右的余量），
+# 防止轮询/比较基准的改动让渐变式翻页（每一小步都低于阈值）再次漏检、噪声画面再次每页等到超时
+DEFAULT_THRESHOLD = 1.0
+RECALL_FLOORS = {"cuts": 1.0, "fades": 1.0, "wipes": 1.0, "video": 1.0, "cursor": 0.9, "noisy": 1.0,
+                 "builds": 0.22, "mixed": 0.42}
+PRECISION_FLOORS = {"cuts": 1.0, "fades": 1.0, "wipes": 1.0, "video": 1.0, "cursor": 1.0, "noisy": 1.0,
+                    "builds": 1.0, "mixed": 0.8}
+LATENCY_CEILINGS = {"noisy": 1.5}  # 最大检测延迟（秒），等待静止超时为 4 秒
+
+
+class RecordingMonitor(MonitorThread):
+    """记录每次触发保存时的虚拟时间与画面"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.triggers = []
+
+    def _trigger_screenshot_process(self, stable_frame):
+        self.triggers.append((self.clock.now() - self.clock_origin, stable_frame.bgr.copy()))
+        super()._trigger_screenshot_process(stable_frame)
+
+
+class TimedSource(SyntheticDeckSource):
+    """统计帧数与渲染本身消耗的 CPU 时间（从总 CPU 中扣除，只留下检测的开销）"""
+    def __init__(self, deck):
+        super().__init__(deck)
+        self.frames = 0
+        self.render_cpu = 0.0
+
+    def read(self, now, out=None):
+        start = time.thread_time()
+        frame = super().read(now, out)
+        self.render_cpu += time.thread_time() - start
+        if frame is not None:
+            self.frames += 1
+        return frame
+
+
+def evaluate(deck, triggers):
+    """把保存事件与真值匹配，返回 (命中数, 误保存数, 应保存数, 延迟列表)"""
+    # 监控开始时的画面不会被保存，第一段不计入召回
+    expected = deck.segments[1:]
+    matched = set()
+    true_positive, false_positive, latencies = 0, 0, []
+    for t, image in triggers:
+        seg = deck.segment_at(t)
+        if seg.index > 0 and seg.index not in matched and deck.matches(image, seg):
+            matched.add(seg.index)
+            true_positive += 1
+            latencies.append(max(0.0, t - seg.visible))
+        else:
+            false_positive += 1
+    return true_positive, false_positive, len(expected), latencies
+
+
+def run_scenario(name, width, height, slides, threshold, seed, auto_threshold=False, build_mode="off"):
+    deck = SyntheticDeck(width, height, slides, seed=seed, **SCENARIOS[name])
+    source = TimedSource(deck)
+    clock = FastClock()
+    with tempfile.TemporaryDirectory() as save_path:
+        monitor = RecordingMonitor(
+            source, save_path, threshold, hotkey=None, hotkey_timeout=0, is_auto_mode=True,
+            status_callback=lambda message: None, saved_callback=lambda: None,
+            clock=clock, dedup_mode="off", auto_threshold=auto_threshold, build_mode=build_mode,
+        )
+        monitor.clock_origin = source._origin
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        monitor.run()
+        cpu = time.process_time() - cpu_start - source.render_cpu
+        wall = time.perf_counter() - wall_start
+        # 合并 build 动画后写到磁盘上的截图数少于保存事件数
+        files = sum(1 for f in os.listdir(save_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+    tp, fp, expected, latencies = evaluate(deck, monitor.triggers)
+    return {
+        "scenario": name,
+        "frames": source.frames,
+        "cpu_ms_per_frame": 1000 * cpu / max(1, source.frames),
+        "wall_seconds": wall,
+        "saved": len(monitor.triggers),
+        "files": files,
+        "expected": expected,
+        "precision": tp / (tp + fp) if tp + fp else 1.0,
+        "recall": tp / expected if expected else 1.0,
+        "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+        "latency_max": max(latencies) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测引擎基准与准确率测试")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--slides", type=int, default=12)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="检测灵敏度 (百分比)")
+    parser.add_argument("--auto-threshold", action="store_true", help="自动校准阈值（--threshold 只用于热身期间）")
+    parser.add_argument("--build-mode", choices=BUILD_MODES, default="off", help="build 动画的处理方式")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--min-recall", type=float)
+    parser.add_argument("--min-precision", type=float)
+    parser.add_argument("--max-cpu-ms", type=float)
+    parser.add_argument("--max-latency", type=float)
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'场景':<8}{'帧数':>6}{'CPU ms/帧':>11}{'保存/应保存':>12}{'精确率':>8}{'召回率':>8}{'平均延迟':>9}{'最大延迟':>9}{'文件数':>7}")
+    for name in args.scenario:
+        r = run_scenario(name, args.width, args.height, args.slides, args.threshold, args.seed, args.auto_threshold, args.build_mode)
+        results.append(r)
+        mean = f"{r['latency_mean']:.2f}s" if r["latency_mean"] is not None else "-"
+        worst = f"{r['latency_max']:.2f}s" if r["latency_max"] is not None else "-"
+        print(f"{name:<10}{r['frames']:>6}{r['cpu_ms_per_frame']:>11.2f}{r['saved']:>8}/{r['expected']:<5}"
+              f"{r['precision']:>8.2f}{r['recall']:>8.2f}{mean:>9}{worst:>9}{r['files']:>8}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    failures = []
+    default_run = (args.threshold == DEFAULT_THRESHOLD and not args.auto_threshold and args.build_mode == "off"
+                   and args.seed == 0 and args.slides == 12)
+    for r in results:
+        if default_run:
+            floor = RECALL_FLOORS.get(r["scenario"])
+            if floor is not None and r["recall"] < floor:
+                failures.append(f"{r['scenario']}: 召回率 {r['recall']:.2f} 低于回归下限 {floor}")
+            floor = PRECISION_FLOORS.get(r["scenario"])
+            if floor is not None and r["precision"] < floor:
+                failures.append(f"{r['scenario']}: 精确率 {r['precision']:.2f} 低于回归下限 {floor}")
+            ceiling = LATENCY_CEILINGS.get(r["scenario"])
+            if ceiling is not None and r["latency_max"] is not None and r["latency_max"] > ceiling:
+                failures.append(f"{r['scenario']}: 最大延迟 {r['latency_max']:.2f}s 超过回归上限 {ceiling}s")
+        if args.min_recall is not None and r["recall"] < args.min_recall:
+            failures.append(f"{r['scenario']}: 召回率 {r['recall']:.2f} < {args.min_recall}")
+        if args.min_precision is not None and r["precision"] < args.min_precision:
+            failures.append(f"{r['scenario']}: 精确率 {r['precision']:.2f} < {args.min_precision}")
+        if args.max_cpu_ms is not None and r["cpu_ms_per_frame"] > args.max_cpu_ms:
+            failures.append(f"{r['scenario']}: CPU {r['cpu_ms_per_frame']:.2f} ms/帧 > {args.max_cpu_ms}")
+        if args.max_latency is not None and r["latency_max"] is not None and r["latency_max"] > args.max_latency:
+            failures.append(f"{r['scenario']}: 最大延迟 {r['latency_max']:.2f}s > {args.max_latency}")
+    for failure in failures:
+        print(f"[-] {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
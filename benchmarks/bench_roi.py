@@ -0,0 +1,130 @@
+"""
+幻灯片区域检测基准与回归检查：合成几种常见画面，检查 detect_slide_region 找到的区域并测量耗时。
+
+- 应找到幻灯片：上下/左右黑边、演讲者视图、浅色软件界面中的幻灯片；
+- 应返回 None：全屏幻灯片中带边框的图表、4:3 照片（曾被误认为幻灯片，截图只剩图表）。
+
+    python benchmarks/bench_roi.py
+    python benchmarks/bench_roi.py --width 1280 --height 720
+
+任一画面的结果不符合预期时以非零状态退出。
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roi import detect_slide_region
+from synthetic_deck import SyntheticDeck
+
+
+def _framed(slide, inner, x, y):
+    """把 inner 加一圈深色边框贴到幻灯片的 (x, y) 处"""
+    image = slide.copy()
+    h, w = inner.shape[:2]
+    image[y:y + h, x:x + w] = inner
+    border = max(2, slide.shape[0] // 360)
+    cv2.rectangle(image, (x - border, y - border), (x + w + border - 1, y + h + border - 1), (60, 60, 60), border)
+    return image
+
+
+def _chart(width, height):
+    chart = np.full((height, width, 3), 255, np.uint8)
+    for i in range(8):
+        x = width // 30 + i * width // 9
+        cv2.rectangle(chart, (x, height * 9 // 10 - (i + 2) * height // 14), (x + width // 14, height * 9 // 10),
+                      (200, 120, 40), -1)
+    cv2.line(chart, (width // 40, height * 9 // 10), (width - width // 60, height * 9 // 10), (0, 0, 0), 2)
+    return chart
+
+
+def _photo(width, height):
+    rng = np.random.default_rng(1)
+    coarse = rng.integers(0, 255, (12, 16, 3)).astype(np.uint8)
+    return cv2.GaussianBlur(cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC), (0, 0), 5)
+
+
+def make_cases(width, height):
+    """返回 {名称: (画面, 应检测到的区域或 None)}"""
+    deck = SyntheticDeck(width, height, slides=2, seed=0)
+    slide, other = deck.segments[1].image, deck.segments[0].image
+    sx, sy = width / 1920, height / 1080
+
+    def px(x, y):
+        return int(x * sx), int(y * sy)
+
+    cases = {}
+    # 全屏幻灯片中带边框的 16:9 图表与 4:3 照片：整个画面就是幻灯片
+    fw, fh = px(1200, 675)
+    cases["图表"] = (_framed(slide, _chart(fw, fh), *px(360, 250)), None)
+    pw, ph = px(1133, 850)
+    cases["照片"] = (_framed(slide, _photo(pw, ph), *px(400, 150)), None)
+    # 灰色背景的幻灯片中的白底图表：外面比图表暗，但有标题和正文
+    gray_slide = slide.copy()
+    gray_slide[gray_slide[..., 0] >= 240] = (200, 200, 200)
+    cases["灰底图表"] = (_framed(gray_slide, _chart(fw, fh), *px(360, 250)), None)
+
+    # 4:3 幻灯片全屏放映在 16:9 屏幕上：左右黑边
+    frame = np.zeros((height, width, 3), np.uint8)
+    w43 = height * 4 // 3
+    frame[:, (width - w43) // 2:(width - w43) // 2 + w43] = cv2.resize(slide, (w43, height))
+    cases["黑边"] = (frame, ((width - w43) // 2, 0, w43, height))
+
+    # 演讲者视图：深色界面，左侧当前幻灯片，右侧下一张，下方备注
+    frame = np.full((height, width, 3), 45, np.uint8)
+    (x, y), (w, h) = px(40, 80), px(1280, 720)
+    frame[y:y + h, x:x + w] = cv2.resize(slide, (w, h))
+    (nx, ny), (nw, nh) = px(1380, 80), px(500, 281)
+    frame[ny:ny + nh, nx:nx + nw] = cv2.resize(other, (nw, nh))
+    for i in range(6):
+        cv2.putText(frame, f"Speaker notes line {i} about the slide", px(60, 860 + i * 35),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9 * sy, (230, 230, 230), max(1, int(2 * sy)))
+    cases["演讲者视图"] = (frame, (x, y, w, h))
+
+    # 浅色软件界面：顶部工具栏，中间幻灯片
+    frame = np.full((height, width, 3), 205, np.uint8)
+    frame[:px(0, 60)[1]] = 180
+    for i in range(10):
+        cv2.rectangle(frame, px(20 + i * 60, 15), px(50 + i * 60, 45), (120, 120, 120), -1)
+    (x, y), (w, h) = px(120, 120), px(1680, 945)
+    frame[y:y + h, x:x + w] = cv2.resize(slide, (w, h))
+    cases["浅色界面"] = (frame, (x, y, w, h))
+    return cases
+
+
+def _matches(found, expected, tolerance):
+    if found is None or expected is None:
+        return found is None and expected is None
+    return max(abs(a - b) for a, b in zip(found, expected)) <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description="幻灯片区域检测基准与回归检查")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeat", type=int, default=5, help="每个画面重复检测的次数（取平均耗时）")
+    args = parser.parse_args()
+
+    tolerance = max(4, args.width // 240)
+    failures = 0
+    print(f"{'画面':<8}{'期望':>26}{'检测结果':>26}{'耗时 ms':>10}")
+    for name, (frame, expected) in make_cases(args.width, args.height).items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            found = detect_slide_region(frame)
+        elapsed = (time.perf_counter() - start) / args.repeat * 1000
+        ok = _matches(found, expected, tolerance)
+        failures += not ok
+        print(f"{name:<8}{str(expected):>26}{str(found):>26}{elapsed:10.1f}" + ("" if ok else "  <- 不符合"))
+    if failures:
+        print(f"[-] {failures} 个画面的检测结果不符合预期。")
+        sys.exit(1)
+    print("[+] 全部符合预期。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+启动耗时基准：在全新的解释器中用 -X importtime 导入各模块，报告每个模块的累计导入耗时，
+以及 pptslicer 命令行各入口（--help、replay --help 等）从启动到退出的总时间。
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --json startup.json --max-cli-ms 150
+
+--max-cli-ms 限制 `pptslicer --help` 的启动时间，超出即以非零状态退出，用于在 CI 中拦截
+命令行入口又被顶层导入拖慢的回退。无法导入的模块（如非 Windows 上的 app_ui）会标为不可用。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 项目模块，以及值得单独关注的重型依赖
+MODULES = ("pptslicer", "config", "metrics", "manifest", "pdf_export", "utils", "detection", "dedup", "builds",
+           "sources", "writer", "effects", "history", "calibration", "roi", "monitor", "manager", "capture_process",
+           "replay", "sweep", "thumbnails", "app_ui",
+           "numpy", "cv2", "PIL.Image", "keyboard", "plyer")
+
+# 命令行入口：名称 -> 参数
+CLI_COMMANDS = (
+    ("pptslicer --help", ["--help"]),
+    ("pptslicer export --help", ["export", "--help"]),
+    ("pptslicer replay --help", ["replay", "--help"]),
+)
+
+
+def import_time(module):
+    """
+    在新进程中导入 module，返回 (累计导入耗时毫秒, 其中耗时最多的 5 个子模块)；导入失败返回 None。
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    # 每行格式: "import time:  self [us] | cumulative | imported package"
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((name.rstrip(), int(cumulative)))
+    total = next((us for name, us in reversed(entries) if name.strip() == module), None)
+    if total is None:
+        return None
+    # 只统计 module 直接导入的依赖（缩进比 module 多一级），避免把子模块的耗时重复计算
+    top = [(name.strip(), us) for name, us in entries if len(name) - len(name.lstrip()) == 3]
+    top.sort(key=lambda e: -e[1])
+    return total / 1000, [(name, us / 1000) for name, us in top[:5] if name != module]
+
+
+def run_time(args):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "pptslicer"] + args, cwd=ROOT, capture_output=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    return elapsed if result.returncode == 0 else None
+
+
+def interpreter_time():
+    """空解释器的启动时间，作为命令行耗时的参照"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], cwd=ROOT, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def best_of(repeat, measure):
+    """取多次测量的最小值（排除磁盘缓存、调度等带来的偶然抖动）"""
+    results = [measure() for _ in range(repeat)]
+    valid = [r for r in results if r is not None]
+    if not valid:
+        return None
+    return min(valid, key=lambda r: r[0] if isinstance(r, tuple) else r)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量次数，取最小值")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--max-cli-ms", type=float, help="pptslicer --help 的启动时间上限 (毫秒)")
+    args = parser.parse_args()
+
+    baseline = best_of(args.repeat, interpreter_time)
+    print(f"{'模块':<20} {'累计导入(ms)':>12}  主要依赖")
+    modules = {}
+    for module in args.modules:
+        measured = best_of(args.repeat, lambda: import_time(module))
+        if measured is None:
+            print(f"{module:<20} {'不可用':>12}")
+            modules[module] = None
+            continue
+        total, heaviest = measured
+        modules[module] = {"ms": round(total, 1), "heaviest": [[n, round(ms, 1)] for n, ms in heaviest]}
+        print(f"{module:<20} {total:>12.1f}  " + ", ".join(f"{n} {ms:.0f}" for n, ms in heaviest[:3]))
+
+    print(f"\n{'命令':<28} {'总耗时(ms)':>10}  (空解释器 {baseline:.0f} ms)")
+    commands = {}
+    for name, cli_args in CLI_COMMANDS:
+        elapsed = best_of(args.repeat, lambda: run_time(cli_args))
+        commands[name] = None if elapsed is None else round(elapsed, 1)
+        print(f"{name:<28} {'失败' if elapsed is None else f'{elapsed:.1f}':>10}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"python_ms": round(baseline, 1), "modules": modules, "commands": commands},
+                      f, indent=2, ensure_ascii=False)
+
+    help_ms = commands[CLI_COMMANDS[0][0]]
+    if args.max_cli_ms is not None and (help_ms is None or help_ms > args.max_cli_ms):
+        print(f"[-] pptslicer --help 启动耗时超出上限 {args.max_cli_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
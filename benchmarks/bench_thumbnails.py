@@ -0,0 +1,83 @@
+"""
+缩略图缓存与概览图基准：在临时文件夹中生成一批合成截图，分别测量
+冷缓存生成缩略图、热缓存检查、导出概览图的耗时。
+
+    python benchmarks/bench_thumbnails.py                        # 500 张 1920x1080 PNG
+    python benchmarks/bench_thumbnails.py --slides 200 --workers 4
+    python benchmarks/bench_thumbnails.py out/                   # 使用已有的截图文件夹（会在其中建立缓存）
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thumbnails import ThumbnailCache, THUMBNAIL_DIRNAME, export_contact_sheet
+from pdf_export import folder_images
+
+
+def make_slides(folder, count, width, height):
+    """写入 count 张内容各不相同的合成截图"""
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        page = np.full((height, width, 3), 245, np.uint8)
+        cv2.putText(page, f"Slide {i}", (width // 20, height // 6), cv2.FONT_HERSHEY_SIMPLEX,
+                    height / 250, (40, 40, 40), max(2, height // 200))
+        for _ in range(4):
+            x, y = int(rng.integers(0, width * 3 // 4)), int(rng.integers(height // 4, height * 3 // 4))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.rectangle(page, (x, y), (x + width // 5, y + height // 8), color, -1)
+        cv2.imwrite(os.path.join(folder, f"screenshot_{i:04d}.png"), page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缩略图缓存与概览图基准")
+    parser.add_argument("folder", nargs="?", help="截图文件夹；省略则生成合成截图")
+    parser.add_argument("--slides", type=int, default=500)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--workers", type=int, help="进程数，默认 CPU 核数")
+    args = parser.parse_args()
+
+    temp = None
+    folder = args.folder
+    if folder is None:
+        temp = folder = tempfile.mkdtemp(prefix="pptslicer_thumbs_")
+        start = time.perf_counter()
+        make_slides(folder, args.slides, args.width, args.height)
+        print(f"生成 {args.slides} 张 {args.width}x{args.height} 合成截图: {time.perf_counter() - start:.1f} 秒")
+    try:
+        shutil.rmtree(os.path.join(folder, THUMBNAIL_DIRNAME), ignore_errors=True)
+        files = [os.path.relpath(path, folder) for path in folder_images(folder)]
+
+        start = time.perf_counter()
+        cache = ThumbnailCache(folder, max_mb=1024)
+        cache.build(files, args.workers)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ThumbnailCache(folder, max_mb=1024).build(files, args.workers)
+        warm = time.perf_counter() - start
+
+        output = os.path.join(tempfile.gettempdir(), "pptslicer_bench_sheet.pdf")
+        start = time.perf_counter()
+        pages = export_contact_sheet(folder, output, workers=args.workers, max_mb=1024)
+        sheet = time.perf_counter() - start
+        os.remove(output)
+
+        print(f"{len(files)} 张截图, 缓存 {cache.total_bytes / 1e6:.1f} MB")
+        print(f"冷缓存生成缩略图: {cold:6.2f} 秒 ({cold / max(1, len(files)) * 1000:.1f} 毫秒/张)")
+        print(f"热缓存检查:       {warm:6.2f} 秒")
+        print(f"概览图 ({pages} 页):   {sheet:6.2f} 秒")
+    finally:
+        if temp is not None:
+            shutil.rmtree(temp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+合成幻灯片生成器：按时间渲染带有切换效果的幻灯片画面，并给出真值（每张幻灯片何时完全出现）。
+
+支持的干扰：淡入淡出、擦除、逐条出现（build 动画）、嵌入视频区域、鼠标指针抖动、采集噪声。
+既可以作为 FrameSource 直接驱动 MonitorThread，也可以导出为帧图片文件夹 + ground_truth.json：
+
+    python benchmarks/synthetic_deck.py out_frames/ --scenario mixed --fps 10
+"""
+import os
+import sys
+import json
+import bisect
+import argparse
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sources import FrameSource
+
+WORDS = ("algorithm data model network layer signal memory cache thread process kernel vector "
+         "matrix gradient sample channel filter energy protocol packet latency throughput").split()
+
+# 场景名 -> SyntheticDeck 参数
+SCENARIOS = {
+    "cuts": dict(transition="cut"),
+    "fades": dict(transition="fade"),
+    "wipes": dict(transition="wipe"),
+    "builds": dict(transition="build"),
+    "video": dict(transition="cut", video=True),
+    "cursor": dict(transition="cut", cursor=True),
+    "noisy": dict(transition="cut", noise=16.0),
+    "mixed": dict(transition="mixed", video=True, cursor=True),
+}
+
+
+class Segment:
+    """
+    真值中的一段稳定画面。
+    start: 切换开始时间；visible: 切换结束、画面完全出现的时间；end: 下一次切换开始的时间。
+    ignore: 比对内容时忽略的区域 (x, y, w, h)，例如嵌入视频。
+    """
+    def __init__(self, index, start, visible, end, image, transition, ignore=None):
+        self.index = index
+        self.start = start
+        self.visible = visible
+        self.end = end
+        self.image = image
+        self.transition = transition
+        self.ignore = ignore
+
+    def to_dict(self):
+        return {"index": self.index, "start": self.start, "visible": self.visible, "end": self.end,
+                "transition": self.transition, "ignore": self.ignore}
+
+
+class SyntheticDeck:
+    """
+    :param slides: 幻灯片张数（build 动画的每一步单独算一段真值）。
+    :param hold: 每张幻灯片完全出现后的停留时间（秒）。
+    :param transition: "cut" / "fade" / "wipe" / "build" / "mixed"。
+    :param transition_time: 淡入淡出/擦除的时长（秒）。
+    :param video: 是否在每张幻灯片右下角嵌入持续运动的视频区域。
+    :param cursor: 是否叠加抖动的鼠标指针。
+    :param noise: 每帧独立的高斯噪声标准差（灰度级），模拟采集卡/摄像头拍摄投影；0 为无噪声。
+    """
+    def __init__(self, width=1920, height=1080, slides=12, hold=6.0, transition="cut",
+                 transition_time=0.8, video=False, cursor=False, noise=0.0, seed=0):
+        self.width = width
+        self.height = height
+        self.video = video
+        self.cursor = cursor
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.video_rect = (width * 5 // 8, height * 5 // 8, width // 3, height // 3) if video else None
+
+        kinds = ["cut", "fade", "wipe", "build"]
+        self.segments = []
+        t = 0.0
+        for i in range(slides):
+            kind = kinds[i % len(kinds)] if transition == "mixed" else transition
+            if i == 0:
+                kind = "cut"
+            bullets = [" ".join(self.rng.choice(WORDS, 4)) for _ in range(int(self.rng.integers(3, 6)))]
+            if kind == "build":
+                # 逐条出现：每出现一条就是一段新的稳定画面，每步快速淡入
+                for step in range(1, len(bullets) + 1):
+                    image = self._render_slide(i, bullets[:step])
+                    t = self._append(image, "build" if step > 1 else "fade", t, 0.3, hold / 2)
+            else:
+                duration = 0.0 if kind == "cut" else transition_time
+                t = self._append(self._render_slide(i, bullets), kind, t, duration, hold)
+        self.duration = t
+        self._starts = [s.start for s in self.segments]
+
+    def _append(self, image, kind, t, duration, hold):
+        segment = Segment(len(self.segments), t, t + duration, t + duration + hold, image, kind, self.video_rect)
+        self.segments.append(segment)
+        return segment.end
+
+    def _render_slide(self, index, bullets):
+        w, h = self.width, self.height
+        img = np.full((h, w, 3), 248, np.uint8)
+        hue = (index * 37) % 180
+        color = cv2.cvtColor(np.uint8([[[hue, 160, 140]]]), cv2.COLOR_HSV2BGR)[0, 0].tolist()
+        cv2.rectangle(img, (0, 0), (w, h // 8), color, -1)
+        scale = h / 1080
+        cv2.putText(img, f"{index + 1}. {bullets[0].split()[0].title()} Overview", (int(60 * scale), int(95 * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 2.2 * scale, (255, 255, 255), max(1, int(4 * scale)))
+        for k, text in enumerate(bullets):
+            y = int((250 + 95 * k) * scale)
+            cv2.circle(img, (int(90 * scale), y - int(12 * scale)), max(2, int(8 * scale)), (60, 60, 60), -1)
+            cv2.putText(img, text, (int(120 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, 1.4 * scale, (30, 30, 30),
+                        max(1, int(3 * scale)))
+        return img
+
+    def segment_at(self, t):
+        i = bisect.bisect_right(self._starts, t) - 1
+        return self.segments[max(0, i)]
+
+    def render(self, t, out=None):
+        """渲染 t 时刻的画面；超出总时长返回 None"""
+        if t >= self.duration:
+            return None
+        if out is None or out.shape != (self.height, self.width, 3):
+            out = np.empty((self.height, self.width, 3), np.uint8)
+        seg = self.segment_at(t)
+        previous = self.segments[seg.index - 1].image if seg.index > 0 else seg.image
+
+        if t >= seg.visible or seg.transition == "cut":
+            np.copyto(out, seg.image)
+        elif seg.transition == "wipe":
+            x = int(self.width * (t - seg.start) / (seg.visible - seg.start))
+            np.copyto(out, previous)
+            out[:, :x] = seg.image[:, :x]
+        else:
+            alpha = (t - seg.start) / (seg.visible - seg.start)
+            cv2.addWeighted(seg.image, alpha, previous, 1 - alpha, 0, dst=out)
+
+        if self.video_rect:
+            self._draw_video(out, t)
+        if self.cursor:
+            self._draw_cursor(out, t)
+        if self.noise:
+            self._add_noise(out, t)
+        return out
+
+    def _draw_video(self, out, t):
+        x, y, w, h = self.video_rect
+        region = out[y:y + h, x:x + w]
+        region[:] = (30, 30, 30)
+        cx = int(w / 2 + w / 3 * np.sin(t * 2.1))
+        cy = int(h / 2 + h / 3 * np.cos(t * 1.3))
+        cv2.circle(region, (cx, cy), h // 6, (40, 180, 220), -1)
+        cv2.putText(region, f"{t:6.2f}", (10, h - 15), cv2.FONT_HERSHEY_SIMPLEX, h / 300, (200, 200, 200), 2)
+
+    def _add_noise(self, out, t):
+        # 噪声由时间决定，同一时刻重复渲染得到同一帧
+        cv2.setRNGSeed(int(t * 1000))
+        noise = np.empty(out.shape, np.int16)
+        cv2.randn(noise, 0, self.noise)
+        cv2.add(out, noise, dst=out, dtype=cv2.CV_8U)
+
+    def _draw_cursor(self, out, t):
+        # 指针在画面中缓慢漂移并带有小幅随机抖动
+        tick = int(t * 30)
+        jitter = np.random.default_rng(tick).integers(-3, 4, 2)
+        x = int(self.width * (0.3 + 0.2 * np.sin(t * 0.2))) + int(jitter[0])
+        y = int(self.height * (0.5 + 0.2 * np.cos(t * 0.15))) + int(jitter[1])
+        s = max(8, self.height // 60)
+        points = np.array([[x, y], [x, y + 2 * s], [x + s // 2, y + 3 * s // 2], [x + 3 * s // 2, y + 3 * s // 2]])
+        cv2.fillPoly(out, [points], (255, 255, 255))
+        cv2.polylines(out, [points], True, (0, 0, 0), 1)
+
+    def matches(self, image, segment, tolerance=2.0):
+        """判断一张保存的截图是否就是该段真值画面（忽略视频区域，缩小后比较以容忍指针）"""
+        a = cv2.resize(image, (self.width // 4, self.height // 4), interpolation=cv2.INTER_AREA).astype(np.int16)
+        b = cv2.resize(segment.image, (self.width // 4, self.height // 4), interpolation=cv2.INTER_AREA).astype(np.int16)
+        mask = np.ones(a.shape[:2], bool)
+        if segment.ignore:
+            x, y, w, h = (v // 4 for v in segment.ignore)
+            mask[y:y + h, x:x + w] = False
+        return float(np.abs(a - b)[mask].mean()) <= tolerance
+
+
+class SyntheticDeckSource(FrameSource):
+    """把 SyntheticDeck 包装为帧来源，时钟的第一次读取对应 t = 0"""
+    is_live = False
+
+    def __init__(self, deck):
+        self.deck = deck
+        self._origin = None
+
+    def read(self, now, out=None):
+        if self._origin is None:
+            self._origin = now
+        return self.deck.render(now - self._origin, out)
+
+    def describe(self):
+        return "合成幻灯片"
+
+
+def export_frames(deck, folder, fps):
+    """把合成幻灯片按固定帧率导出为帧图片 + ground_truth.json（供回放、参数扫描使用）"""
+    os.makedirs(folder, exist_ok=True)
+    frame = None
+    count = int(deck.duration * fps)
+    for i in range(count):
+        frame = deck.render(i / fps, frame)
+        cv2.imwrite(os.path.join(folder, f"frame_{i:06d}.png"), frame)
+    truth = {"fps": fps, "duration": deck.duration, "segments": [s.to_dict() for s in deck.segments]}
+    with open(os.path.join(folder, "ground_truth.json"), 'w', encoding='utf-8') as f:
+        json.dump(truth, f, indent=2)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导出合成幻灯片帧序列")
+    parser.add_argument("folder", help="输出文件夹")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--slides", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    deck = SyntheticDeck(args.width, args.height, args.slides, seed=args.seed, **SCENARIOS[args.scenario])
+    n = export_frames(deck, args.folder, args.fps)
+    print(f"[+] 已导出 {n} 帧、{len(deck.segments)} 段真值到 {args.folder}")
@@ -0,0 +1,65 @@
+import threading
+import numpy as np
+
+# ---------------------------------------------------
+#  帧缓冲复用
+#  截图 -> 缩略图 -> 灰度 -> 差异 这条路径每秒要跑好几次，大窗口下每次都新建数组
+#  会带来每秒数百 MB 的分配。这里按 (形状, 类型) 缓存用完的数组，下一帧直接复用，
+#  配合 OpenCV 的 dst= 参数原地写入。
+# ---------------------------------------------------
+
+class BufferPool:
+    """
+    按 (形状, 类型) 复用的 numpy 缓冲池。
+    :param max_free: 每种形状最多缓存多少个空闲缓冲。
+    :param enabled: False 时每次都新分配（用于基准测试对比）。
+    """
+    def __init__(self, max_free=4, enabled=True):
+        self.max_free = max_free
+        self.enabled = enabled
+        self._free = {}
+        self.lock = threading.Lock()
+        self.acquired = 0
+        self.allocated = 0
+        self.allocated_bytes = 0
+
+    @staticmethod
+    def _key(shape, dtype):
+        return tuple(shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.uint8):
+        """取一个指定形状的缓冲（内容未初始化）"""
+        key = self._key(shape, dtype)
+        with self.lock:
+            self.acquired += 1
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+            self.allocated += 1
+        array = np.empty(shape, dtype)
+        with self.lock:
+            self.allocated_bytes += array.nbytes
+        return array
+
+    def release(self, array):
+        """归还缓冲；调用方之后不得再使用该数组"""
+        if array is None or not self.enabled:
+            return
+        key = self._key(array.shape, array.dtype)
+        with self.lock:
+            free = self._free.get(key)
+            if free is None:
+                # 窗口尺寸变化后旧尺寸的缓冲不会再用到，只保留最近用到的几种形状
+                if len(self._free) >= 8:
+                    self._free.pop(next(iter(self._free)))
+                free = self._free[key] = []
+            if len(free) < self.max_free:
+                free.append(array)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "acquired": self.acquired,
+                "allocated": self.allocated,
+                "allocated_mb": self.allocated_bytes / 1024 / 1024,
+            }
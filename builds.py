@@ -0,0 +1,93 @@
+import os
+import cv2
+import numpy as np
+import utils
+from manifest import SessionManifest
+
+# ---------------------------------------------------
+#  逐条出现 (build 动画) 的合并
+#  一张幻灯片的要点逐条出现时，每一步都是一次“翻页 + 静止”，原来每步都保存一张完整截图。
+#  新的稳定画面与上一张保存的幻灯片相比，如果变化只落在原来的空白处（原有内容一个像素都没动），
+#  就认为是同一张幻灯片的下一步：覆盖上一张截图（同一个文件名、实时 PDF 的同一页），而不是新增一张。
+#  “原来的空白处”按上一张画面的形态学梯度判断：有文字、线条、边框的地方梯度大，
+#  新内容压在旧内容上、旧内容消失或移动（换了一张同模板的幻灯片）都会改动梯度大的像素。
+#  可选保留中间步骤：每次覆盖前把被改动的矩形区域按原样裁下来存到 builds/ 子文件夹（几乎都是背景，非常小），
+#  由最终画面依次贴回即可还原每一步（restore_steps）。
+# ---------------------------------------------------
+
+BUILDS_DIR = "builds"
+BUILD_MODES = ("off", "coalesce", "deltas")
+
+
+def build_region(previous, current, keep=None, noise_level=24, max_overlap=0.02, max_fraction=0.5):
+    """
+    判断 current 是否是在 previous 基础上追加了内容。
+    :param previous: 上一张幻灯片的灰度图（通常为检测用的缩略图）。
+    :param current: 新的稳定画面的灰度图，与 previous 同尺寸。
+    :param keep: 参与比较的像素掩码（255 参与，如忽略区域、自动屏蔽区域以外），None 为全部参与。
+    :param noise_level: 灰度差超过此值的像素才算变化，梯度超过此值的像素才算有内容。
+    :param max_overlap: 变化的像素中最多有多少比例落在原有内容上。
+    :param max_fraction: 变化的像素最多占画面的比例，超过时视为换了一张幻灯片。
+    :return: 变化区域的外接矩形 (x, y, w, h)，按输入图像的坐标；不是追加时返回 None。
+    """
+    if previous.shape != current.shape:
+        return None
+    # 轻微模糊，压制采集噪声和压缩噪声
+    prev = cv2.GaussianBlur(previous, (3, 3), 0)
+    cur = cv2.GaussianBlur(current, (3, 3), 0)
+    _, changed = cv2.threshold(cv2.absdiff(prev, cur), noise_level, 255, cv2.THRESH_BINARY)
+    if keep is not None:
+        cv2.bitwise_and(changed, keep, dst=changed)
+    count = cv2.countNonZero(changed)
+    if count == 0 or count > max_fraction * changed.size:
+        return None
+
+    kernel = np.ones((3, 3), np.uint8)
+    gradient = cv2.morphologyEx(prev, cv2.MORPH_GRADIENT, kernel)
+    _, content = cv2.threshold(gradient, noise_level, 255, cv2.THRESH_BINARY)
+    # 抗锯齿的边缘也算内容，紧贴旧内容的新笔画不算“空白处”
+    content = cv2.dilate(content, kernel)
+    overlap = cv2.countNonZero(cv2.bitwise_and(changed, content))
+    if overlap > max_overlap * count:
+        return None
+    return cv2.boundingRect(changed)
+
+
+def scale_box(box, from_shape, to_shape, pad=4):
+    """把 (x, y, w, h) 从 from_shape 的坐标换算到 to_shape（如缩略图 -> 原图），四周留出 pad 像素并裁到图像范围内"""
+    x, y, w, h = box
+    sy, sx = to_shape[0] / from_shape[0], to_shape[1] / from_shape[1]
+    left, top = max(0, int(x * sx) - pad), max(0, int(y * sy) - pad)
+    right = min(to_shape[1], int(np.ceil((x + w) * sx)) + pad)
+    bottom = min(to_shape[0], int(np.ceil((y + h) * sy)) + pad)
+    return left, top, right - left, bottom - top
+
+
+def delta_filename(filename, step, extension):
+    """第 step 步（从 1 开始）在 builds/ 中的差量文件名"""
+    return os.path.join(BUILDS_DIR, f"{os.path.splitext(filename)[0]}_step{step:02d}{extension}")
+
+
+def restore_steps(folder, filename, manifest=None):
+    """
+    由最终截图和 builds/ 中的差量还原一张幻灯片的各个中间步骤。
+    :param manifest: 已加载的 SessionManifest，None 时从 folder 读取。
+    :return: [第 1 步, 第 2 步, ..., 最终画面] 的 BGR 图像列表；截图无法读取时返回空列表。
+    """
+    manifest = manifest or SessionManifest(folder, create=False)
+    image = utils.read_image(os.path.join(folder, filename))
+    if image is None:
+        return []
+    steps = [image]
+    # 从最后一步往前，每次把被覆盖前的区域贴回去
+    for record in sorted(manifest.steps.get(filename, []), key=lambda r: -r["step"]):
+        delta = utils.read_image(os.path.join(folder, record["delta"]))
+        if delta is None:
+            break
+        image = image.copy()
+        x, y = record["x"], record["y"]
+        h, w = delta.shape[:2]
+        image[y:y + h, x:x + w] = delta
+        steps.append(image)
+    steps.reverse()
+    return steps
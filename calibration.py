@@ -0,0 +1,107 @@
+import math
+import numpy as np
+
+# ---------------------------------------------------
+#  检测阈值自动校准
+#  画面静止时两帧之间的差异分数并不为零：视频压缩、采集卡/摄像头噪声、投影闪烁都会带来一个
+#  “噪声底”，不同的幻灯片、投影仪、录像差别很大，固定阈值只能靠用户反复调整。
+#  这里持续统计未触发翻页的轮询的差异分数（按时间加权、随时间衰减的分位数），
+#  每个样本取与上一次轮询的较小值：噪声每次轮询都在，而低于阈值的一次性小变化（改了几个字）只出现一次，不会抬高噪声估计；
+#  触发阈值取噪声上沿再加一段余量，稳定阈值取噪声上沿之上一小段，
+#  噪声大的来源不会反复误触发、也不会每次都等到静止超时；干净的来源则能检测到更细小的变化。
+# ---------------------------------------------------
+
+
+class DecayingHistogram:
+    """
+    对数分桶的加权直方图，旧样本的权重按半衰期指数衰减，用于估计最近一段时间内的分位数。
+    :param low: 最小的非零分桶下界，低于它的值都记入“零”桶。
+    :param high: 最大分桶上界。
+    :param per_decade: 每十倍区间的分桶数（40 时相邻分桶相差约 6%）。
+    :param half_life: 样本权重衰减一半所需的权重累计量（样本以秒为权重时即为秒）。
+    """
+    def __init__(self, low=1e-5, high=1.0, per_decade=40, half_life=120.0):
+        count = int(round(math.log10(high / low) * per_decade))
+        self.edges = low * 10.0 ** (np.arange(count + 1) / per_decade)
+        self.weights = np.zeros(count + 2)  # [0] 低于 low，[-1] 不低于 high
+        self.decay = math.log(2) / half_life
+        self.total = 0.0
+
+    def add(self, value, weight=1.0):
+        self.weights *= math.exp(-self.decay * weight)
+        self.weights[np.searchsorted(self.edges, value, side="right")] += weight
+        self.total = float(self.weights.sum())
+
+    def quantile(self, q):
+        """估算分位数（分桶内按对数插值）；没有样本时返回 None"""
+        if self.total <= 0:
+            return None
+        cumulative = np.cumsum(self.weights)
+        index = int(np.searchsorted(cumulative, q * self.total))
+        if index == 0:
+            return 0.0
+        if index >= len(self.edges):
+            return float(self.edges[-1])
+        below = cumulative[index - 1]
+        fraction = (q * self.total - below) / self.weights[index] if self.weights[index] else 0.0
+        lower, upper = self.edges[index - 1], self.edges[index]
+        return float(lower * (upper / lower) ** fraction)
+
+
+class ThresholdCalibrator:
+    """
+    根据空闲画面的差异分数推算触发阈值与稳定阈值（均为 0~1 的差异分数）。
+    :param warmup: 累计观察多少秒的空闲画面后才给出阈值，之前沿用手动阈值。
+    :param floor_quantile: 噪声中位水平取的分位数。
+    :param high_quantile: 噪声上沿取的分位数；空闲期间偶尔的小动画只要占用时间不超过 1 - high_quantile 就不会抬高它。
+    :param min_margin: 触发阈值至少比噪声上沿高出多少。
+    :param ratio: 触发阈值至少是噪声上沿的多少倍（噪声大的来源按比例留出余量）。
+    :param stable_fraction: 稳定阈值 = 噪声上沿 + 触发余量的多少比例。
+    :param bounds: 触发阈值的范围，与界面滑块一致 (0.1% ~ 20%)。
+    """
+    def __init__(self, warmup=3.0, floor_quantile=0.5, high_quantile=0.9, min_margin=0.002,
+                 ratio=2.0, stable_fraction=0.25, bounds=(0.001, 0.2), half_life=120.0):
+        self.half_life = half_life
+        self.histogram = DecayingHistogram(half_life=half_life)
+        self.warmup = warmup
+        self.floor_quantile = floor_quantile
+        self.high_quantile = high_quantile
+        self.min_margin = min_margin
+        self.ratio = ratio
+        self.stable_fraction = stable_fraction
+        self.bounds = bounds
+        self.observed = 0.0
+        self.last_score = None
+        self.noise_floor = self.noise_high = None
+        self.trigger = self.stable = None
+
+    def reset(self):
+        """画面构成变化（如屏蔽区域改变）后重新统计；重新热身期间沿用已有的阈值"""
+        self.histogram = DecayingHistogram(half_life=self.half_life)
+        self.observed = 0.0
+        self.last_score = None
+
+    @property
+    def ready(self):
+        return self.observed >= self.warmup
+
+    def observe(self, score, seconds):
+        """
+        记录一次未触发翻页的轮询。
+        :param seconds: 距上一次轮询的时间，作为样本权重（轮询间隔随运动自适应，按次数统计会偏向运动期间）。
+        :return: 是否已给出阈值（热身结束）。
+        """
+        seconds = max(seconds, 1e-3)
+        sample = score if self.last_score is None else min(score, self.last_score)
+        self.last_score = score
+        self.histogram.add(sample, seconds)
+        self.observed += seconds
+        if not self.ready:
+            return False
+        self.noise_floor = self.histogram.quantile(self.floor_quantile)
+        self.noise_high = self.histogram.quantile(self.high_quantile)
+        margin = max(self.min_margin, (self.ratio - 1) * self.noise_high)
+        low, high = self.bounds
+        self.trigger = min(high, max(low, self.noise_high + margin))
+        self.stable = min(self.trigger, self.noise_high + margin * self.stable_fraction)
+        return True
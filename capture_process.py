@@ -0,0 +1,268 @@
+import os
+import queue
+import logging
+import logging.handlers
+import tempfile
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from monitor import MonitorSession
+from manager import MonitorManager
+from sources import RealClock
+from buffers import BufferPool
+from effects import EffectScheduler
+
+# ---------------------------------------------------
+#  截图子进程
+#  截图、灰度转换、分块比较都在 Tk 进程的线程里进行，和界面、回调争抢 GIL，窗口越大界面越卡、检测延迟越高。
+#  启用后，这些工作放到一个独立的子进程中完成（子进程里仍是 MonitorManager 的调度线程与线程池）：
+#  - 检测到的稳定画面写入共享内存中的帧环（固定的几个槽位），只有“第几个槽、什么形状”这样的小消息经队列传回；
+#  - 主进程的转发线程从槽中复制出画面、归还槽位，交给保存端会话（与批量提取相同的 submit_slide），
+#    去重、build 动画合并、手动确认、快捷键、写盘与实时 PDF 都和原来一样在主进程中完成；
+#  - 子进程的状态、日志、来源结束等事件也经同一个队列传回。
+#  画面超出槽位大小（窗口被放大）或槽位长时间未归还时，这一帧改为直接经队列传递，不会丢失。
+# ---------------------------------------------------
+
+# 只影响检测、在子进程中使用的会话参数；其余参数（保存格式、去重、build 动画、回溯等）只交给主进程的保存端
+DETECTION_OPTIONS = ("ignore_regions", "auto_mask", "auto_threshold", "max_poll_interval", "stable_threshold",
+                     "required_stable_count", "slide_region", "label")
+
+
+class FrameRing:
+    """
+    共享内存中的帧环：slots 个固定大小的槽位，写入端按序号轮流使用，读取端按同样的顺序读取并归还。
+    :param slot_bytes: 每个槽位的字节数，应不小于最大的一帧。
+    :param name: 已有帧环的共享内存名称（子进程中连接）；None 时新建。
+    :param free: 空闲槽位的信号量，由创建端生成并传给子进程。
+    """
+    def __init__(self, slot_bytes, slots=4, name=None, free=None, context=None):
+        self.slot_bytes = slot_bytes
+        self.slots = slots
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.free = free if free is not None else (context or multiprocessing).Semaphore(slots)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def put(self, image, timeout=2.0):
+        """把一帧复制进下一个槽位，返回槽号；画面太大或等不到空闲槽位时返回 None"""
+        if image.nbytes > self.slot_bytes:
+            return None
+        with self._lock:
+            if not self.free.acquire(timeout=timeout):
+                return None
+            slot = self._seq % self.slots
+            self._seq += 1
+            self._view(slot, image.shape)[...] = image
+        return slot
+
+    def take(self, slot, shape):
+        """复制出槽位中的一帧并归还槽位（必须按写入的顺序调用）"""
+        view = self._view(slot, shape)
+        image = view.copy()
+        del view
+        self.free.release()
+        return image
+
+    def _view(self, slot, shape):
+        return np.ndarray(shape, np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class _CaptureSession(MonitorSession):
+    """子进程中的监控会话：只截图和检测，检测到的稳定画面写入帧环，不保存"""
+    def __init__(self, *args, index=0, ring=None, events=None, **kwargs):
+        self.index = index
+        self.ring = ring
+        self.events = events
+        super().__init__(*args, **kwargs)
+
+    def _trigger_screenshot_process(self, stable_frame):
+        image = stable_frame.bgr
+        slot = self.ring.put(image)
+        if slot is None:
+            logging.warning("画面超出帧环槽位大小或没有空闲槽位，这一帧直接经队列传递。")
+            self.events.put(("frame", self.index, image.copy(), self.trigger_score))
+        else:
+            self.events.put(("slide", self.index, slot, image.shape, self.trigger_score))
+
+    def finish(self):
+        super().finish()
+        self.events.put(("ended", self.index))
+
+
+def _capture_main(specs, ring_name, slot_bytes, slots, free, events, stop):
+    """子进程入口：specs 为 [(来源, 阈值, 全自动模式, 检测参数), ...]，运行到 stop 被置位或所有来源结束"""
+    try:
+        import ctypes
+        ctypes.windll.shcore.SetProcessDpiAwareness(2)
+    except Exception: pass
+    # 日志记录经事件队列交给主进程写入同一个日志文件
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(events)]
+    root.setLevel(logging.INFO)
+
+    ring = FrameRing(slot_bytes, slots, name=ring_name, free=free)
+    manager = MonitorManager(effects=EffectScheduler(name="CaptureEffects"), session_class=_CaptureSession)
+    try:
+        with tempfile.TemporaryDirectory(prefix="pptslicer_capture_") as scratch_path:
+            for index, (source, threshold, is_auto_mode, options) in enumerate(specs):
+                try:
+                    # 子进程中的会话不保存，清单与写入线程只落在临时目录里
+                    session_path = os.path.join(scratch_path, str(index))
+                    os.makedirs(session_path)
+                    manager.add(source, session_path, threshold,
+                                None, 0, is_auto_mode,
+                                lambda message, index=index: events.put(("status", index, message)),
+                                lambda: None,
+                                dedup_mode="off", history_mb=0, index=index, ring=ring, events=events, **options)
+                except Exception as e:
+                    logging.error(f"截图子进程无法打开来源: {e}", exc_info=True)
+                    events.put(("error", index, str(e)))
+            if manager.sessions:
+                manager.start()
+                while manager.sessions and not stop.wait(0.5):
+                    pass
+                manager.stop()
+                manager.join(timeout=10)
+    finally:
+        ring.close()
+        events.put(("exit",))
+
+
+class ProcessMonitorManager:
+    """
+    与 MonitorManager 接口相同（add / start / stop / join / is_alive），但截图与检测在子进程中进行。
+    每个来源在主进程中对应一个不轮询的保存端会话；监控开始后不能再添加来源。
+    :param effects: 各保存端共用的副作用调度器，None 时使用本机的声音/通知/快捷键。
+    :param slots: 帧环的槽位数。
+    """
+    def __init__(self, effects=None, slots=4):
+        self.effects = effects or EffectScheduler.platform_default()
+        self.slots = slots
+        self.context = multiprocessing.get_context("spawn")
+        self.pool = BufferPool(max_free=8)
+        self.clock = RealClock()
+        self.sessions = []
+        self._specs = []
+        self._process = None
+        self._ring = None
+        self._events = None
+        self._stop = None
+        self._thread = None
+
+    def add(self, source, save_path, threshold, hotkey, hotkey_timeout, is_auto_mode, status_callback, saved_callback, **options):
+        """添加一个监控来源，参数同 MonitorSession。返回主进程中的保存端会话"""
+        if self._thread is not None:
+            raise ValueError("截图子进程已启动，不能再添加来源")
+        if not getattr(source, "is_live", True):
+            # 来源要传给子进程，回放来源持有的解码器 (cv2.VideoCapture) 等无法跨进程传递
+            raise ValueError(f"截图子进程只支持窗口和显示器来源，不能添加{source.describe()}；请改用 MonitorManager 或回放命令")
+        detection = {key: options.pop(key) for key in DETECTION_OPTIONS if key in options}
+        sink = MonitorSession(source, save_path, threshold, hotkey, hotkey_timeout, is_auto_mode,
+                              status_callback, saved_callback, clock=self.clock, pool=self.pool,
+                              effects=self.effects, label=detection.get("label"),
+                              ignore_regions=detection.get("ignore_regions"), auto_mask=False,
+                              slide_region=detection.get("slide_region", "off"), **options)
+        detection["label"] = sink.label
+        # 保存端已确定的幻灯片区域随来源一起传给子进程，子进程只在窗口缩放或复查时重新检测
+        self.sessions.append(sink)
+        self._specs.append((sink.source, threshold, is_auto_mode, detection))
+        return sink
+
+    def start(self):
+        """启动保存端会话、建立帧环并启动截图子进程与转发线程"""
+        for sink in self.sessions:
+            sink.begin()
+        # 槽位按最大的来源留出余量，窗口稍微放大也不必改走队列；
+        # 只截取幻灯片区域时按完整画面计算，区域重新检测后变大也放得下
+        largest = max(max(int(np.prod(sink.frame_shape)),
+                          int(np.prod(sink.source.region_size or (0,))) * 3) for sink in self.sessions)
+        self._ring = FrameRing(largest * 5 // 4, self.slots, context=self.context)
+        self._events = self.context.Queue()
+        self._stop = self.context.Event()
+        self._process = self.context.Process(
+            target=_capture_main, name="PPTSlicerCapture", daemon=True,
+            args=(self._specs, self._ring.name, self._ring.slot_bytes, self.slots,
+                  self._ring.free, self._events, self._stop))
+        self._process.start()
+        self._thread = threading.Thread(target=self._relay, daemon=True, name="CaptureRelay")
+        self._thread.start()
+        logging.info(f"截图子进程启动: {len(self.sessions)} 个来源, 帧环 {self.slots} x {self._ring.slot_bytes / 1e6:.1f} MB。")
+
+    def stop(self):
+        for sink in self.sessions:
+            sink.stop()
+        if self._stop is not None:
+            self._stop.set()
+        if self._thread is None:
+            # 尚未启动（例如添加来源时出错），直接收尾已创建的会话
+            self._finish_all()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _relay(self):
+        """转发线程：处理子进程传回的事件，直到子进程退出"""
+        try:
+            while True:
+                # 保存端会话不轮询，回溯快捷键排队的补存由转发线程完成；等待事件的超时也决定了按键后多久补存
+                for sink in self.sessions:
+                    sink.save_recalled()
+                try:
+                    event = self._events.get(timeout=0.25)
+                except queue.Empty:
+                    if not self._process.is_alive():
+                        logging.error(f"截图子进程意外退出 (exitcode={self._process.exitcode})。")
+                        break
+                    continue
+                if isinstance(event, logging.LogRecord):
+                    logger = logging.getLogger(event.name)
+                    if logger.isEnabledFor(event.levelno):
+                        logger.handle(event)
+                    continue
+                kind = event[0]
+                if kind == "exit":
+                    break
+                sink = self.sessions[event[1]]
+                if kind == "slide":
+                    _, _, slot, shape, score = event
+                    sink.submit_slide(self._ring.take(slot, shape), score)
+                elif kind == "frame":
+                    sink.submit_slide(event[2], event[3])
+                elif kind == "status":
+                    sink.status_callback(event[2])
+                elif kind == "error":
+                    sink.status_callback(f"状态：无法监控 {sink.label}: {event[2]}")
+                elif kind == "ended":
+                    sink.stop()
+        except Exception as e:
+            logging.error(f"转发截图子进程事件出错: {e}", exc_info=True)
+        finally:
+            self._process.join(timeout=5)
+            self._finish_all()
+            logging.info("截图子进程已停止。")
+
+    def _finish_all(self):
+        for sink in self.sessions:
+            sink.finish()
+            logging.info(f"来源监控结束: {sink.label}")
+        if self._ring is not None:
+            self._ring.close()
+        self.effects.close(timeout=2)
@@ -6,10 +6,32 @@ SETTINGS_FILE = "settings.json"
 DEFAULT_SETTINGS = {
     "save_path": "",
     "threshold": 5.0,
+    "auto_threshold": False,  # 按画面噪声自动校准检测阈值（嵌入视频时容易多截）；关闭时使用手动设置的 threshold
     "hotkey_timeout": 5,
-    "auto_mode": False  # 新增配置项
+    "recall_hotkey": "f8",  # 手动模式：补存错过确认的上一张幻灯片，连按依次补存更早的；空字符串为不启用；history_mb 为 0 时不注册
+    "history_mb": 0,  # 手动模式回溯缓存的内存上限 (MB)，最近检测到的画面按无损压缩保存；0 为不启用回溯
+    "auto_mode": False,  # 新增配置项
+    "dedup_mode": "off",  # 重复幻灯片: skip 跳过 / reference 记录回访 / off 不去重
+    "build_mode": "off",  # 逐条出现的动画: coalesce 下一步覆盖上一步 / deltas 覆盖并在 builds/ 中保留中间步骤的差量 / off 不合并（超过阈值的步骤各自保存）
+    "image_format": "png",  # 截图格式: png / webp (无损) / jpg
+    "image_quality": None,  # PNG 压缩级别 (0~9) 或 JPEG 质量 (0~100)，None 为默认值
+    "pdf_preset": "original",  # PDF 质量预设: original / high / standard / compact
+    "max_poll_interval": 1.0,  # 画面长时间静止时的最长轮询间隔（秒）
+    "stable_threshold": 0.5,  # 等待静止时两帧差异低于此值 (百分比) 视为静止；自动阈值开启时由校准结果代替
+    "required_stable_count": 2,  # 需要连续多少帧静止才截图
+    "ignore_regions": [],  # 不参与检测的区域 [[x, y, w, h], ...]，按监控画面（启用 slide_region 时为幻灯片区域）宽高的比例 (0~1)，如右下角摄像头 [0.75, 0.75, 0.25, 0.25]
+    "slide_region": "off",  # 只截取幻灯片区域: auto 自动检测 (去掉演讲者视图备注、黑边、工具栏) / off 整个窗口 / [x, y, w, h] 按窗口宽高的比例手动指定
+    "auto_mask": True,  # 自动屏蔽嵌入视频、时钟等持续变化的区域
+    "thumbnail_mb": 0,  # 保存截图时在截图目录的 pptslicer_thumbs/ 中生成多级缩略图，缓存大小上限 (MB)；0 为不生成
+    "live_pdf": False,  # 会话模式：每保存一张截图就追加到截图目录下的 pptslicer_live.pdf (使用 pdf_preset 的质量)
+    "capture_process": False,  # 截图与检测放到独立的子进程中（帧经共享内存传回），大窗口时界面不卡顿、检测延迟更稳定
+    "metrics": False,  # 记录各阶段耗时，导出 pptslicer_metrics.json/.prom 并在界面显示
+    "extra_sources": []  # 同时监控的附加窗口/显示器，如 {"window": "Zoom", "save_path": "...", "hotkey": "ctrl+2"} 或 {"display": 2}
 }
 
+# 新功能默认关闭，需要时在 settings.json 中开启；保存时只写入与默认值不同的项，
+# 用户没有改过的项以后随默认值一起更新，不会被第一次保存的默认值固定下来。
+
 def load_settings():
     """从 settings.json 加载配置，如果文件不存在则返回默认配置"""
     if os.path.exists(SETTINGS_FILE):
@@ -20,13 +42,15 @@ def load_settings():
                     settings.setdefault(key, value)
                 return settings
         except (json.JSONDecodeError, IOError):
-            return DEFAULT_SETTINGS
-    return DEFAULT_SETTINGS
+            return dict(DEFAULT_SETTINGS)
+    return dict(DEFAULT_SETTINGS)
 
 def save_settings(settings):
-    """将配置保存到 settings.json"""
+    """将配置中与默认值不同的项保存到 settings.json"""
+    changed = {key: value for key, value in settings.items()
+               if key not in DEFAULT_SETTINGS or value != DEFAULT_SETTINGS[key]}
     try:
         with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=4)
+            json.dump(changed, f, indent=4)
     except IOError as e:
         print(f"[-] 保存配置失败: {e}")
\ No newline at end of file
@@ -0,0 +1,183 @@
+import os
+import logging
+import threading
+import cv2
+import numpy as np
+import utils
+from manifest import SessionManifest, IMAGE_EXTENSIONS
+from detection import TiledChangeDetector
+
+# ---------------------------------------------------
+#  幻灯片去重：感知哈希 (pHash) + BK 树
+#  每张保存的幻灯片计算一个 256 位 pHash，放进 BK 树；
+#  新的稳定画面先查树找出汉明距离足够小的候选，再与候选的指纹（1/4 分辨率灰度图）逐块确认，
+#  避免只差几个字的同模板幻灯片被误判为重复；指纹经过区域平均，JPEG 压缩和采集噪声不影响确认。
+#  哈希随幻灯片记录在会话清单 (manifest.py) 中，重启监控后可继续去重；
+#  指纹只保存在内存中，之前会话保存的幻灯片第一次成为候选时才读取原图生成。
+# ---------------------------------------------------
+
+
+def phash(image, hash_size=16, dct_size=32):
+    """
+    计算图像的感知哈希 (DCT 低频系数与中位数比较)。
+    :param image: BGR 或灰度图像。
+    :return: hash_size * hash_size 位的整数。
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (dct_size, dct_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = low > np.median(low)
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def fingerprint(thumb):
+    """由检测缩略图（半分辨率灰度图）生成去重确认用的指纹：再缩小一半，区域平均滤掉噪声"""
+    height, width = thumb.shape
+    return cv2.resize(thumb, (max(1, width // 2), max(1, height // 2)), interpolation=cv2.INTER_AREA)
+
+
+def same_slide(a, b, keep=None, grid=(8, 8), noise_level=24, tolerance=0.01):
+    """
+    逐块比较两个指纹，每一块中差异超过 noise_level 的像素都不超过 tolerance 的比例才算同一张幻灯片。
+    :param keep: 参与比较的区域掩码（缩略图尺寸，0 为忽略），如嵌入视频、手动忽略的区域。
+    """
+    if a.shape != b.shape:
+        return False
+    diff = cv2.absdiff(a, b)
+    if keep is not None:
+        keep = cv2.resize(keep, (diff.shape[1], diff.shape[0]), interpolation=cv2.INTER_NEAREST)
+        cv2.bitwise_and(diff, keep, dst=diff)
+    rows, cols = grid
+    height, width = diff.shape[0] // rows * rows, diff.shape[1] // cols * cols
+    tiles = (diff[:height, :width] > noise_level).reshape(rows, height // rows, cols, width // cols)
+    limit = tolerance * (height // rows) * (width // cols)
+    return bool((tiles.sum(axis=(1, 3)) <= limit).all())
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树，支持“距离不超过 d 的所有条目”查询"""
+    def __init__(self):
+        self._root = None  # 节点: [hash, item, {距离: 子节点}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item):
+        self._size += 1
+        if self._root is None:
+            self._root = [value, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """返回 [(距离, item), ...]，按距离从小到大排序"""
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.append((distance, node[1]))
+            # 三角不等式：只有距离落在 [d - max, d + max] 的子树才可能命中
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda r: r[0])
+        return results
+
+
+class SlideIndex:
+    """
+    保存目录的幻灯片索引，由会话清单中记录的哈希建立。
+    :param manifest: 保存目录的 SessionManifest。
+    :param max_distance: 汉明距离不超过该值的条目作为候选（256 位哈希）。
+    """
+    def __init__(self, manifest, max_distance=8):
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        self.fingerprints = {}  # 文件名 -> PNG 编码的指纹，本次运行中保存或读取过的幻灯片才有
+        self.lock = threading.Lock()
+        # 已被用户删除的图片在确认阶段读取失败，自然不会被判为重复，这里不再逐个检查文件
+        for record in manifest.slides:
+            if record.get("hash"):
+                self.tree.add(int(record["hash"], 16), record["file"])
+        logging.info(f"已加载幻灯片索引: {len(self.tree)} 条。")
+
+    def candidates(self, value):
+        """返回哈希与 value 相近的已保存幻灯片文件名，距离近的在前"""
+        with self.lock:
+            matches = self.tree.search(value, self.max_distance)
+        return [filename for _, filename in matches]
+
+    def add(self, value, filename, fingerprint=None):
+        """
+        登记一张新保存的幻灯片（记录由调用方写入会话清单）。
+        :param fingerprint: 幻灯片的指纹 (fingerprint)；覆盖同一文件时以最新的为准。
+        """
+        with self.lock:
+            self.tree.add(value, filename)
+        if fingerprint is not None:
+            self.set_fingerprint(filename, fingerprint)
+
+    def set_fingerprint(self, filename, fingerprint):
+        # 指纹以无损压缩保存，每张只占几 KB
+        encoded = cv2.imencode(".png", fingerprint)[1]
+        with self.lock:
+            self.fingerprints[filename] = encoded
+
+    def fingerprint(self, filename):
+        """返回已知的指纹，没有时返回 None"""
+        with self.lock:
+            encoded = self.fingerprints.get(filename)
+        return None if encoded is None else cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+
+
+def find_duplicates(folder, max_distance=8):
+    """
+    离线检查截图文件夹中的重复幻灯片（命令行 dedup 使用），判定方法与监控时相同：哈希筛选候选，再逐块确认。
+    清单中已有哈希的图片不再重新计算哈希。
+    :return: [(重复的文件名, 与之相同的较早文件名), ...]，按截取顺序。
+    """
+    manifest = SessionManifest(folder, create=False)
+    if manifest.slides:
+        records = manifest.slides
+    else:
+        records = [{"file": f} for f in sorted(os.listdir(folder)) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+    detector = TiledChangeDetector()
+    tree = BKTree()
+    prints = {}
+    duplicates = []
+    for record in records:
+        filename = record["file"]
+        image = utils.read_image(os.path.join(folder, filename))
+        if image is None:
+            continue
+        value = int(record["hash"], 16) if record.get("hash") else phash(image)
+        frame = detector.frame(image)
+        current = fingerprint(frame.thumb)
+        frame.release()
+        original = None
+        for _, candidate in tree.search(value, max_distance):
+            if same_slide(prints[candidate], current, noise_level=detector.noise_level):
+                original = candidate
+                break
+        if original is None:
+            tree.add(value, filename)
+            prints[filename] = current
+        else:
+            duplicates.append((filename, original))
+    return duplicates
@@ -0,0 +1,306 @@
+import cv2
+import numpy as np
+from collections import deque
+from buffers import BufferPool
+import metrics
+
+# ---------------------------------------------------
+#  分块 (Tile) 由粗到细的变化检测
+#  1. 先把整帧隔点采样成一张小灰度缩略图，按网格比较每块的缩略图差异；
+#  2. 所有块都没动 -> 直接返回，不做任何全分辨率运算；
+#  3. 只有缩略图上“动了”的块才在全分辨率灰度图上精确计算差异。
+#  差异分数统一表示为“平均像素差 / 255”(0~1)，与分辨率无关。
+#  屏蔽区域（用户指定的忽略矩形、自动学到的持续运动块）不参与比较：
+#  整块被屏蔽的块不做全分辨率运算，部分被屏蔽的块带掩码计算，分数只按未屏蔽的像素加权。
+# ---------------------------------------------------
+
+class Frame:
+    """
+    一帧画面及其派生数据（缩略图、灰度图），派生数据按需计算并缓存。
+    各数组来自缓冲池，不再使用时调用 release() 归还；要长期持有原图（如交给写入线程）时先 detach()。
+    """
+    def __init__(self, bgr, thumb, pool):
+        self.bgr = bgr
+        self.thumb = thumb
+        self.pool = pool
+        self._gray = None
+        self._owns_bgr = True
+
+    @property
+    def shape(self):
+        return self.bgr.shape[:2]
+
+    @property
+    def gray(self):
+        # 全分辨率灰度图只在需要精确比较时才转换，且每帧最多转换一次
+        if self._gray is None:
+            self._gray = self.pool.acquire(self.shape)
+            with metrics.timer("gray"):
+                cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def detach(self):
+        """取走原图的所有权：release() 时不再把它归还缓冲池，返回原图"""
+        self._owns_bgr = False
+        return self.bgr
+
+    def release(self):
+        if self._owns_bgr:
+            self.pool.release(self.bgr)
+        self.pool.release(self.thumb)
+        self.pool.release(self._gray)
+        self.bgr = self.thumb = self._gray = None
+
+
+class DiffResult:
+    """
+    两帧之间的分块差异结果。
+    score: 整帧差异分数 (0~1)。
+    tile_scores: 每块的差异分数 (rows x cols)。
+    changed: 每块是否发生变化 (rows x cols 的布尔数组)，不含被屏蔽的块。
+    motion: 不考虑自动屏蔽时每块是否有运动，用于学习持续运动的区域。
+    """
+    def __init__(self, score, tile_scores, changed, tile_boxes, motion=None):
+        self.score = score
+        self.tile_scores = tile_scores
+        self.changed = changed
+        self.tile_boxes = tile_boxes
+        self.motion = changed if motion is None else motion
+
+    @property
+    def changed_count(self):
+        return int(np.count_nonzero(self.changed))
+
+    def changed_regions(self):
+        """返回发生变化的块在原图中的位置列表 [(x, y, w, h), ...]"""
+        return [self.tile_boxes[r][c] for r, c in zip(*np.nonzero(self.changed))]
+
+
+class TiledChangeDetector:
+    """
+    分块变化检测器。
+    :param grid: 网格行列数 (rows, cols)。
+    :param sample_step: 生成缩略图时的采样间隔（像素），2 表示每隔一个像素取一个。
+    :param noise_level: 缩略图上每块最大灰度差不超过此值时视为未变化（0~255）。
+    :param pool: 缓冲池，None 时自建一个。
+    :param ignore_regions: 忽略的区域 [(x, y, w, h), ...]，以窗口宽高的比例 (0~1) 表示。
+    """
+    def __init__(self, grid=(8, 8), sample_step=2, noise_level=24, pool=None, ignore_regions=None):
+        self.rows, self.cols = grid
+        self.sample_step = sample_step
+        self.noise_level = noise_level
+        self.pool = pool or BufferPool()
+        self.ignore_regions = [tuple(region) for region in ignore_regions or []]
+        self.learned_mask = None  # 自动屏蔽的块 (rows x cols 布尔数组)，由 MotionHeatmap 提供
+        self._layout_shape = None
+        self._tile_boxes = None
+        self._tile_areas = None
+
+    def _thumb_size(self, height, width):
+        # 缩略图尺寸取网格的整数倍，便于按块 reshape
+        tile_w = max(1, -(-width // (self.cols * self.sample_step)))
+        tile_h = max(1, -(-height // (self.rows * self.sample_step)))
+        return self.cols * tile_w, self.rows * tile_h
+
+    def frame(self, bgr):
+        """把一帧 BGR 图像包装为 Frame，并生成用于粗比较的缩略图"""
+        height, width = bgr.shape[:2]
+        # 最近邻缩放等价于隔点采样，几乎没有开销
+        thumb_w, thumb_h = self._thumb_size(height, width)
+        small = self.pool.acquire((thumb_h, thumb_w, 3))
+        thumb = self.pool.acquire((thumb_h, thumb_w))
+        with metrics.timer("thumbnail"):
+            cv2.resize(bgr, (thumb_w, thumb_h), dst=small, interpolation=cv2.INTER_NEAREST)
+            cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=thumb)
+        self.pool.release(small)
+        return Frame(bgr, thumb, self.pool)
+
+    def set_ignore_regions(self, regions):
+        self.ignore_regions = [tuple(region) for region in regions or []]
+        self._layout_shape = None
+
+    def _layout(self, shape):
+        """计算（并缓存）某一分辨率下每块在原图中的位置、面积，以及忽略区域的掩码"""
+        if shape != self._layout_shape:
+            height, width = shape
+            ys = np.linspace(0, height, self.rows + 1).astype(int).tolist()
+            xs = np.linspace(0, width, self.cols + 1).astype(int).tolist()
+            self._tile_boxes = [
+                [(xs[c], ys[r], xs[c + 1] - xs[c], ys[r + 1] - ys[r]) for c in range(self.cols)]
+                for r in range(self.rows)
+            ]
+            self._tile_areas = np.outer(np.diff(ys), np.diff(xs)).astype(np.float64)
+
+            # 忽略区域: keep 掩码中 255 为参与比较的像素；keep_areas 为每块参与比较的像素数
+            self._keep_full = self._keep_thumb = None
+            self._keep_areas = self._tile_areas.copy()
+            self._partial = np.zeros((self.rows, self.cols), dtype=bool)
+            if self.ignore_regions:
+                keep = np.full((height, width), 255, dtype=np.uint8)
+                for x, y, w, h in self.ignore_regions:
+                    keep[int(y * height):int(round((y + h) * height)), int(x * width):int(round((x + w) * width))] = 0
+                for r in range(self.rows):
+                    for c in range(self.cols):
+                        x, y, w, h = self._tile_boxes[r][c]
+                        self._keep_areas[r, c] = cv2.countNonZero(keep[y:y + h, x:x + w])
+                self._partial = (self._keep_areas > 0) & (self._keep_areas < self._tile_areas)
+                self._keep_full = keep
+                self._keep_thumb = cv2.resize(keep, self._thumb_size(height, width), interpolation=cv2.INTER_NEAREST)
+            self._ignored = self._keep_areas == 0
+            self._layout_spans(height, width)
+            self._layout_shape = shape
+        return self._tile_boxes, self._tile_areas
+
+    def _layout_spans(self, height, width):
+        """
+        缩略图上需要比较的矩形 (y0, y1, x0, x1)：每一行块中连续的未忽略块合并为一段，上下相同的段再合并；
+        完全落在忽略区域内的块不做差；部分忽略的块另外记下，差值图上只在这些块内按掩码清零。
+        自动屏蔽的块仍要做差：MotionHeatmap 靠它们的运动判断何时恢复检测。
+        """
+        thumb_w, thumb_h = self._thumb_size(height, width)
+        tile_h, tile_w = thumb_h // self.rows, thumb_w // self.cols
+        spans = []
+        for r in range(self.rows):
+            c = 0
+            while c < self.cols:
+                if self._ignored[r, c]:
+                    c += 1
+                    continue
+                start = c
+                while c < self.cols and not self._ignored[r, c]:
+                    c += 1
+                span = [r * tile_h, (r + 1) * tile_h, start * tile_w, c * tile_w]
+                above = next((s for s in spans if s[1] == span[0] and s[2:] == span[2:]), None)
+                if above is not None:
+                    above[1] = span[1]
+                else:
+                    spans.append(span)
+        self._diff_spans = [tuple(span) for span in spans]
+        self._partial_spans = [(r * tile_h, (r + 1) * tile_h, c * tile_w, (c + 1) * tile_w)
+                               for r, c in zip(*np.nonzero(self._partial))]
+
+    def thumb_mask(self, shape):
+        """缩略图上参与比较的像素掩码（255 参与，不含忽略区域和自动屏蔽的块）；没有任何屏蔽时返回 None"""
+        self._layout(shape)
+        if self._keep_thumb is None and self.learned_mask is None:
+            return None
+        thumb_w, thumb_h = self._thumb_size(*shape)
+        keep = np.full((thumb_h, thumb_w), 255, np.uint8) if self._keep_thumb is None else self._keep_thumb.copy()
+        if self.learned_mask is not None:
+            tiles = np.repeat(np.repeat(self.learned_mask, thumb_h // self.rows, axis=0), thumb_w // self.cols, axis=1)
+            keep[tiles] = 0
+        return keep
+
+    def compare(self, previous, current):
+        """比较两帧，返回 DiffResult"""
+        with metrics.timer("diff"):
+            return self._compare(previous, current)
+
+    def _compare(self, previous, current):
+        boxes, areas = self._layout(current.shape)
+
+        if previous.shape != current.shape:
+            # 窗口尺寸变化：视为整帧都变了
+            full = np.ones((self.rows, self.cols), dtype=bool)
+            return DiffResult(1.0, np.ones((self.rows, self.cols)), full, boxes)
+
+        skip = self._ignored if self.learned_mask is None else self._ignored | self.learned_mask
+        weights = np.where(skip, 0.0, self._keep_areas)
+        total = weights.sum()
+
+        # 1. 粗比较：缩略图逐块的最大差异和平均差异；完全忽略的块不做差，部分忽略的块按掩码清零
+        thumb_h, thumb_w = current.thumb.shape
+        diff_buffer = self.pool.acquire(current.thumb.shape)
+        for y0, y1, x0, x1 in self._diff_spans:
+            cv2.absdiff(previous.thumb[y0:y1, x0:x1], current.thumb[y0:y1, x0:x1], dst=diff_buffer[y0:y1, x0:x1])
+        for y0, y1, x0, x1 in self._partial_spans:
+            cv2.bitwise_and(diff_buffer[y0:y1, x0:x1], self._keep_thumb[y0:y1, x0:x1], dst=diff_buffer[y0:y1, x0:x1])
+        thumb_diff = diff_buffer.reshape(self.rows, thumb_h // self.rows, self.cols, thumb_w // self.cols)
+        tile_peak = thumb_diff.max(axis=(1, 3))
+        # 指定累加类型逐块求和，避免生成整张缩略图大小的浮点临时数组
+        tile_pixels = (thumb_h // self.rows) * (thumb_w // self.cols)
+        tile_scores = thumb_diff.sum(axis=(1, 3), dtype=np.uint64) / (tile_pixels * 255.0)
+        self.pool.release(diff_buffer)
+        # 忽略的块没有做差，缓冲区中是上一次留下的内容
+        tile_peak[self._ignored] = 0
+        motion = tile_peak > self.noise_level
+        changed = motion & ~skip
+        tile_scores[skip] = 0.0
+
+        # 2. 提前退出：没有任何未屏蔽的块变化（也就不必转换全分辨率灰度图）
+        if not changed.any():
+            score = float((tile_scores * weights).sum() / total) if total else 0.0
+            return DiffResult(score, tile_scores, changed, boxes, motion)
+
+        # 3. 细比较：只在变化的块上做全分辨率 L1 差异（cv2.norm 不分配中间数组）
+        prev_gray, cur_gray = previous.gray, current.gray
+        for r, c in zip(*np.nonzero(changed)):
+            x, y, w, h = boxes[r][c]
+            if self._partial[r, c]:
+                l1 = cv2.norm(prev_gray[y:y + h, x:x + w], cur_gray[y:y + h, x:x + w], cv2.NORM_L1,
+                              mask=self._keep_full[y:y + h, x:x + w])
+            else:
+                l1 = cv2.norm(prev_gray[y:y + h, x:x + w], cur_gray[y:y + h, x:x + w], cv2.NORM_L1)
+            tile_scores[r, c] = l1 / (self._keep_areas[r, c] * 255.0)
+
+        score = float((tile_scores * weights).sum() / total)
+        return DiffResult(score, tile_scores, changed, boxes, motion)
+
+
+class MotionHeatmap:
+    """
+    统计每块在最近若干秒中“有运动的秒数比例”，找出其余画面静止、这几块却一直在动的区域
+    （嵌入视频、摄像头画面、时钟、闪烁的光标），交给检测器屏蔽。
+    按时间段而不是按轮询次数统计，因此与轮询频率无关：翻页、淡入淡出只占一两个时间段，不会被屏蔽。
+    :param bucket_seconds: 每个时间段的长度（秒）。
+    :param window: 统计最近多少个时间段。
+    :param activity: 有运动的时间段比例超过此值的块视为持续运动；已屏蔽的块降到一半以下才恢复检测。
+    :param quiet: 其余块的平均比例低于此值才算“其余画面静止”。
+    :param max_fraction: 屏蔽的块最多占整帧的比例，超过时不再新增（可能是全屏播放视频，应交给阈值处理）。
+    """
+    def __init__(self, grid=(8, 8), bucket_seconds=1.0, window=8, activity=0.75, quiet=0.25, max_fraction=0.35):
+        self.bucket_seconds = bucket_seconds
+        self.activity = activity
+        self.quiet = quiet
+        self.max_fraction = max_fraction
+        self.heat = np.zeros(grid)
+        self.buckets = deque(maxlen=window)
+        self.mask = None
+        self._bucket_id = None
+        self._current = None
+
+    def update(self, result, now):
+        """加入一次比较结果，返回屏蔽区域是否发生变化"""
+        if result.motion.shape != self.heat.shape:
+            return False
+        bucket_id = int(now // self.bucket_seconds)
+        if bucket_id == self._bucket_id:
+            self._current |= result.motion
+            return False
+        # 进入新的时间段：上一段计入统计，重新计算屏蔽区域
+        if self._current is not None:
+            self.buckets.append(self._current)
+        self._bucket_id = bucket_id
+        self._current = result.motion.copy()
+        if len(self.buckets) < self.buckets.maxlen * 3 // 4:
+            return False
+        self.heat = np.mean(self.buckets, axis=0)
+
+        masked = np.zeros(self.heat.shape, dtype=bool) if self.mask is None else self.mask
+        warm = self.heat >= self.activity / 2
+        new = masked & warm
+        hot = (self.heat >= self.activity) & ~new
+        if hot.any():
+            rest = self.heat[~(new | hot)]
+            if (rest.size == 0 or rest.mean() <= self.quiet) and (new | hot).mean() <= self.max_fraction:
+                new |= hot
+        # 视频画面中运动的位置会游走：紧挨着屏蔽区域、也经常在动的块一并屏蔽
+        grown = new | (cv2.dilate(new.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool) & warm)
+        if grown.mean() <= self.max_fraction:
+            new = grown
+
+        new = new if new.any() else None
+        if (new is None) == (self.mask is None) and (new is None or np.array_equal(new, self.mask)):
+            return False
+        self.mask = new
+        return True
@@ -0,0 +1,223 @@
+import os
+import time
+import heapq
+import queue
+import logging
+import threading
+
+# ---------------------------------------------------
+#  副作用调度
+#  提示音、成功音、桌面通知、快捷键注册/注销、手动模式的确认超时，原来每次都新开一个线程或 threading.Timer，
+#  超时线程与键盘钩子线程还会同时修改待确认截图。现在全部交给一个常驻调度线程按时间顺序执行：
+#  - 超时用 call_later 排队，可以取消；新的待确认截图会取消上一次的超时，不会被旧的超时提前取消；
+#  - 快捷键的回调也转到调度线程执行，与超时回调串行，不再互相竞争；
+#  - 短时间内的多个声音合并，只播放最后一个；
+#  - 声音、通知、快捷键的实现（后端）可以注入，在 Linux 上用桩对象即可测试，传 None 即不启用。
+# ---------------------------------------------------
+
+
+class WinSound:
+    """winsound 异步播放：SND_ASYNC 立即返回，新的声音会打断正在播放的"""
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+
+    def play(self, path):
+        if not os.path.exists(path):
+            logging.warning(f"声音文件未找到: {path}")
+            return
+        self.winsound.PlaySound(path, self.winsound.SND_FILENAME | self.winsound.SND_ASYNC)
+
+
+class PlyerNotifier:
+    """plyer 桌面通知；部分平台上 notify 会阻塞到通知消失，因此在一个常驻线程中依次弹出，不占用调度线程"""
+    def __init__(self, app_name="PPTSlicer", timeout=4):
+        self.app_name = app_name
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def notify(self, title, message):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._worker, daemon=True, name="Notifier")
+            self.thread.start()
+        self.queue.put((title, message))
+
+    def _worker(self):
+        from plyer import notification
+        while True:
+            title, message = self.queue.get()
+            try:
+                notification.notify(title=title, message=message, app_name=self.app_name, timeout=self.timeout)
+            except Exception as e:
+                logging.warning(f"显示通知失败: {e}")
+
+
+class KeyboardHotkeys:
+    """keyboard 库的全局快捷键（回调在 keyboard 的钩子线程中调用）"""
+    def add(self, key, callback):
+        import keyboard
+        return keyboard.add_hotkey(key, callback)
+
+    def remove(self, handle):
+        import keyboard
+        try:
+            keyboard.remove_hotkey(handle)
+        except KeyError:
+            pass
+
+
+class _Task:
+    """排队的一次调用，cancel() 后不再执行"""
+    __slots__ = ("fn", "args", "cancelled")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EffectScheduler:
+    """
+    单线程的副作用调度器：所有任务在同一个后台线程中按到期时间依次执行（线程在第一次排队时才启动）。
+    :param sound: 声音后端，提供 play(path)；None 时不播放声音。
+    :param notifier: 通知后端，提供 notify(title, message)；None 时不显示通知。
+    :param hotkeys: 快捷键后端，提供 add(key, callback) -> handle 与 remove(handle)；None 时不注册快捷键。
+    :param min_sound_gap: 两次声音之间的最短间隔（秒），间隔内的请求合并为最后一个。
+    """
+    def __init__(self, sound=None, notifier=None, hotkeys=None, min_sound_gap=0.3, name="Effects"):
+        self.sound = sound
+        self.notifier = notifier
+        self.hotkeys = hotkeys
+        self.min_sound_gap = min_sound_gap
+        self.name = name
+        self._queue = []  # (到期时间, 序号, 任务)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        self._sound_task = None  # 尚未播放的声音，新的请求直接替换它的文件
+        self._last_sound = float("-inf")
+        self._handles = {}  # 所有者 -> 快捷键句柄，只在调度线程中访问
+        self._hotkeys_used = False
+
+    @classmethod
+    def platform_default(cls, **kwargs):
+        """使用本机可用的后端：Windows 上为 winsound，其余平台不播放声音"""
+        try:
+            sound = WinSound()
+        except ImportError:
+            sound = None
+        return cls(sound, PlyerNotifier(), KeyboardHotkeys(), **kwargs)
+
+    # ---------------------------------------------------
+    #  排队
+    # ---------------------------------------------------
+    def call_later(self, delay, fn, *args):
+        """delay 秒后在调度线程中调用 fn(*args)，返回可以 cancel() 的任务；调度器已关闭时不执行"""
+        task = _Task(fn, args)
+        with self._cond:
+            if self._closing:
+                task.cancelled = True
+                return task
+            self._push(time.monotonic() + delay, task)
+        return task
+
+    def call_soon(self, fn, *args):
+        return self.call_later(0, fn, *args)
+
+    def _push(self, due, task):
+        self._seq += 1
+        heapq.heappush(self._queue, (due, self._seq, task))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+            self._thread.start()
+        self._cond.notify()
+
+    # ---------------------------------------------------
+    #  声音、通知、快捷键
+    # ---------------------------------------------------
+    def play_sound(self, path):
+        if self.sound is None:
+            return
+        with self._cond:
+            if self._closing:
+                return
+            if self._sound_task is not None:
+                # 上一个声音还没播放：只播放最新的
+                self._sound_task.args = (path,)
+                return
+            self._sound_task = _Task(self._play, (path,))
+            self._push(max(time.monotonic(), self._last_sound + self.min_sound_gap), self._sound_task)
+
+    def _play(self, path):
+        with self._cond:
+            # 取出任务后到这里之间可能又被替换了文件，以最新的为准
+            if self._sound_task is not None:
+                path = self._sound_task.args[0]
+            self._sound_task = None
+            self._last_sound = time.monotonic()
+        self.sound.play(path)
+
+    def notify(self, title, message):
+        if self.notifier is not None:
+            self.call_soon(self.notifier.notify, title, message)
+
+    def register_hotkey(self, key, callback, owner=None):
+        """为 owner 注册快捷键（替换它之前注册的），按下时 callback 在调度线程中执行"""
+        if self.hotkeys is None:
+            return
+        self._hotkeys_used = True
+        self.call_soon(self._register, key, callback, owner)
+
+    def remove_hotkey(self, owner=None):
+        if self._hotkeys_used:
+            self.call_soon(self._remove, owner)
+
+    def _register(self, key, callback, owner):
+        self._remove(owner)
+        try:
+            self._handles[owner] = self.hotkeys.add(key, lambda: self.call_soon(callback))
+            logging.info(f"快捷键 '{key}' 已注册。")
+        except Exception as e:
+            logging.error(f"注册快捷键 '{key}' 失败: {e}")
+
+    def _remove(self, owner):
+        handle = self._handles.pop(owner, None)
+        if handle is not None:
+            self.hotkeys.remove(handle)
+
+    # ---------------------------------------------------
+    #  调度线程
+    # ---------------------------------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if self._queue and self._queue[0][0] <= now:
+                        _, _, task = heapq.heappop(self._queue)
+                        if task.cancelled:
+                            continue
+                        break
+                    if self._closing:
+                        # 已到期的任务（如注销快捷键）执行完才退出，未到期的超时直接丢弃
+                        self._queue.clear()
+                        return
+                    self._cond.wait(self._queue[0][0] - now if self._queue else None)
+            try:
+                task.fn(*task.args)
+            except Exception as e:
+                logging.error(f"后台任务出错: {e}", exc_info=True)
+
+    def close(self, timeout=None):
+        """执行完已到期的任务后停止调度线程"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
@@ -0,0 +1,69 @@
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+# ---------------------------------------------------
+#  最近画面的回溯缓存（手动模式）
+#  手动模式下只有在提示音后 hotkey_timeout 秒内按键才会保存，错过了、或者连续翻了两页，那张幻灯片就丢了。
+#  每张检测到的稳定画面都以无损 PNG（最快的压缩级别，幻灯片通常只有几十 KB）保存在内存中，
+#  总大小超过上限时丢弃最旧的，连续监控几个小时内存占用也不会增长；
+#  按回溯快捷键即可补存“上一张”，连按几次依次补存更早的几张。
+# ---------------------------------------------------
+
+
+class HistoryEntry:
+    """一张检测到的稳定画面：检测时间、差异分数、感知哈希、压缩数据；filename 为已保存的文件名"""
+    __slots__ = ("time", "score", "slide_hash", "shape", "data", "filename")
+
+    def __init__(self, time, score, slide_hash, shape, data):
+        self.time = time
+        self.score = score
+        self.slide_hash = slide_hash
+        self.shape = shape
+        self.data = data
+        self.filename = None
+
+    @property
+    def saved(self):
+        return self.filename is not None
+
+    def image(self):
+        """解码为 BGR numpy 数组"""
+        return cv2.imdecode(np.frombuffer(self.data, np.uint8), cv2.IMREAD_COLOR)
+
+
+class SlideHistory:
+    """
+    :param max_bytes: 压缩数据的总大小上限，超过时丢弃最旧的画面（至少保留最新的一张）。
+    :param compression: PNG 压缩级别，1 最快（1080p 幻灯片约 30 毫秒）。
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, compression=1):
+        self.max_bytes = max_bytes
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, compression]
+        self.entries = deque()
+        self.bytes = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, image, time, score=None, slide_hash=None):
+        """压缩并加入一张稳定画面，返回 HistoryEntry"""
+        ok, buffer = cv2.imencode(".png", image, self.params)
+        if not ok:
+            raise IOError("编码失败")
+        entry = HistoryEntry(time, score, slide_hash, image.shape, buffer.tobytes())
+        with self.lock:
+            self.entries.append(entry)
+            self.bytes += len(entry.data)
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                self.bytes -= len(self.entries.popleft().data)
+                self.evicted += 1
+        return entry
+
+    def unsaved(self, exclude=None):
+        """尚未保存的画面（不含 exclude），从旧到新"""
+        with self.lock:
+            return [entry for entry in self.entries if not entry.saved and entry is not exclude]
@@ -0,0 +1,138 @@
+import os
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from monitor import MonitorSession
+from sources import RealClock
+from buffers import BufferPool
+from effects import EffectScheduler
+
+# ---------------------------------------------------
+#  多来源监控
+#  同时监控讲台窗口、投影/远程会议窗口等多个来源时，不再每个窗口一个忙等线程：
+#  一个调度线程按各会话的下一次轮询时间排队，到期的会话交给共享线程池截图和比较
+#  (OpenCV/numpy 计算时会释放 GIL)。各会话的保存目录、阈值、快捷键和待确认截图互相独立，
+#  声音、快捷键、确认超时则共用一个副作用调度线程。
+# ---------------------------------------------------
+
+class MonitorManager:
+    """
+    :param workers: 共享线程池的线程数，默认取 CPU 核数（最多 4）。
+    :param effects: 各会话共用的副作用调度器 (effects.EffectScheduler)，None 时使用本机的声音/通知/快捷键。
+    :param session_class: 会话类，MonitorSession 或其子类（如截图子进程中只检测不保存的会话）。
+    """
+    def __init__(self, workers=None, effects=None, session_class=MonitorSession):
+        self.clock = RealClock()
+        self.workers = workers or min(4, os.cpu_count() or 2)
+        # 所有会话共用一个缓冲池，形状相同的来源可以互相复用缓冲
+        self.pool = BufferPool(max_free=8)
+        self.effects = effects or EffectScheduler.platform_default()
+        self.session_class = session_class
+        self.sessions = []
+        self._queue = []  # (到期时间, 序号, 会话)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._executor = None
+        self._thread = None
+
+    def add(self, source, save_path, threshold, hotkey, hotkey_timeout, is_auto_mode, status_callback, saved_callback, **options):
+        """添加一个监控来源，参数同 MonitorSession；监控进行中也可以添加。返回新建的会话"""
+        session = self.session_class(source, save_path, threshold, hotkey, hotkey_timeout, is_auto_mode,
+                                     status_callback, saved_callback, clock=self.clock, pool=self.pool,
+                                     effects=self.effects, **options)
+        with self._cond:
+            self.sessions.append(session)
+            if self._running:
+                self._executor.submit(self._step, session, True)
+        return session
+
+    def start(self):
+        """启动调度线程；各会话的第一次轮询错开，避免多个来源总是在同一时刻截图"""
+        with self._cond:
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="MonitorWorker")
+            for session in self.sessions:
+                self._executor.submit(self._step, session, True)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="MonitorScheduler")
+        self._thread.start()
+        logging.info(f"多来源监控启动: {len(self.sessions)} 个来源, {self.workers} 个工作线程。")
+
+    def stop(self):
+        for session in list(self.sessions):
+            session.stop()
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is None:
+            # 尚未启动（例如添加来源时出错），直接收尾已创建的会话
+            for session in list(self.sessions):
+                self._finish(session)
+            self.effects.close(timeout=2)
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _push(self, session, delay):
+        self._seq += 1
+        heapq.heappush(self._queue, (self.clock.now() + delay, self._seq, session))
+        self._cond.notify()
+
+    def _run(self):
+        """调度线程：等到队首会话到期，交给线程池执行一次轮询；所有会话都结束后退出"""
+        with self._cond:
+            while self._running and self.sessions:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                due, _, session = self._queue[0]
+                delay = due - self.clock.now()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                self._executor.submit(self._step, session, False)
+            leftover = [session for _, _, session in self._queue]
+            self._queue.clear()
+
+        # 等正在执行的轮询结束，再收尾仍在排队的会话
+        self._executor.shutdown(wait=True)
+        for session in leftover:
+            self._finish(session)
+        self.effects.close(timeout=2)
+        logging.info("多来源监控已停止。")
+
+    def _step(self, session, first):
+        try:
+            if first:
+                session.begin()
+                # 按加入顺序错开第一次轮询
+                index = self.sessions.index(session) if session in self.sessions else 0
+                delay = session.poller.interval * (1 + index / max(1, len(self.sessions)))
+            else:
+                delay = session.poll()
+        except Exception as e:
+            logging.error(f"监控来源出错 ({session.label}): {e}", exc_info=True)
+            delay = None
+
+        with self._cond:
+            if delay is not None and self._running:
+                self._push(session, delay)
+                return
+        self._finish(session)
+
+    def _finish(self, session):
+        with self._cond:
+            if session not in self.sessions:
+                return
+            self.sessions.remove(session)
+            if not self.sessions:
+                # 所有来源都已自行结束（窗口关闭、回放结束、出错），唤醒调度线程退出
+                self._cond.notify()
+        session.finish()
+        logging.info(f"来源监控结束: {session.label}")
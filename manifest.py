@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import logging
+import threading
+from writer import sequence_of
+
+# ---------------------------------------------------
+#  会话清单 (Session Manifest)
+#  截图目录中的 pptslicer_manifest.jsonl 按截取顺序逐行追加记录：
+#    {"type": "session", "session": ..., "time": ..., "source": ...}          开始一次监控
+#    {"type": "slide", "file": ..., "session": ..., "time": ..., "score": ...,
+#     "width": ..., "height": ..., "bytes": ..., "sha1": ..., "hash": ...}      保存了一张幻灯片
+#                                                    ("captured": 检测时间，精确到毫秒，按它排列截取顺序)
+#    {"type": "ref", "file": ..., "session": ..., "time": ..., "hash": ...}    回访了已保存的幻灯片
+#    {"type": "update", "file": ..., "steps": ..., ...}                         build 动画的下一步覆盖了该幻灯片
+#                                                                              (其余字段同 slide，覆盖原记录中的值)
+#    {"type": "step", "file": ..., "step": ..., "delta": ..., "x": ..., "y": ...}
+#                                                                              覆盖前保存的中间步骤差量 (builds.py)
+#  导出、去重、继续监控都从清单读取顺序和元数据，不再列目录、打开图片。
+# ---------------------------------------------------
+
+MANIFEST_FILENAME = "pptslicer_manifest.jsonl"
+LEGACY_INDEX_FILENAME = "pptslicer_index.jsonl"  # 旧版去重索引，首次建立清单时导入
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+
+
+def _capture_order(record):
+    """排序键：检测时间，相同时按文件名中的序号（导入的非截图文件没有序号，保持登记顺序）"""
+    sequence = sequence_of(record["file"])
+    return record.get("captured") or record.get("time") or "", -1 if sequence is None else sequence
+
+
+class SessionManifest:
+    """
+    :param save_path: 截图保存文件夹，清单文件存放在其中。
+    :param create: 清单不存在时是否建立（并导入目录中已有的图片）；只读取时传 False。
+    """
+    def __init__(self, save_path, create=True):
+        self.save_path = save_path
+        self.path = os.path.join(save_path, MANIFEST_FILENAME)
+        self.lock = threading.Lock()
+        self.slides = []
+        self.sessions = []
+        self.references = 0
+        self.steps = {}  # 文件名 -> [中间步骤差量记录, ...]
+        self._by_file = {}
+        if os.path.exists(self.path):
+            self._load()
+        elif create:
+            self._import_folder()
+
+    def _load(self):
+        start = time.perf_counter()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 上次异常退出时可能留下半行
+                kind = record.get("type")
+                if kind == "slide":
+                    self.slides.append(record)
+                    self._by_file[record.get("file")] = record
+                elif kind == "update":
+                    self._merge_update(record)
+                elif kind == "step":
+                    self.steps.setdefault(record.get("file"), []).append(record)
+                elif kind == "ref":
+                    self.references += 1
+                elif kind == "session":
+                    self.sessions.append(record)
+        logging.info(f"已加载会话清单: {len(self.slides)} 张幻灯片, {len(self.sessions)} 次会话 "
+                     f"({(time.perf_counter() - start) * 1000:.0f} 毫秒)。")
+
+    def _import_folder(self):
+        """首次在已有截图的目录中使用时，把现有图片（及旧版去重索引中的哈希）按文件名顺序登记一次"""
+        names = sorted(f for f in os.listdir(self.save_path) if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not names:
+            return
+        hashes = {}
+        legacy_path = os.path.join(self.save_path, LEGACY_INDEX_FILENAME)
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "file" in entry:
+                        hashes[entry["file"]] = entry.get("hash")
+        records = []
+        for name in names:
+            mtime = os.path.getmtime(os.path.join(self.save_path, name))
+            records.append({"type": "slide", "file": name, "session": "imported",
+                            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mtime)),
+                            "hash": hashes.get(name)})
+        self._append(*records)
+        self.slides.extend(records)
+        self._by_file.update((record["file"], record) for record in records)
+        logging.info(f"已为现有的 {len(records)} 张图片建立会话清单。")
+
+    def _merge_update(self, update):
+        slide = self._by_file.get(update.get("file"))
+        if slide is not None:
+            # 保留首次截取的时间，其余元数据以最新的一步为准
+            slide.update((key, value) for key, value in update.items()
+                         if key not in ("type", "time") and value is not None)
+
+    def _append(self, *records):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+    @staticmethod
+    def _now():
+        return time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def begin_session(self, source=None):
+        """登记一次新的监控会话，返回会话编号"""
+        session = time.strftime("%Y%m%d_%H%M%S")
+        record = {"type": "session", "session": session, "time": self._now(), "source": source}
+        with self.lock:
+            self._append(record)
+            self.sessions.append(record)
+        return session
+
+    def add_slide(self, filename, session=None, score=None, shape=None, info=None, slide_hash=None, captured=None):
+        """
+        登记一张已保存的幻灯片。
+        :param score: 触发保存时的差异分数 (0~1)。
+        :param shape: 图片的 numpy 形状。
+        :param info: 写入器提供的 {"bytes": 文件大小, "sha1": 内容哈希}。
+        :param slide_hash: 感知哈希 (int)。
+        :param captured: 画面的检测时间（"%Y-%m-%d %H:%M:%S.毫秒"），按它排列截取顺序；手动确认、回溯补存的截图保存得晚于检测。
+        """
+        record = {"type": "slide", "file": filename, "session": session, "time": self._now(),
+                  "score": None if score is None else round(score, 5),
+                  "width": shape[1] if shape is not None else None,
+                  "height": shape[0] if shape is not None else None,
+                  "hash": None if slide_hash is None else f"{slide_hash:x}"}
+        if captured is not None:
+            record["captured"] = captured
+        record.update(info or {})
+        with self.lock:
+            self._append(record)
+            self.slides.append(record)
+            self._by_file[filename] = record
+        return record
+
+    def update_slide(self, filename, steps, score=None, shape=None, info=None, slide_hash=None):
+        """
+        登记一次覆盖：build 动画的下一步写入了已登记的幻灯片文件，参数同 add_slide。
+        :param steps: 覆盖后这张幻灯片累计的步数（第一次覆盖为 2）。
+        """
+        record = {"type": "update", "file": filename, "time": self._now(), "steps": steps,
+                  "score": None if score is None else round(score, 5),
+                  "width": shape[1] if shape is not None else None,
+                  "height": shape[0] if shape is not None else None,
+                  "hash": None if slide_hash is None else f"{slide_hash:x}"}
+        record.update(info or {})
+        with self.lock:
+            self._append(record)
+            self._merge_update(record)
+        return record
+
+    def add_step(self, filename, step, delta_filename, box):
+        """
+        记录覆盖前保存的中间步骤差量。
+        :param step: 被覆盖的是第几步（从 1 开始）。
+        :param delta_filename: 差量图片相对于保存目录的路径。
+        :param box: 差量在截图中的位置 (x, y, w, h)。
+        """
+        x, y, w, h = box
+        record = {"type": "step", "file": filename, "step": step, "delta": delta_filename.replace(os.sep, "/"),
+                  "x": x, "y": y, "width": w, "height": h}
+        with self.lock:
+            self._append(record)
+            self.steps.setdefault(filename, []).append(record)
+        return record
+
+    def add_reference(self, filename, session=None, slide_hash=None):
+        """记录一次对已保存幻灯片的回访（不产生新文件）"""
+        record = {"type": "ref", "file": filename, "session": session, "time": self._now(),
+                  "hash": None if slide_hash is None else f"{slide_hash:x}"}
+        with self.lock:
+            self._append(record)
+            self.references += 1
+
+    def slide_files(self):
+        """
+        按截取顺序返回幻灯片文件名（补存的幻灯片按检测时间排在原来的位置）。
+        记录按写入完成的先后登记，多个写入线程下并不是截取顺序；时间相同时以文件名中的序号为准。
+        """
+        with self.lock:
+            records = sorted(self.slides, key=_capture_order)
+            return [record["file"] for record in records]
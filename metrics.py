@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+
+# ---------------------------------------------------
+#  热路径计时与指标导出
+#  各阶段（截图、颜色转换、差异计算、等待静止、编码、写盘、PDF 导出）用 timer() 计时，
+#  汇总为延迟直方图，并定期导出为 JSON 和 Prometheus 文本格式。
+#  未启用时 timer() 返回一个共享的空上下文，热路径上只多一次函数调用。
+# ---------------------------------------------------
+
+# 直方图桶的上界（秒）：0.1ms ~ 10s，按约 2.5 倍递增
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 状态栏摘要中显示的阶段: 阶段名 -> 显示名称
+SUMMARY_STAGES = (
+    ("capture", "截图"),
+    ("convert", "转换"),
+    ("diff", "差异"),
+    ("stabilize", "等静止"),
+    ("encode", "编码"),
+    ("write", "写盘"),
+)
+
+
+class Histogram:
+    """固定桶的延迟直方图（线程安全由 MetricsRegistry 负责）"""
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """按桶估算分位数（取所在桶的上界）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.counts)),
+        }
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """各阶段的延迟直方图与计数器"""
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+
+    def timer(self, name):
+        """with registry.timer("capture"): ... —— 记录代码块耗时"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "time": time.time(),
+                "uptime": time.time() - self.started,
+                "stages": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_prometheus(self):
+        """Prometheus 文本格式 (text exposition format 0.0.4)"""
+        lines = [
+            "# HELP pptslicer_stage_seconds 各处理阶段耗时",
+            "# TYPE pptslicer_stage_seconds histogram",
+        ]
+        with self.lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'pptslicer_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'pptslicer_stage_seconds_sum{{stage="{name}"}} {h.sum:.6f}')
+                lines.append(f'pptslicer_stage_seconds_count{{stage="{name}"}} {h.count}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE pptslicer_{name}_total counter")
+                lines.append(f"pptslicer_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary_line(self):
+        """状态栏用的一行摘要，如“截图 12.1ms | 差异 1.3ms | 编码 35.0ms”"""
+        parts = []
+        with self.lock:
+            for name, label in SUMMARY_STAGES:
+                h = self.histograms.get(name)
+                if h is not None and h.count:
+                    parts.append(f"{label} {h.sum / h.count * 1000:.1f}ms")
+        return " | ".join(parts) if parts else "暂无数据"
+
+    def export(self, path_prefix):
+        """写出 <path_prefix>.json 与 <path_prefix>.prom（先写临时文件再替换，读取方不会读到半个文件）"""
+        for extension, content in ((".json", json.dumps(self.snapshot(), indent=2, ensure_ascii=False)),
+                                   (".prom", self.to_prometheus())):
+            path = path_prefix + extension
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+
+
+class MetricsExporter:
+    """后台线程，每隔 interval 秒把指标导出到文件"""
+    def __init__(self, registry, path_prefix, interval=10.0):
+        self.registry = registry
+        self.path_prefix = path_prefix
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="MetricsExporter")
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._export()
+
+    def _export(self):
+        try:
+            self.registry.export(self.path_prefix)
+        except OSError as e:
+            logging.warning(f"导出指标失败: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        self._export()
+
+
+# 进程内共享的默认注册表，默认关闭
+registry = MetricsRegistry()
+timer = registry.timer
+observe = registry.observe
+count = registry.count
@@ -1,15 +1,56 @@
 import threading
-import time
 import os
-import cv2
-import numpy as np
+import time
 import utils
 import logging
+import metrics
+import numpy as np
+from sources import FrameSource, WindowSource, RealClock
+from detection import TiledChangeDetector, MotionHeatmap
+from dedup import SlideIndex, phash, fingerprint, same_slide
+from writer import ImageWriter, sequence_of
+from manifest import SessionManifest
+from polling import AdaptivePoller
+from calibration import ThresholdCalibrator
+from builds import BUILD_MODES, build_region, scale_box, delta_filename
+from buffers import BufferPool
+from pdf_export import LivePdf, LIVE_PDF_NAME
+from thumbnails import ThumbnailBuilder
+from effects import EffectScheduler
+from history import SlideHistory
+from roi import SlideRegionTracker
+
+class _Settling:
+    """等待静止的进度：触发翻页的帧、最近一帧、开始等待的时间、触发时的差异分数"""
+    def __init__(self, trigger_frame, start_time, score):
+        self.trigger_frame = trigger_frame
+        self.score = score
+        self.current = trigger_frame
+        self.start_time = start_time
 
-class MonitorThread(threading.Thread):
-    def __init__(self, hwnd, save_path, threshold, hotkey, hotkey_timeout, is_auto_mode, status_callback, saved_callback):
-        super().__init__(daemon=True, name="MonitorThread")
-        self.hwnd = hwnd
+
+class _SavedSlide:
+    """最近保存的一张幻灯片：build 动画的下一步与它的缩略图比较，并覆盖它的文件"""
+    def __init__(self, filename, thumb, bgr, in_pdf):
+        self.filename = filename
+        self.thumb = thumb
+        self.bgr = bgr  # 只在保留中间步骤时持有，用于裁出差量
+        self.in_pdf = in_pdf
+        self.steps = 1
+
+
+class MonitorSession:
+    """
+    单个来源的监控状态与检测逻辑，不自带线程：每调用一次 poll() 处理一次轮询，并返回距下一次轮询的秒数。
+    MonitorThread 用一个专属线程驱动它；MonitorManager 用共享的调度线程和线程池同时驱动多个会话。
+    """
+    def __init__(self, source, save_path, threshold, hotkey, hotkey_timeout, is_auto_mode, status_callback, saved_callback, clock=None, dedup_mode="skip", image_format="png", image_quality=None, max_poll_interval=1.0, pool=None, label=None, ignore_regions=None, auto_mask=True, live_pdf=False, pdf_preset="original", auto_threshold=False, build_mode="off", effects=None, recall_hotkey=None, history_mb=64, stable_threshold=0.5, required_stable_count=2, slide_region="off", thumbnail_mb=0):
+        # 兼容旧调用方式：直接传入窗口句柄时包装为实时窗口来源
+        if not isinstance(source, FrameSource):
+            source = WindowSource(source)
+        self.source = source
+        self.label = label or source.describe()
+        self.clock = clock or RealClock()
         self.save_path = save_path
         self.hotkey = hotkey
         self.hotkey_timeout = hotkey_timeout
@@ -22,97 +63,354 @@ class MonitorThread(threading.Thread):
         self.status_callback = status_callback
         self.saved_callback = saved_callback
         
-        logging.info(f"MonitorThread 初始化... (全自动模式: {self.is_auto_mode})")
+        logging.info(f"监控会话初始化: {self.label} (全自动模式: {self.is_auto_mode})")
         
-        initial_frame = utils.capture_window(self.hwnd)
+        initial_frame = self.source.read(self.clock.now())
         if initial_frame is None:
-             error_msg = "无法捕获目标窗口，请确保窗口可见且未最小化。"
+             error_msg = "无法捕获目标窗口，请确保窗口可见且未最小化。" if self.source.is_live else f"无法读取回放来源: {self.source.describe()}"
              logging.error(error_msg)
              raise ValueError(error_msg)
         
-        height, width, _ = initial_frame.shape
-        total_pixels_value = height * width * 255
-        
-        self.trigger_threshold = (threshold / 100.0) * total_pixels_value
-        self.stable_threshold = 0.005 * total_pixels_value
+        # 截图、缩略图、灰度图、差异图都从缓冲池中复用，轮询时基本不再分配大数组
+        # (多个会话可以共用一个缓冲池)
+        self.pool = pool or BufferPool()
+        # 幻灯片区域: "off" 截取完整画面, "auto" 自动检测, [x, y, w, h] 手动指定（按完整画面宽高的比例）；
+        # 确定后来源只截取这一块，比较、保存的也都是这一块
+        self.region_tracker = SlideRegionTracker(slide_region) if slide_region != "off" else None
+        if self.region_tracker is not None and self.source.region is None:
+            region = self.region_tracker.update(self.source, initial_frame, self.clock.now())
+            if region is not None:
+                initial_frame = self._crop(initial_frame, region)
+        self._frame_shape = initial_frame.shape
+        self.pool.release(initial_frame)
+
+        # 阈值统一用“平均像素差 / 255”表示，与窗口分辨率无关
+        self.detector = TiledChangeDetector(pool=self.pool, ignore_regions=ignore_regions)
+        # 自动屏蔽嵌入视频、摄像头画面、时钟等持续变化的区域
+        self.heatmap = MotionHeatmap() if auto_mask else None
+        self.trigger_threshold = threshold / 100.0
+        # 等待静止时：差异低于 stable_threshold (百分比) 的帧连续出现 required_stable_count 次即判定稳定
+        self.stable_threshold = self.manual_stable = stable_threshold / 100.0
+        # 空闲画面的噪声底始终统计：自动阈值按它校准触发与稳定阈值，手动阈值只在热身期间使用；
+        # 手动阈值时只在噪声高于稳定阈值时抬高稳定阈值（不超过触发阈值），否则采集噪声大的来源每页都要等到超时
+        self.auto_threshold = auto_threshold
+        self.calibrator = ThresholdCalibrator() if auto_threshold else ThresholdCalibrator(warmup=1.0)
+        self._reported_trigger = None
+        # 轮询间隔随画面运动情况自适应调整
+        self.poller = AdaptivePoller(max_interval=max_poll_interval, required_stable_count=required_stable_count)
+        self.stats_interval = 60.0
+        self.next_stats = None
         
         self.stop_event = threading.Event()
-        self.previous_frame_gray = None
+        self.previous_frame = None
+        # 阈值以下的明显运动期间，比较基准固定在运动开始前的画面上（淡入、慢速擦除的每一小步都低于阈值，
+        # 逐帧滑动基准就永远不会触发）；这里保存运动中最近的一帧和运动开始的时间，运动停止后才移动基准
+        self.motion_frame = None
+        self.motion_start = None
+        self.last_diff = None  # 最近一次比较的分块结果，供调用方查看哪些区域发生了变化
+        self.settling = None  # 检测到翻页后、画面稳定前的等待状态
+        self.trigger_score = None  # 最近一次翻页的差异分数，随截图记入会话清单
         self.pending_screenshot = None
+        self.pending_hash = None
+        self.pending_print = None  # 去重确认用的指纹 (dedup.fingerprint)
+        self.pending_score = None
+        self.pending_thumb = None
+        self.pending_build = None  # (被覆盖的 _SavedSlide, 变化区域)，不是 build 动画的下一步时为 None
         self.lock = threading.Lock()
+
+        # build 动画: "off" 不合并（触发保存的步骤各自保存）, "coalesce" 下一步覆盖上一步, "deltas" 覆盖并把上一步存为差量
+        if build_mode not in BUILD_MODES:
+            raise ValueError(f"未知的 build 动画处理方式: {build_mode}")
+        self.build_mode = build_mode
+        self.last_slide = None
+
+        # 手动模式：最近的稳定画面压缩后留在内存中（总大小不超过 history_mb），错过确认的幻灯片可以用回溯快捷键补存
+        self.history = SlideHistory(int(history_mb * 1024 * 1024)) if not is_auto_mode and history_mb else None
+        self.recall_hotkey = recall_hotkey
+        self.pending_recalls = 0  # 回溯快捷键按下的次数，由驱动会话的线程补存 (save_recalled)
+        self.pending_entry = None
+        self.pending_captured = None
+        self.last_captured = 0  # 上一张幻灯片的检测时间（毫秒）
+
+        # 重复幻灯片处理: "skip" 跳过, "reference" 跳过并记录回访, "off" 不去重
+        self.dedup_mode = dedup_mode
+        # 会话清单记录每张截图的顺序与元数据，去重索引和截图序号都从清单恢复，不再扫描目录
+        self.manifest = SessionManifest(save_path)
+        self.session_id = None
+        self.slide_index = SlideIndex(self.manifest) if dedup_mode != "off" else None
+
+        # 编码与写盘在后台线程完成，不阻塞检测循环和键盘钩子线程
+        last_sequence = max((sequence_of(f) or 0 for f in self.manifest.slide_files()), default=0)
+        self.writer = ImageWriter(save_path, image_format, image_quality, status_callback=self.status_callback,
+                                  start_sequence=last_sequence)
+        # 会话模式：每保存一张就追加到截图目录下的实时 PDF，结束时无需再整体导出
+        self.live_pdf = LivePdf(os.path.join(save_path, LIVE_PDF_NAME), pdf_preset) if live_pdf else None
+        # 保存后在后台用内存中的画面生成缩略图（缓存上限 thumbnail_mb，0 为不生成），回看和概览图不必再解码原图
+        self.thumbnails = ThumbnailBuilder(save_path, thumbnail_mb) if thumbnail_mb else None
         
+        # 提示音、成功音、快捷键、确认超时都在副作用调度器的线程中执行（多个会话可以共用一个调度器）
+        self._owns_effects = effects is None
+        self.effects = effects or EffectScheduler.platform_default(name=f"Effects-{self.label}")
+        self._confirm_timeout = None  # 手动模式下当前待确认截图的超时任务
+
         self.prompt_sound_path = os.path.join("notify", "10.wav")
         self.success_sound_path = os.path.join("notify", "22.wav")
 
-    def run(self):
-        """线程主循环"""
-        logging.info("监控线程启动。")
+    def begin(self):
+        """开始监控：取第一帧作为比较基准"""
+        logging.info(f"开始监控: {self.label}")
+        self.session_id = self.manifest.begin_session(self.label)
         self.status_callback("状态：监控中..." + (" [全自动]" if self.is_auto_mode else ""))
+        if self.history is not None and self.recall_hotkey:
+            self.effects.register_hotkey(self.recall_hotkey, self._request_recall, owner=(self, "recall"))
         
-        frame = utils.capture_window(self.hwnd)
-        if frame is not None:
-            self.previous_frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        while not self.stop_event.is_set():
-            time.sleep(0.5)
-            
-            frame = utils.capture_window(self.hwnd)
-            if frame is None:
-                self._handle_window_loss()
-                break
+        now = self.clock.now()
+        self.previous_frame = self._read_frame(now)
+        self.poller.record_poll(now)
+        self.next_stats = now + self.stats_interval
 
-            current_frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            if self.previous_frame_gray is not None:
-                diff = cv2.absdiff(self.previous_frame_gray, current_frame_gray)
-                diff_sum = np.sum(diff)
-
-                if diff_sum > self.trigger_threshold:
-                    if self.pending_screenshot is None:
-                        logging.info(f"[!] 检测到翻页 (差异: {diff_sum:.0f})，等待静止...")
-                        
-                        stable_frame = self._wait_for_stable(current_frame_gray)
-                        
-                        if stable_frame is not None:
-                            self._trigger_screenshot_process(stable_frame)
-                            self.previous_frame_gray = cv2.cvtColor(stable_frame, cv2.COLOR_BGR2GRAY)
-                        else:
-                            logging.warning("等待超时。")
-                            self.previous_frame_gray = current_frame_gray
-                else:
-                    self.previous_frame_gray = current_frame_gray
-
-    def _wait_for_stable(self, last_gray_frame):
-        start_time = time.time()
-        max_wait_time = 4.0
-        stable_count = 0
-        required_stable_count = 2
-        current_gray = last_gray_frame
-        
-        while time.time() - start_time < max_wait_time:
-            time.sleep(0.1)
-            frame = utils.capture_window(self.hwnd)
-            if frame is None: return None
-            new_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            diff = cv2.absdiff(current_gray, new_gray)
-            diff_sum = np.sum(diff)
-            
-            if diff_sum < self.stable_threshold:
-                stable_count += 1
-                if stable_count >= required_stable_count:
-                    logging.info("画面已稳定。")
-                    return frame
+    def finish(self):
+        """结束监控：输出统计并把队列中尚未写完的截图写完"""
+        self.poller.log_stats()
+        self._clear_motion()
+        self.save_recalled()
+        self.writer.close(timeout=10)
+        if self.live_pdf is not None:
+            self.live_pdf.close(timeout=10)
+        if self.thumbnails is not None:
+            self.thumbnails.close(timeout=10)
+        if self._owns_effects:
+            self.effects.close(timeout=2)
+
+    @property
+    def frame_shape(self):
+        """最近一帧（启用 slide_region 时为幻灯片区域）的尺寸 (高, 宽, 3)"""
+        return self._frame_shape
+
+    def poll(self):
+        """处理一次轮询，返回距下一次轮询的秒数；监控应结束时返回 None"""
+        if self.stop_event.is_set():
+            return None
+        self.save_recalled()
+        with metrics.timer("poll"):
+            return self._poll(self.clock.now())
+
+    def _poll(self, now):
+        if self.settling is not None:
+            return self._poll_settling(now)
+
+        current_frame = self._read_frame(now)
+        if current_frame is None:
+            self._handle_window_loss()
+            return None
+        previous_poll = self.poller.last_poll
+        self.poller.record_poll(now)
+        if now >= self.next_stats:
+            self.poller.log_stats()
+            self.next_stats = now + self.stats_interval
+
+        if self.previous_frame is None:
+            self.previous_frame = current_frame
+            return self.poller.interval
+
+        result = self.detector.compare(self.previous_frame, current_frame)
+        self.last_diff = result
+        self._learn_motion(result)
+
+        if result.score > self.trigger_threshold:
+            if self.pending_screenshot is None:
+                logging.info(f"[!] 检测到翻页 (差异: {result.score:.2%}, 变化区块: {result.changed_count})，等待静止...")
+                self.poller.begin_transition(previous_poll)
+                metrics.count("transitions")
+                self.settling = _Settling(current_frame, now, result.score)
+                self._clear_motion()
+                return self.poller.min_interval
+            current_frame.release()
+        else:
+            self.poller.observe(result, self.trigger_threshold)
+            if self._track_motion(result, current_frame, now):
+                return self.poller.interval
+            # 刚结束等待静止时距上一次空闲轮询较久，按最长轮询间隔计权
+            self._calibrate(result, min(now - previous_poll, self.poller.max_interval))
+            self._replace_previous(current_frame)
+        return self.poller.interval
+
+    def _track_motion(self, result, current_frame, now):
+        """
+        未触发翻页的一帧：运动仍在进行时保留比较基准并返回 True（current_frame 记为运动中的最近一帧）；
+        画面没有明显变化、运动已停止或持续过久时返回 False，由调用方把基准移到这一帧。
+        """
+        moving = result.score >= self.trigger_threshold / 4
+        if self.motion_frame is not None:
+            step = self.detector.compare(self.motion_frame, current_frame)
+            # 与运动中的上一帧相比没有任何区块变化：这次变化停在阈值以下（如光标、小动画），基准跟上；
+            # 持续超过最长等待静止时间的运动（嵌入视频尚未被屏蔽）同样不再累计
+            moving = step.changed_count > 0 and now - self.motion_start < self.poller.max_settle_time
+            self.motion_frame.release()
+            self.motion_frame = None
+        elif moving:
+            self.motion_start = now
+        if moving:
+            self.motion_frame = current_frame
+        return moving
+
+    def _calibrate(self, result, seconds):
+        if not self.calibrator.observe(result.score, seconds):
+            return
+        if not self.auto_threshold:
+            stable = min(self.trigger_threshold, max(self.manual_stable, self.calibrator.stable))
+            if stable != self.stable_threshold and abs(stable - self.stable_threshold) > 0.2 * self.stable_threshold:
+                logging.info(f"画面噪声 {self.calibrator.noise_high:.3%} 高于稳定阈值，稳定阈值调整为 {stable:.2%}")
+            self.stable_threshold = stable
+            return
+        self.trigger_threshold = self.calibrator.trigger
+        self.stable_threshold = self.calibrator.stable
+        # 阈值变化超过 20% 时才记录，避免刷屏
+        reported = self._reported_trigger
+        if reported is None or abs(self.trigger_threshold - reported) > 0.2 * reported:
+            self._reported_trigger = self.trigger_threshold
+            logging.info(f"自动阈值: 触发 {self.trigger_threshold:.2%}, 稳定 {self.stable_threshold:.2%} "
+                         f"(噪声 {self.calibrator.noise_floor:.3%} ~ {self.calibrator.noise_high:.3%})")
+
+    def _read_frame(self, now):
+        """从来源读取一帧到缓冲池的缓冲区中，返回 Frame；来源失效或结束时返回 None"""
+        tracker = self.region_tracker
+        previous_region = None
+        if tracker is not None and tracker.needs_full_frame(self.source, now):
+            # 复查或确认幻灯片区域：这一次读取完整画面
+            previous_region = (self.source.region, self.source.region_size)
+            self.source.set_region(None, None)
+        out = self.pool.acquire(self._frame_shape)
+        # 实时来源为截图 + 转换，回放来源为解码
+        with metrics.timer("read_frame"):
+            bgr = self.source.read(now, out)
+        if bgr is not out:
+            # 尺寸变化（或来源结束）时来源会返回新数组，原缓冲归还
+            self.pool.release(out)
+            if bgr is None:
+                return None
+            self._frame_shape = bgr.shape
+        if tracker is not None and self.source.region is None:
+            region = tracker.update(self.source, bgr, now, previous_region)
+            if region is not None:
+                bgr = self._crop(bgr, region)
+        return self.detector.frame(bgr)
+
+    def _crop(self, bgr, region):
+        """把完整画面裁剪为幻灯片区域（复制到缓冲池的缓冲区，原数组归还）"""
+        x, y, w, h = region
+        cropped = self.pool.acquire((h, w, 3))
+        np.copyto(cropped, bgr[y:y + h, x:x + w])
+        self.pool.release(bgr)
+        self._frame_shape = cropped.shape
+        return cropped
+
+    def _learn_motion(self, result):
+        if self.heatmap is not None and self.heatmap.update(result, self.clock.now()):
+            if (self.detector.learned_mask is None) != (self.heatmap.mask is None):
+                # 开始或停止屏蔽时，之前统计的噪声（很可能正来自这些区域）不再适用；
+                # 边缘块时进时出不重新统计，它们的运动本身就是噪声的一部分
+                self.calibrator.reset()
+            self.detector.learned_mask = self.heatmap.mask
+            if self.heatmap.mask is None:
+                logging.info("持续变化的区域已静止，恢复检测。")
             else:
-                stable_count = 0
-            current_gray = new_gray
-            
-        return frame
+                logging.info(f"自动屏蔽持续变化的区域: {int(self.heatmap.mask.sum())} 块。")
+
+    def _clear_motion(self):
+        if self.motion_frame is not None:
+            self.motion_frame.release()
+            self.motion_frame = None
+
+    def _replace_previous(self, frame):
+        if self.previous_frame is not None and self.previous_frame is not frame:
+            self.previous_frame.release()
+        self.previous_frame = frame
+
+    def _poll_settling(self, now):
+        """等待静止期间的一次轮询：两帧几乎相同立即判定稳定；差异小但不为零时仍需连续多帧低于稳定阈值"""
+        settling = self.settling
+        new = self._read_frame(now)
+        if new is None:
+            if settling.current is not settling.trigger_frame:
+                settling.current.release()
+            self.settling = None
+            self.poller.end_transition(now)
+            self._replace_previous(settling.trigger_frame)
+            self._handle_window_loss()
+            return None
+
+        # 与静止计数开始时的那一帧比较，而不是与上一帧：慢速淡入每 0.1 秒的变化都很小，逐帧比较会在中途误判为静止
+        result = self.detector.compare(settling.current, new)
+        self._learn_motion(result)
+        stable = self.poller.settled(result, self.stable_threshold)
+        timed_out = not stable and self.clock.now() - settling.start_time >= self.poller.max_settle_time
+        if stable or timed_out or self.poller.stable_count == 0:
+            # 触发帧在翻页处理完后统一释放，这里只释放等待过程中读到的中间帧
+            if settling.current is not settling.trigger_frame:
+                settling.current.release()
+            settling.current = new
+        else:
+            new.release()
+
+        if stable:
+            logging.info("画面已稳定。")
+            return self._end_settling(settling.current)
+        if timed_out:
+            logging.warning("等待静止超时，使用最后一帧。")
+            return self._end_settling(settling.current)
+        return self.poller.min_interval
+
+    def _end_settling(self, stable_frame):
+        settling, self.settling = self.settling, None
+        trigger_frame = settling.trigger_frame
+        latency = self.poller.end_transition(self.clock.now())
+        # 从检测到翻页到画面稳定的等待时间
+        metrics.observe("stabilize", self.clock.now() - settling.start_time)
+        logging.info(f"检测延迟: {latency:.2f} 秒。")
+        self.trigger_score = settling.score
+        self._trigger_screenshot_process(stable_frame)
+        if stable_frame is not trigger_frame:
+            trigger_frame.release()
+        self._replace_previous(stable_frame)
+        return self.poller.interval
 
     def _trigger_screenshot_process(self, stable_frame):
         """根据模式决定是直接保存还是等待按键"""
+        slide_hash = slide_print = None
+        if self.slide_index is not None:
+            slide_hash = phash(stable_frame.thumb)
+            slide_print = fingerprint(stable_frame.thumb)
+            duplicate = self._find_duplicate(stable_frame, slide_hash, slide_print)
+            if duplicate is not None:
+                logging.info(f"重复幻灯片 (与 {duplicate} 相同)，不再保存。")
+                metrics.count("duplicates_skipped")
+                if self.dedup_mode == "reference":
+                    self.manifest.add_reference(duplicate, self.session_id, slide_hash)
+                # 回到了别的幻灯片，之后出现的内容不再是上一张保存的幻灯片的下一步
+                self.last_slide = None
+                return
+
+        build = self._find_build_step(stable_frame)
+        # 稳定帧原图直接交给写入线程，不再复制；此后缓冲池不会回收它
+        image = stable_frame.detach()
+        # 检测时间精确到毫秒，手动确认或回溯补存的截图都按它排列顺序；
+        # 同一毫秒内连续提交（录像批量保存）时顺延 1 毫秒，保证本会话的检测时间严格递增
+        millis = max(int(time.time() * 1000), self.last_captured + 1)
+        self.last_captured = millis
+        captured = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(millis // 1000)) + f".{millis % 1000:03d}"
+        entry = None
+        if self.history is not None:
+            entry = self.history.add(image, captured, self.trigger_score, slide_hash)
         with self.lock:
-            self.pending_screenshot = stable_frame.copy()
+            self.pending_screenshot = image
+            self.pending_captured = captured
+            self.pending_hash = slide_hash
+            self.pending_print = slide_print
+            self.pending_score = self.trigger_score
+            self.pending_thumb = stable_frame.thumb.copy() if self.build_mode != "off" else None
+            self.pending_build = build
+            self.pending_entry = entry
 
         # ---------------------------------------------------
         #  vvv 核心分流逻辑 vvv
@@ -124,15 +422,71 @@ class MonitorThread(threading.Thread):
         else:
             logging.info("手动模式：等待按键确认。")
             # 播放“请按键”的提示音
-            utils.play_sound_async(self.prompt_sound_path)
-            utils.setup_hotkey(self.hotkey, self.save_pending_screenshot)
-            threading.Timer(self.hotkey_timeout, self.cancel_pending_screenshot).start()
+            self.effects.play_sound(self.prompt_sound_path)
+            self.effects.register_hotkey(self.hotkey, self.save_pending_screenshot, owner=self)
+            # 新的待确认截图重新计时，上一张的超时不再生效
+            if self._confirm_timeout is not None:
+                self._confirm_timeout.cancel()
+            self._confirm_timeout = self.effects.call_later(self.hotkey_timeout, self.cancel_pending_screenshot,
+                                                            self.pending_screenshot)
         # ---------------------------------------------------
 
+    def _find_build_step(self, stable_frame):
+        """稳定画面只是在上一张保存的幻灯片的空白处追加了内容时，返回 (上一张幻灯片, 变化区域)，否则返回 None"""
+        last = self.last_slide
+        if self.build_mode == "off" or last is None or last.thumb.shape != stable_frame.thumb.shape:
+            return None
+        box = build_region(last.thumb, stable_frame.thumb, self.detector.thumb_mask(stable_frame.shape))
+        if box is None:
+            return None
+        logging.info(f"build 动画的下一步 (在 {last.filename} 的空白处追加了内容)。")
+        return last, box
+
+    def submit_slide(self, bgr, score=None):
+        """
+        把在别处检测到的稳定画面（如批量提取的工作进程）按与实时监控相同的流程去重、保存、记入清单。
+        :param bgr: 稳定画面，保存时直接交给写入线程，调用方之后不得再修改它。
+        :param score: 触发翻页时的差异分数。
+        """
+        frame = self.detector.frame(bgr)
+        frame.detach()  # 原图不是缓冲池分配的，不能归还缓冲池
+        self.trigger_score = score
+        self._trigger_screenshot_process(frame)
+        frame.release()
+
+    def _find_duplicate(self, stable_frame, slide_hash, slide_print):
+        """哈希筛出候选后与候选的指纹逐块确认（容忍 JPEG 压缩和采集噪声），只比较内存中的小图"""
+        keep = self.detector.thumb_mask(stable_frame.shape)
+        for filename in self.slide_index.candidates(slide_hash):
+            saved_print = self.slide_index.fingerprint(filename)
+            if saved_print is None:
+                # 之前会话保存的幻灯片：读取一次原图生成指纹，之后不再读文件
+                saved = utils.read_image(os.path.join(self.save_path, filename))
+                if saved is None:
+                    continue
+                saved_print = self._fingerprint_of(saved)
+                self.slide_index.set_fingerprint(filename, saved_print)
+            if same_slide(saved_print, slide_print, keep, (self.detector.rows, self.detector.cols),
+                          self.detector.noise_level):
+                return filename
+        return None
+
+    def _fingerprint_of(self, image):
+        frame = self.detector.frame(image)
+        frame.detach()
+        slide_print = fingerprint(frame.thumb)
+        frame.release()
+        return slide_print
+
     def _handle_window_loss(self):
-        logging.warning("窗口丢失。")
-        self.status_callback("状态：目标窗口丢失，监控已停止。")
-        utils.remove_hotkey()
+        if self.source.is_live:
+            logging.warning("窗口丢失。")
+            self.status_callback("状态：目标窗口丢失，监控已停止。")
+        else:
+            logging.info(f"回放结束: {self.source.describe()}")
+            self.status_callback("状态：回放结束。")
+        self._remove_hotkeys()
+        self.source.close()
         self.stop_event.set()
 
     def save_pending_screenshot(self):
@@ -140,37 +494,162 @@ class MonitorThread(threading.Thread):
         with self.lock:
             if self.pending_screenshot is not None:
                 img_to_save = self.pending_screenshot
+                slide_hash = self.pending_hash
+                slide_print = self.pending_print
+                score = self.pending_score
+                thumb = self.pending_thumb
+                build = self.pending_build
+                entry = self.pending_entry
+                captured = self.pending_captured
                 self.pending_screenshot = None
         
-        utils.remove_hotkey()
+        if self._confirm_timeout is not None:
+            self._confirm_timeout.cancel()
+        self.effects.remove_hotkey(owner=self)
 
         if img_to_save is not None:
-            try:
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                filename = f"screenshot_{timestamp}.png"
-                filepath = os.path.normpath(os.path.join(self.save_path, filename))
-
-                is_success, buffer = cv2.imencode(".png", img_to_save)
-                if is_success:
-                    with open(filepath, 'wb') as f:
-                        f.write(buffer)
-                    logging.info(f"保存成功: {filepath}")
-                    self.saved_callback()
-                    # 无论自动还是手动，保存成功都播放成功音效
-                    utils.play_sound_async(self.success_sound_path)
-                else:
-                    raise IOError("编码失败")
-            except Exception as e:
-                logging.error(f"保存失败: {e}")
-                self.status_callback("状态：保存失败！")
-
-    def cancel_pending_screenshot(self):
+            # 被覆盖的仍须是最近保存的那一张（手动模式下确认前可能又保存了别的幻灯片）
+            if build is not None and build[0] is self.last_slide:
+                self._replace_slide(build[0], build[1], img_to_save, thumb, slide_hash, score)
+                if entry is not None:
+                    entry.filename = build[0].filename
+                return
+
+            def on_saved(filename, info):
+                self.manifest.add_slide(filename, self.session_id, score, img_to_save.shape, info, slide_hash,
+                                        captured=captured)
+                if slide_hash is not None and self.slide_index is not None:
+                    self.slide_index.add(slide_hash, filename, slide_print)
+                if self.thumbnails is not None:
+                    self.thumbnails.submit(filename, img_to_save, info.get("sha1"))
+                self.saved_callback()
+                # 无论自动还是手动，保存成功都播放成功音效
+                self.effects.play_sound(self.success_sound_path)
+
+            filename = self.writer.submit(img_to_save, on_saved)
+            if filename is None:
+                return
+            if entry is not None:
+                entry.filename = filename
+            in_pdf = self.live_pdf is not None and self.live_pdf.submit(img_to_save)
+            if self.build_mode != "off":
+                self.last_slide = _SavedSlide(filename, thumb, img_to_save if self.build_mode == "deltas" else None, in_pdf)
+
+    def _replace_slide(self, slide, box, image, thumb, slide_hash, score):
+        """build 动画的下一步：覆盖上一张截图的文件和实时 PDF 的最后一页，不新增文件"""
+        filename = slide.filename
+        step = slide.steps
+        if self.build_mode == "deltas":
+            # 被改动的区域在上一步中的样子（几乎都是背景），由最终画面贴回即可还原上一步
+            x, y, w, h = scale_box(box, thumb.shape, image.shape[:2])
+            delta = slide.bgr[y:y + h, x:x + w].copy()
+            self.writer.submit(delta, lambda name, info: self.manifest.add_step(filename, step, name, (x, y, w, h)),
+                               filename=delta_filename(filename, step, self.writer.extension))
+            slide.bgr = image
+        slide.steps = steps = step + 1
+        slide.thumb = thumb
+
+        def on_replaced(name, info):
+            self.manifest.update_slide(name, steps, score, image.shape, info, slide_hash)
+            if slide_hash is not None and self.slide_index is not None:
+                self.slide_index.add(slide_hash, name, fingerprint(thumb))
+            if self.thumbnails is not None:
+                self.thumbnails.submit(name, image, info.get("sha1"))
+            self.effects.play_sound(self.success_sound_path)
+
+        if self.writer.submit(image, on_replaced, filename=filename) is None:
+            return
+        if self.live_pdf is not None:
+            slide.in_pdf = self.live_pdf.submit(image, replace_last=slide.in_pdf)
+        metrics.count("builds_coalesced")
+        logging.info(f"build 动画第 {steps} 步，覆盖 {filename}。")
+
+    def cancel_pending_screenshot(self, expected=None):
+        """:param expected: 只取消这一张待确认截图（超时任务传入），已被新的截图替换时不做任何事"""
         with self.lock:
-            if self.pending_screenshot is not None:
+            if self.pending_screenshot is not None and (expected is None or expected is self.pending_screenshot):
                 logging.info("超时取消。")
                 self.pending_screenshot = None
-                utils.remove_hotkey()
+                self.effects.remove_hotkey(owner=self)
+
+    def _request_recall(self):
+        """回溯快捷键（音效线程）：只记下按键，补存留给下一次轮询，不阻塞音效和其它快捷键"""
+        with self.lock:
+            self.pending_recalls += 1
+
+    def save_recalled(self):
+        """
+        补存回溯快捷键按下后排队的幻灯片，由驱动会话的线程调用：
+        poll()、finish()，或截图子进程模式下不轮询的保存端由转发线程调用。
+        """
+        with self.lock:
+            recalls, self.pending_recalls = self.pending_recalls, 0
+        if recalls:
+            self.save_previous(recalls)
+
+    def save_previous(self, count=1):
+        """
+        从回溯缓存中补存最近 count 张没有保存的稳定画面（不含正在等待确认的那张），按检测的先后保存。
+        回溯快捷键每按一次补存一张，连按几次依次补存更早的几张；须在驱动会话的线程中调用（见 save_recalled）。
+        :return: 补存的张数。
+        """
+        if self.history is None:
+            return 0
+        with self.lock:
+            waiting = self.pending_entry if self.pending_screenshot is not None else None
+        entries = self.history.unsaved(exclude=waiting)[-count:]
+        if not entries:
+            logging.info("回溯缓存中没有未保存的幻灯片。")
+            return 0
+        for entry in entries:
+            image = entry.image()
+            slide_print = self._fingerprint_of(image) if entry.slide_hash is not None else None
+
+            def on_saved(filename, info, entry=entry, image=image, slide_print=slide_print):
+                # 会话清单按检测时间排列，补存的幻灯片在导出时仍排在原来的位置
+                self.manifest.add_slide(filename, self.session_id, entry.score, image.shape, info, entry.slide_hash,
+                                        captured=entry.time)
+                if entry.slide_hash is not None and self.slide_index is not None:
+                    self.slide_index.add(entry.slide_hash, filename, slide_print)
+                if self.thumbnails is not None:
+                    self.thumbnails.submit(filename, image, info.get("sha1"))
+                self.saved_callback()
+                self.effects.play_sound(self.success_sound_path)
+
+            filename = self.writer.submit(image, on_saved)
+            if filename is None:
+                break
+            entry.filename = filename
+            if self.live_pdf is not None:
+                self.live_pdf.submit(image)
+        logging.info(f"补存 {len(entries)} 张之前检测到的幻灯片。")
+        return len(entries)
+
+    def _remove_hotkeys(self):
+        self.effects.remove_hotkey(owner=self)
+        if self.recall_hotkey:
+            self.effects.remove_hotkey(owner=(self, "recall"))
 
     def stop(self):
         self.stop_event.set()
-        utils.remove_hotkey()
\ No newline at end of file
+        self._remove_hotkeys()
+
+
+class MonitorThread(MonitorSession, threading.Thread):
+    """用一个专属线程驱动单个监控会话（单窗口监控、录像回放）"""
+    def __init__(self, *args, **kwargs):
+        threading.Thread.__init__(self, daemon=True, name="MonitorThread")
+        MonitorSession.__init__(self, *args, **kwargs)
+
+    def run(self):
+        """线程主循环"""
+        self.begin()
+        try:
+            delay = self.poller.interval
+            while not self.stop_event.is_set():
+                self.clock.sleep(delay)
+                delay = self.poll()
+                if delay is None:
+                    break
+        finally:
+            self.finish()
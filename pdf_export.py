@@ -0,0 +1,400 @@
+import io
+import os
+import re
+import time
+import zlib
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import metrics
+from manifest import SessionManifest, IMAGE_EXTENSIONS
+
+# ---------------------------------------------------
+#  流式 PDF 导出
+#  - 每页图片在进程池中解码/缩放/编码，主进程只按顺序把结果写进 PDF，
+#    任何时刻内存中只有“预取窗口”内的几页，与幻灯片总数无关；
+#  - 原图为 JPEG 且无需缩放时直接嵌入原始数据 (DCTDecode)，不重新编码；
+#  - 预设控制目标 DPI 和 JPEG 质量，从而控制 PDF 体积。
+# ---------------------------------------------------
+
+SLIDE_WIDTH_INCH = 13.333  # PowerPoint 宽屏 (16:9) 幻灯片宽度
+LEGACY_DPI = 100.0  # 原图预设沿用旧版导出的 100 DPI 页面尺寸
+LIVE_PDF_NAME = "pptslicer_live.pdf"  # 会话模式下在截图目录中实时更新的 PDF
+
+# 预设名 -> (显示名称, 目标 DPI, JPEG 质量)；DPI 为 None 表示保持原始像素，质量为 None 表示无损
+PDF_PRESETS = {
+    "original": ("原图 (无损)", None, None),
+    "high": ("高质量 (200 DPI)", 200, 92),
+    "standard": ("标准 (150 DPI)", 150, 85),
+    "compact": ("小体积 (96 DPI)", 96, 75),
+}
+
+
+def _page_size(width, height, dpi):
+    """返回 (页面宽pt, 页面高pt, 目标像素宽度)"""
+    if dpi is None:
+        return width / LEGACY_DPI * 72, height / LEGACY_DPI * 72, width
+    page_w = SLIDE_WIDTH_INCH * 72
+    return page_w, page_w * height / width, min(width, int(round(SLIDE_WIDTH_INCH * dpi)))
+
+
+def _encode_page(img, dpi, quality):
+    """把 PIL 图像缩放/编码为一页，返回格式同 _prepare_page"""
+    width, height = img.size
+    page_w, page_h, target_w = _page_size(width, height, dpi)
+    img = img.convert("L" if img.mode == "L" else "RGB")
+    if target_w < width:
+        target_h = max(1, int(round(height * target_w / width)))
+        img = img.resize((target_w, target_h), Image.LANCZOS)
+    colorspace = "/DeviceRGB" if img.mode == "RGB" else "/DeviceGray"
+
+    if quality is None:
+        data = zlib.compress(img.tobytes(), 6)
+        return img.width, img.height, colorspace, "/FlateDecode", data, page_w, page_h
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, optimize=True)
+    return img.width, img.height, colorspace, "/DCTDecode", buffer.getvalue(), page_w, page_h
+
+
+def _prepare_page(image_path, dpi, quality):
+    """
+    在工作进程中准备一页：返回 (宽, 高, 色彩空间, 滤镜, 数据, 页面宽pt, 页面高pt)；无法打开时返回 None。
+    """
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            _, _, target_w = _page_size(width, height, dpi)
+
+            # JPEG 直通：尺寸不变且色彩空间 PDF 可直接识别
+            if img.format == "JPEG" and target_w == width and img.mode in ("RGB", "L"):
+                with open(image_path, 'rb') as f:
+                    data = f.read()
+                page_w, page_h, _ = _page_size(width, height, dpi)
+                colorspace = "/DeviceRGB" if img.mode == "RGB" else "/DeviceGray"
+                return width, height, colorspace, "/DCTDecode", data, page_w, page_h
+
+            return _encode_page(img, dpi, quality)
+    except Exception as e:
+        print(f"[警告] 跳过无法打开的图片: {image_path}, 错误: {e}")
+        return None
+
+
+class StreamingPdfWriter:
+    """逐页写入的极简 PDF 写入器：只在内存中保留各对象的偏移量"""
+    PAGES_ID = 2
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    def _object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(f"{obj_id} 0 obj\n".encode())
+        self.file.write(body)
+        if stream is not None:
+            self.file.write(b"\nstream\n")
+            self.file.write(stream)
+            self.file.write(b"\nendstream")
+        self.file.write(b"\nendobj\n")
+
+    def add_page(self, width, height, colorspace, image_filter, data, page_w, page_h):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {colorspace} /BitsPerComponent 8 /Filter {image_filter} /Length {len(data)} >>"
+        ).encode(), data)
+        content = f"q {page_w:.2f} 0 0 {page_h:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(self.PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+
+        xref_offset = self.file.tell()
+        size = self.next_id
+        self.file.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        for obj_id in range(1, size):
+            self.file.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+        self.file.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+
+
+class IncrementalPdfWriter(StreamingPdfWriter):
+    """
+    每加一页就追加一个 PDF 增量更新段（新对象 + 新的页面树 + xref + trailer），
+    文件在每页写完后都是完整可读的 PDF；结束时只需关闭文件。
+    打开已有的实时 PDF 时从最后一个增量段恢复状态，继续追加。
+    """
+    def __init__(self, path):
+        self.offsets = {}
+        self.page_ids = []
+        self.prev_xref = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, 'r+b')
+            self._resume()
+        else:
+            self.file = open(path, 'w+b')
+            self.next_id = 3
+            self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+            self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+            self._commit([1])
+
+    def _resume(self):
+        """定位最后一个完整的增量段：截掉其后残缺的内容，读出页面列表和下一个对象号"""
+        self.file.seek(0, os.SEEK_END)
+        size = self.file.tell()
+        self.file.seek(max(0, size - 4096))
+        tail = self.file.read()
+        end = tail.rfind(b"%%EOF")
+        startxref = re.findall(rb"startxref\s+(\d+)", tail[:end]) if end >= 0 else []
+        if not startxref:
+            raise ValueError("不是有效的实时 PDF 文件")
+        self.file.truncate(size - len(tail) + end + len(b"%%EOF\n"))
+
+        self.prev_xref = int(startxref[-1])
+        self.file.seek(self.prev_xref)
+        section = self._read_until(b"startxref")
+        trailer = section.find(b"trailer")
+        match = re.search(rb"/Size (\d+)", section[trailer:])
+        if trailer < 0 or match is None:
+            raise ValueError("不是有效的实时 PDF 文件")
+        self.next_id = int(match.group(1))
+
+        # xref 中每个子段为 “起始对象号 数量” 加若干条 20 字节的记录
+        pages_offset = None
+        lines = section[:trailer].split(b"\n")[1:]
+        i = 0
+        while i < len(lines):
+            parts = lines[i].split()
+            i += 1
+            if len(parts) != 2:
+                continue
+            first, count = int(parts[0]), int(parts[1])
+            for k in range(count):
+                if first + k == self.PAGES_ID:
+                    pages_offset = int(lines[i + k][:10])
+            i += count
+        if pages_offset is None:
+            raise ValueError("不是有效的实时 PDF 文件")
+        self.file.seek(pages_offset)
+        pages = self._read_until(b"endobj")
+        kids = re.search(rb"/Kids \[([^\]]*)\]", pages)
+        self.page_ids = [int(n) for n in re.findall(rb"(\d+) 0 R", kids.group(1))] if kids else []
+        self.file.seek(0, os.SEEK_END)
+
+    def _read_until(self, marker, chunk=64 * 1024):
+        """从当前位置读到 marker 为止（含）"""
+        data = b""
+        while marker not in data:
+            block = self.file.read(chunk)
+            if not block:
+                break
+            data += block
+        return data
+
+    def _commit(self, new_ids):
+        """写入新的页面树和本段的 xref/trailer"""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(self.PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+
+        ids = sorted(set(new_ids) | {self.PAGES_ID})
+        xref_offset = self.file.tell()
+        # 每段都带上 0 号空闲对象，部分阅读器据此判断 xref 的编号从 0 开始
+        self.file.write(b"xref\n0 1\n0000000000 65535 f \n")
+        # 连续的对象号合并为一个子段
+        start = 0
+        while start < len(ids):
+            end = start
+            while end + 1 < len(ids) and ids[end + 1] == ids[end] + 1:
+                end += 1
+            self.file.write(f"{ids[start]} {end - start + 1}\n".encode())
+            for obj_id in ids[start:end + 1]:
+                self.file.write(f"{self.offsets[obj_id]:010d} 00000 n \n".encode())
+            start = end + 1
+        prev = f" /Prev {self.prev_xref}" if self.prev_xref is not None else ""
+        self.file.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R{prev} >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        self.file.flush()
+        self.prev_xref = xref_offset
+
+    def add_page(self, width, height, colorspace, image_filter, data, page_w, page_h, replace_last=False):
+        """:param replace_last: 新页面替换最后一页（旧页面的对象仍留在文件中，只是不再被页面树引用）"""
+        first_id = self.next_id
+        super().add_page(width, height, colorspace, image_filter, data, page_w, page_h)
+        if replace_last and len(self.page_ids) > 1:
+            del self.page_ids[-2]
+        self._commit(range(first_id, self.next_id))
+
+    def close(self):
+        self.file.close()
+
+
+class LivePdf:
+    """
+    会话模式的实时 PDF：每保存一张截图就在后台线程中编码并追加一页，文档始终是最新的。
+    单个后台线程按提交顺序追加，页序与截取顺序一致。
+    :param path: PDF 路径，已存在时继续追加。
+    :param preset: PDF_PRESETS 中的预设名。
+    """
+    def __init__(self, path, preset="original", max_queue=16):
+        if preset not in PDF_PRESETS:
+            raise ValueError(f"未知的 PDF 预设: {preset}")
+        _, self.dpi, self.quality = PDF_PRESETS[preset]
+        self.path = path
+        try:
+            self.pdf = IncrementalPdfWriter(path)
+        except ValueError as e:
+            # 无法续写（不是本程序生成的文件或已损坏）：保留旧文件，另起新文件
+            backup = path + time.strftime(".%Y%m%d_%H%M%S.bak")
+            logging.warning(f"{e}: {path}，已改名为 {backup}")
+            os.replace(path, backup)
+            self.pdf = IncrementalPdfWriter(path)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self._worker, daemon=True, name="LivePdf")
+        self.thread.start()
+        logging.info(f"实时 PDF: {path} (已有 {len(self.pdf.page_ids)} 页)")
+
+    def submit(self, image, replace_last=False):
+        """
+        提交一张 BGR numpy 数组截图；队列满时丢弃并返回 False。
+        :param replace_last: 替换最后一页而不是追加（build 动画的下一步覆盖上一步）。
+        """
+        try:
+            self.queue.put_nowait((image, replace_last))
+            return True
+        except queue.Full:
+            logging.error("实时 PDF 队列已满，本页未加入 PDF。")
+            return False
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            image, replace_last = item
+            try:
+                page = _encode_page(Image.fromarray(image[:, :, ::-1]), self.dpi, self.quality)
+                with metrics.timer("pdf_live_append"):
+                    self.pdf.add_page(*page, replace_last=replace_last)
+            except Exception as e:
+                logging.error(f"追加实时 PDF 页面失败: {e}")
+
+    def close(self, timeout=None):
+        """等待排队的页面写完后关闭文件（无需重新生成整个文档）"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.pdf.close()
+
+
+def export_pdf(image_files, output_pdf_path, preset="original", progress_callback=None, workers=None):
+    """
+    把图片列表按顺序流式导出为 PDF。
+    :param image_files: 图片路径列表（按页序）。
+    :param preset: PDF_PRESETS 中的预设名。
+    :param progress_callback: progress_callback(已完成页数, 总页数)。
+    :param workers: 解码进程数，None 为 CPU 核数；页数很少时直接在当前进程处理。
+    :return: 写入的页数。
+    """
+    if preset not in PDF_PRESETS:
+        raise ValueError(f"未知的 PDF 预设: {preset}")
+    _, dpi, quality = PDF_PRESETS[preset]
+    workers = workers or os.cpu_count() or 1
+    total = len(image_files)
+
+    temp_path = output_pdf_path + ".tmp"
+    writer = StreamingPdfWriter(temp_path)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and total > workers else None
+    try:
+        # 有界预取：最多同时有 2 * workers 页在解码，写完一页再提交下一页
+        pending = deque()
+        files = iter(image_files)
+        done = 0
+
+        def submit_next():
+            path = next(files, None)
+            if path is None:
+                return False
+            if executor is None:
+                pending.append(_prepare_page(path, dpi, quality))
+            else:
+                pending.append(executor.submit(_prepare_page, path, dpi, quality))
+            return True
+
+        for _ in range(max(2, 2 * workers)):
+            if not submit_next():
+                break
+        start = time.perf_counter()
+        while pending:
+            item = pending.popleft()
+            # 等待工作进程的时间即解码/缩放/编码尚未跟上的时间
+            with metrics.timer("pdf_decode_wait"):
+                page = item.result() if executor is not None else item
+            if page is not None:
+                with metrics.timer("pdf_write"):
+                    writer.add_page(*page)
+            done += 1
+            if progress_callback:
+                progress_callback(done, total)
+            submit_next()
+
+        if not writer.page_ids:
+            raise IOError("没有任何图片可以导出。")
+        writer.close()
+        os.replace(temp_path, output_pdf_path)
+        metrics.observe("pdf_export", time.perf_counter() - start)
+        metrics.count("pdf_pages", len(writer.page_ids))
+        return len(writer.page_ids)
+    except Exception:
+        writer.abort()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def folder_images(image_folder):
+    """
+    文件夹中要导出的图片路径：有会话清单时按截取顺序（跳过已被手动删除的文件），否则按文件名排序。
+    """
+    manifest = SessionManifest(image_folder, create=False)
+    if manifest.slides:
+        return [path for path in (os.path.join(image_folder, f) for f in manifest.slide_files())
+                if os.path.exists(path)]
+    return sorted([
+        os.path.join(image_folder, f)
+        for f in os.listdir(image_folder)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    ])
+
+
+def export_folder(image_folder, output_pdf_path, preset="original", progress_callback=None):
+    """把整个截图文件夹导出为 PDF，参数同 export_pdf；出错时统一抛出 FileNotFoundError/ValueError/IOError"""
+    image_files = folder_images(image_folder)
+    if not image_files:
+        raise FileNotFoundError("在指定文件夹中未找到任何有效的图片文件。")
+
+    try:
+        return export_pdf(image_files, output_pdf_path, preset, progress_callback)
+    except (FileNotFoundError, ValueError):
+        raise
+    except Exception as e:
+        raise IOError(f"保存PDF文件失败。\n错误: {e}")
@@ -0,0 +1,100 @@
+import logging
+from collections import deque
+
+# ---------------------------------------------------
+#  自适应轮询
+#  - 画面长时间静止：轮询间隔逐步放大到 max_interval，减少无谓的截图；
+#  - 出现明显运动（动画、翻页后）：立即收紧到 min_interval；
+#  - 等待静止时，两帧几乎完全相同即判定稳定，不再固定等两帧。
+#  同时统计实际轮询频率与检测延迟，便于在教室机器上核对 CPU/延迟的取舍。
+# ---------------------------------------------------
+
+class AdaptivePoller:
+    """
+    :param min_interval: 最短轮询间隔（秒），运动期间及等待静止时使用。
+    :param base_interval: 初始轮询间隔（秒）。
+    :param max_interval: 静止期间最长轮询间隔（秒）。
+    :param backoff: 每次静止轮询后间隔放大的倍数。
+    :param max_settle_time: 等待静止的最长时间（秒）。
+    :param required_stable_count: 差异小但不为零时，需要连续多少帧低于稳定阈值。
+    :param identical_score: 差异分数低于此值视为两帧相同，立即判定稳定。
+    """
+    def __init__(self, min_interval=0.1, base_interval=0.5, max_interval=1.0, backoff=1.25,
+                 max_settle_time=4.0, required_stable_count=2, identical_score=0.0002):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_settle_time = max_settle_time
+        self.required_stable_count = required_stable_count
+        self.identical_score = identical_score
+
+        self.interval = base_interval
+        self.stable_count = 0
+        self.transition_start = None
+        self.last_poll = None
+        self.poll_times = deque(maxlen=600)
+        self.latencies = deque(maxlen=100)
+
+    # --- 空闲轮询 ---
+    def record_poll(self, now):
+        self.poll_times.append(now)
+        self.last_poll = now
+
+    def observe(self, result, trigger_threshold):
+        """根据一次未触发翻页的比较结果调整下一次轮询间隔"""
+        if result.changed_count == 0:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        elif result.score >= trigger_threshold / 4:
+            # 阈值以下但明显的运动（动画、逐条出现），很可能马上要翻页
+            self.interval = self.min_interval
+
+    # --- 翻页与等待静止 ---
+    def begin_transition(self, previous_poll):
+        """检测到翻页：变化发生在上一次轮询之后，以上一次轮询时间作为延迟的起点"""
+        self.transition_start = previous_poll
+        self.stable_count = 0
+        self.interval = self.min_interval
+
+    def settled(self, result, stable_threshold):
+        """等待静止期间每取一帧调用一次，返回画面是否已稳定"""
+        if result.score <= self.identical_score:
+            return True
+        if result.score < stable_threshold:
+            self.stable_count += 1
+            return self.stable_count >= self.required_stable_count
+        self.stable_count = 0
+        return False
+
+    def end_transition(self, now):
+        """稳定帧已取得，返回本次检测延迟（秒）"""
+        latency = None
+        if self.transition_start is not None:
+            latency = now - self.transition_start
+            self.latencies.append(latency)
+        self.transition_start = None
+        return latency
+
+    # --- 统计 ---
+    def poll_rate(self, window=60.0):
+        """最近 window 秒内的实际轮询频率（次/秒）"""
+        if len(self.poll_times) < 2:
+            return 0.0
+        newest = self.poll_times[-1]
+        recent = [t for t in self.poll_times if newest - t <= window]
+        span = recent[-1] - recent[0]
+        return (len(recent) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            "poll_rate": self.poll_rate(),
+            "interval": self.interval,
+            "detections": len(latencies),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_max": max(latencies) if latencies else None,
+        }
+
+    def log_stats(self):
+        s = self.stats()
+        latency = f"{s['latency_mean']:.2f} 秒 (最大 {s['latency_max']:.2f} 秒)" if s["detections"] else "无"
+        logging.info(f"轮询统计: 频率 {s['poll_rate']:.2f} 次/秒, 当前间隔 {s['interval']:.2f} 秒, 平均检测延迟 {latency}")
@@ -0,0 +1,361 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+# ---------------------------------------------------
+#  命令行入口 (python -m pptslicer)
+#  watch   监控窗口或显示器（需要 Windows）
+#  replay  从录像中提取幻灯片
+#  batch   多进程分段并行提取录像中的幻灯片（长录像、大量录像）
+#  export  把截图文件夹导出为 PDF
+#  dedup   检查截图文件夹中的重复幻灯片
+#  sweep   在录像上扫描检测参数，找出最合适的一组
+#  本模块顶层只导入标准库：OpenCV、numpy、Pillow、pywin32、keyboard 等
+#  在各子命令内部按需导入，--help 和不需要它们的子命令可以瞬间启动。
+# ---------------------------------------------------
+
+
+def _enable_metrics(prefix):
+    if prefix:
+        import metrics
+        metrics.registry.enabled = True
+
+
+def _export_metrics(prefix):
+    if prefix:
+        import metrics
+        metrics.registry.export(prefix)
+        print(f"[+] 各阶段平均耗时: {metrics.registry.summary_line()}")
+
+
+def _parse_regions(values):
+    return [tuple(float(v) for v in region.split(",")) for region in values]
+
+
+def _parse_slide_region(value):
+    """auto / off 原样返回，X,Y,W,H 解析为比例"""
+    return value if value in ("auto", "off") else _parse_regions([value])[0]
+
+
+def cmd_watch(args):
+    import utils
+    from config import load_settings
+    if utils.win32gui is None:
+        raise SystemExit("[-] 实时监控需要 Windows 和 pywin32，录像请使用 replay 子命令。")
+    from manager import MonitorManager
+    from capture_process import ProcessMonitorManager
+    from sources import WindowSource, DisplaySource
+
+    if args.list:
+        print("窗口:")
+        for title in utils.get_visible_windows():
+            print(f"  {title}")
+        print("显示器:")
+        for i, (name, rect) in enumerate(utils.get_displays().items(), 1):
+            print(f"  {i}: {name} {rect}")
+        return 0
+
+    if args.display is not None:
+        displays = list(utils.get_displays().items())
+        if not 1 <= args.display <= len(displays):
+            raise SystemExit(f"[-] 找不到显示器 {args.display}")
+        name, rect = displays[args.display - 1]
+        source = DisplaySource(rect, name)
+    elif args.window:
+        matches = [(title, hwnd) for title, hwnd in utils.get_visible_windows().items() if args.window in title]
+        if not matches:
+            raise SystemExit(f"[-] 找不到窗口: {args.window}")
+        name, hwnd = matches[0]
+        source = WindowSource(hwnd)
+    else:
+        raise SystemExit("[-] 请用 --window 或 --display 指定监控来源（--list 列出可选来源）。")
+
+    # 未在命令行指定的项沿用界面保存的设置
+    settings = load_settings()
+    save_path = args.save_path or settings["save_path"]
+    if not save_path:
+        raise SystemExit("[-] 请指定截图保存文件夹。")
+    os.makedirs(save_path, exist_ok=True)
+    _enable_metrics(args.metrics)
+
+    manager = ProcessMonitorManager() if args.process or settings["capture_process"] else MonitorManager()
+    manager.add(
+        source, save_path,
+        settings["threshold"] if args.threshold is None else args.threshold,
+        args.hotkey, settings["hotkey_timeout"], args.auto or settings["auto_mode"],
+        lambda message: print(f"[{name}] {message}"),
+        lambda: None,
+        dedup_mode=settings["dedup_mode"],
+        build_mode=settings["build_mode"],
+        recall_hotkey=args.recall_hotkey or settings["recall_hotkey"],
+        history_mb=settings["history_mb"],
+        image_format=settings["image_format"],
+        image_quality=settings["image_quality"],
+        max_poll_interval=settings["max_poll_interval"],
+        stable_threshold=settings["stable_threshold"],
+        required_stable_count=settings["required_stable_count"],
+        ignore_regions=_parse_regions(args.ignore) or settings["ignore_regions"],
+        auto_mask=settings["auto_mask"],
+        slide_region=settings["slide_region"],
+        # 命令行指定了 --threshold 即为手动阈值
+        auto_threshold=settings["auto_threshold"] and args.threshold is None,
+        live_pdf=args.live_pdf or settings["live_pdf"],
+        thumbnail_mb=settings["thumbnail_mb"],
+        pdf_preset=settings["pdf_preset"],
+    )
+    manager.start()
+    print(f"[+] 正在监控 {name}，按 Ctrl+C 停止。")
+    try:
+        while manager.is_alive():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        manager.stop()
+        manager.join(timeout=5)
+    _export_metrics(args.metrics)
+    return 0
+
+
+def cmd_replay(args):
+    from replay import replay_recording
+    _enable_metrics(args.metrics)
+    start = time.perf_counter()
+    count = replay_recording(args.recording, args.save_path, args.threshold, args.fps, args.realtime,
+                             status_callback=print, ignore_regions=_parse_regions(args.ignore),
+                             live_pdf=args.live_pdf, auto_threshold=args.auto_threshold, build_mode=args.builds,
+                             slide_region=_parse_slide_region(args.slide_region))
+    print(f"[+] 回放完成：保存 {count} 张，耗时 {time.perf_counter() - start:.1f} 秒。")
+    _export_metrics(args.metrics)
+    return 0
+
+
+def cmd_batch(args):
+    from batch import extract_video
+    _enable_metrics(args.metrics)
+    ignore_regions = _parse_regions(args.ignore)
+    total = 0
+    for video in args.videos:
+        # 多个录像时每个录像保存到 save_path 下以录像名命名的子文件夹
+        save_path = args.save_path if len(args.videos) == 1 else \
+            os.path.join(args.save_path, os.path.splitext(os.path.basename(video))[0])
+        start = time.perf_counter()
+        count = extract_video(video, save_path, args.threshold, args.workers, args.chunk,
+                              status_callback=print, ignore_regions=ignore_regions, live_pdf=args.live_pdf,
+                              auto_threshold=args.auto_threshold, build_mode=args.builds)
+        print(f"[+] {video}: 保存 {count} 张，耗时 {time.perf_counter() - start:.1f} 秒。")
+        total += count
+    if len(args.videos) > 1:
+        print(f"[+] 全部完成：{len(args.videos)} 段录像，共保存 {total} 张。")
+    _export_metrics(args.metrics)
+    return 0
+
+
+def cmd_export(args):
+    import pdf_export
+    output = args.output or os.path.join(args.folder, os.path.basename(os.path.normpath(args.folder)) + ".pdf")
+
+    def progress(done, total):
+        print(f"\r[*] 导出中 {done}/{total}", end="", flush=True)
+
+    try:
+        pages = pdf_export.export_folder(args.folder, output, args.preset, progress)
+    except (FileNotFoundError, ValueError, IOError) as e:
+        raise SystemExit(f"\n[-] {e}")
+    print(f"\n[+] 已导出 {pages} 页: {output}")
+    return 0
+
+
+def cmd_thumbs(args):
+    import thumbnails
+    from pdf_export import folder_images
+
+    def progress(done, total):
+        print(f"\r[*] 生成中 {done}/{total}", end="", flush=True)
+
+    start = time.perf_counter()
+    try:
+        if args.sheet:
+            pages = thumbnails.export_contact_sheet(args.folder, args.sheet, args.columns, args.rows, args.width,
+                                                    args.workers, progress, args.max_mb)
+            print(f"\n[+] 已导出 {pages} 页概览图: {args.sheet} ({time.perf_counter() - start:.1f} 秒)")
+        else:
+            files = [os.path.relpath(path, args.folder) for path in folder_images(args.folder)]
+            cache = thumbnails.ThumbnailCache(args.folder, max_mb=args.max_mb)
+            keys = cache.build(files, args.workers, progress)
+            print(f"\n[+] {len(keys)}/{len(files)} 张截图的缩略图已就绪: {cache.path} "
+                  f"({cache.total_bytes / 1e6:.1f} MB, {time.perf_counter() - start:.1f} 秒)")
+    except (FileNotFoundError, ValueError, IOError) as e:
+        raise SystemExit(f"\n[-] {e}")
+    return 0
+
+
+def cmd_dedup(args):
+    from dedup import find_duplicates
+    duplicates = find_duplicates(args.folder, args.max_distance)
+    for filename, original in duplicates:
+        print(f"{filename}  ==  {original}")
+    if args.move and duplicates:
+        target = os.path.join(args.folder, "duplicates")
+        os.makedirs(target, exist_ok=True)
+        for filename, _ in duplicates:
+            os.replace(os.path.join(args.folder, filename), os.path.join(target, filename))
+        print(f"[+] 已将 {len(duplicates)} 张重复幻灯片移到 {target}")
+    else:
+        print(f"[+] 发现 {len(duplicates)} 张重复幻灯片。")
+    return 0
+
+
+def cmd_sweep(args):
+    import sweep
+    truth_path = args.truth
+    if truth_path is None and os.path.isfile(os.path.join(args.recording, "ground_truth.json")):
+        # synthetic_deck 导出的帧序列自带真值
+        truth_path = os.path.join(args.recording, "ground_truth.json")
+    truth = sweep.load_truth(truth_path) if truth_path else None
+    fps = args.fps
+    if fps is None and truth_path and truth_path.endswith(".json"):
+        with open(truth_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        fps = data.get("fps") if isinstance(data, dict) else None
+    grid = {key: values for key, values in (
+        ("threshold", args.threshold), ("stable_threshold", args.stable),
+        ("required_stable_count", args.stable_count), ("max_poll_interval", args.max_interval)) if values}
+    configs = sweep.expand_grid(grid)
+    if not configs:
+        raise SystemExit("[-] 没有可评估的参数组合（稳定阈值须低于触发阈值）。")
+
+    start = time.perf_counter()
+    try:
+        series = sweep.compute_series(args.recording, args.step, max(c["max_poll_interval"] for c in configs),
+                                      fps or 2.0, _parse_regions(args.ignore),
+                                      progress=lambda t: print(f"\r[*] 计算差异 {t:.0f} 秒", end="", flush=True))
+    except (FileNotFoundError, ValueError, IOError) as e:
+        raise SystemExit(f"\n[-] {e}")
+    print(f"\n[+] 差异表: {len(series)} 帧 ({series.duration:.0f} 秒)，耗时 {time.perf_counter() - start:.1f} 秒。")
+
+    results = sweep.sweep(series, configs, truth, args.workers, args.expected)
+    print(f"{'阈值%':>6}{'稳定%':>6}{'静止帧':>6}{'轮询s':>6}{'保存':>6}{'精确率':>8}{'召回率':>8}{'F1':>6}{'平均延迟':>9}{'最大延迟':>9}")
+    for r in results[:args.top]:
+        quality = "".join(f"{r[key]:>8.2f}" if r[key] is not None else f"{'-':>8}" for key in ("precision", "recall"))
+        f1 = f"{r['f1']:>6.2f}" if r["f1"] is not None else f"{'-':>6}"
+        mean = f"{r['latency_mean']:.2f}s" if r["latency_mean"] is not None else "-"
+        worst = f"{r['latency_max']:.2f}s" if r["latency_max"] is not None else "-"
+        print(f"{r['threshold']:>6.2f}{r['stable_threshold']:>6.2f}{r['required_stable_count']:>6}{r['max_poll_interval']:>6.1f}"
+              f"{r['saved']:>6}{quality}{f1}{mean:>9}{worst:>9}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.save:
+        if truth is None and args.expected is None:
+            raise SystemExit("[-] 没有真值 (--truth) 或应保存张数 (--expected)，无法判断哪组参数最好，未写入设置。")
+        sweep.save_best(results[0])
+        print("[+] 已把第一组参数写入 settings.json（并关闭自动阈值）。")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pptslicer", description="PPTSlicer 命令行：监控、回放、导出 PDF、概览图、去重")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出详细日志")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    watch = commands.add_parser("watch", help="监控窗口或显示器，翻页时截图（需要 Windows）")
+    watch.add_argument("save_path", nargs="?", help="截图保存文件夹，默认沿用界面设置")
+    watch.add_argument("--window", metavar="KEYWORD", help="标题包含 KEYWORD 的窗口")
+    watch.add_argument("--display", type=int, metavar="N", help="第 N 块显示器（从 1 开始）")
+    watch.add_argument("--list", action="store_true", help="列出可监控的窗口和显示器")
+    watch.add_argument("--threshold", type=float, help="检测灵敏度 (百分比)，指定时不再自动校准")
+    watch.add_argument("--hotkey", default="ctrl", help="手动模式下确认截图的快捷键")
+    watch.add_argument("--auto", action="store_true", help="全自动模式，翻页即保存")
+    watch.add_argument("--recall-hotkey", help="手动模式下补存错过确认的上一张幻灯片的快捷键，默认沿用界面设置 (f8)")
+    watch.add_argument("--ignore", action="append", default=[], metavar="X,Y,W,H",
+                       help="不参与检测的区域，按画面宽高的比例表示，可重复指定")
+    watch.add_argument("--live-pdf", action="store_true", help="边截图边追加到保存目录下的 pptslicer_live.pdf")
+    watch.add_argument("--process", action="store_true", help="截图与检测在独立的子进程中进行")
+    watch.add_argument("--metrics", metavar="PREFIX", help="记录各阶段耗时，结束后导出为 PREFIX.json / PREFIX.prom")
+    watch.set_defaults(func=cmd_watch)
+
+    replay = commands.add_parser("replay", help="从录像（视频文件或帧图片文件夹）中提取幻灯片")
+    replay.add_argument("recording", help="视频文件或帧图片文件夹")
+    replay.add_argument("save_path", help="截图保存文件夹")
+    replay.add_argument("--threshold", type=float, default=5.0, help="检测灵敏度 (百分比)")
+    replay.add_argument("--fps", type=float, default=2.0, help="图片序列的帧率")
+    replay.add_argument("--realtime", action="store_true", help="按真实时间回放")
+    replay.add_argument("--auto-threshold", action="store_true", help="按画面噪声自动校准阈值（--threshold 只用于开头几秒）")
+    replay.add_argument("--builds", choices=("off", "coalesce", "deltas"), default="off",
+                        help="逐条出现的动画: coalesce 下一步覆盖上一步 / deltas 另存中间步骤的差量 / off 不合并（超过阈值的步骤各自保存，变化低于阈值的步骤不会触发）")
+    replay.add_argument("--ignore", action="append", default=[], metavar="X,Y,W,H",
+                        help="不参与检测的区域，按画面宽高的比例表示，可重复指定")
+    replay.add_argument("--live-pdf", action="store_true", help="边提取边追加到保存目录下的 pptslicer_live.pdf")
+    replay.add_argument("--slide-region", default="off", metavar="auto|off|X,Y,W,H",
+                        help="只提取幻灯片区域：auto 自动检测，或按画面宽高的比例指定")
+    replay.add_argument("--metrics", metavar="PREFIX", help="记录各阶段耗时，结束后导出为 PREFIX.json / PREFIX.prom")
+    replay.set_defaults(func=cmd_replay)
+
+    batch = commands.add_parser("batch", help="多进程分段并行提取录像中的幻灯片")
+    batch.add_argument("save_path", help="截图保存文件夹（多个录像时各自保存到以录像名命名的子文件夹）")
+    batch.add_argument("videos", nargs="+", help="视频文件")
+    batch.add_argument("--threshold", type=float, default=5.0, help="检测灵敏度 (百分比)")
+    batch.add_argument("--auto-threshold", action="store_true", help="按画面噪声自动校准阈值（--threshold 只用于每段开头几秒）")
+    batch.add_argument("--builds", choices=("off", "coalesce", "deltas"), default="off",
+                       help="逐条出现的动画: coalesce 下一步覆盖上一步 / deltas 另存中间步骤的差量 / off 不合并（超过阈值的步骤各自保存，变化低于阈值的步骤不会触发）")
+    batch.add_argument("--workers", type=int, help="进程数，默认 CPU 核数")
+    batch.add_argument("--chunk", type=float, metavar="SECONDS", help="每段时长，默认按进程数自动划分")
+    batch.add_argument("--ignore", action="append", default=[], metavar="X,Y,W,H",
+                       help="不参与检测的区域，按画面宽高的比例表示，可重复指定")
+    batch.add_argument("--live-pdf", action="store_true", help="同时追加到保存目录下的 pptslicer_live.pdf")
+    batch.add_argument("--metrics", metavar="PREFIX", help="记录各阶段耗时（主进程），结束后导出为 PREFIX.json / PREFIX.prom")
+    batch.set_defaults(func=cmd_batch)
+
+    export = commands.add_parser("export", help="把截图文件夹导出为 PDF（有会话清单时按截取顺序）")
+    export.add_argument("folder", help="截图文件夹")
+    export.add_argument("output", nargs="?", help="输出 PDF 路径，默认为 <文件夹>/<文件夹名>.pdf")
+    export.add_argument("--preset", default="original", help="PDF 质量预设: original / high / standard / compact")
+    export.set_defaults(func=cmd_export)
+
+    thumbs = commands.add_parser("thumbs", help="生成截图文件夹的缩略图缓存，或导出概览图（按缓存的缩略图拼页）")
+    thumbs.add_argument("folder", help="截图文件夹")
+    thumbs.add_argument("--sheet", metavar="OUTPUT", help="导出概览图：.pdf 或 .jpg（多页时文件名后加页号）")
+    thumbs.add_argument("--columns", type=int, default=5, help="概览图每行几张")
+    thumbs.add_argument("--rows", type=int, default=6, help="概览图每页几行")
+    thumbs.add_argument("--width", type=int, default=320, help="概览图中每张缩略图的宽度（像素）")
+    thumbs.add_argument("--workers", type=int, help="进程数，默认 CPU 核数")
+    thumbs.add_argument("--max-mb", type=float, default=64, help="缩略图缓存的大小上限 (MB)")
+    thumbs.set_defaults(func=cmd_thumbs)
+
+    dedup = commands.add_parser("dedup", help="检查截图文件夹中的重复幻灯片")
+    dedup.add_argument("folder", help="截图文件夹")
+    dedup.add_argument("--max-distance", type=int, default=8, help="候选的最大哈希汉明距离 (256 位)")
+    dedup.add_argument("--move", action="store_true", help="把重复的图片移到 duplicates 子文件夹")
+    dedup.set_defaults(func=cmd_dedup)
+
+    sweep = commands.add_parser("sweep", help="在录像上扫描检测参数（读取一遍录像，多进程评估整张参数网格）")
+    sweep.add_argument("recording", help="视频文件或帧图片文件夹")
+    sweep.add_argument("--truth", help="真值: ground_truth.json 或每张新幻灯片出现时间（秒）的列表；帧文件夹中有 ground_truth.json 时自动使用")
+    sweep.add_argument("--expected", type=int, help="没有真值时，录像中应保存的幻灯片张数")
+    sweep.add_argument("--threshold", type=float, nargs="+", help="触发阈值 (百分比) 的候选值")
+    sweep.add_argument("--stable", type=float, nargs="+", help="稳定阈值 (百分比) 的候选值")
+    sweep.add_argument("--stable-count", type=int, nargs="+", help="连续静止帧数的候选值")
+    sweep.add_argument("--max-interval", type=float, nargs="+", help="最长轮询间隔（秒）的候选值")
+    sweep.add_argument("--step", type=float, default=0.1, help="时间网格，即最短轮询间隔（秒）")
+    sweep.add_argument("--fps", type=float, help="图片序列的帧率，默认取真值中的帧率或 2")
+    sweep.add_argument("--ignore", action="append", default=[], metavar="X,Y,W,H",
+                       help="不参与检测的区域，按画面宽高的比例表示，可重复指定")
+    sweep.add_argument("--workers", type=int, help="进程数，默认 CPU 核数")
+    sweep.add_argument("--top", type=int, default=10, help="显示前几组参数")
+    sweep.add_argument("--json", help="把全部结果写入 JSON 文件")
+    sweep.add_argument("--save", action="store_true", help="把最好的一组参数写入 settings.json")
+    sweep.set_defaults(func=cmd_sweep)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
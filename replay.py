@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+import time
+import metrics
+from monitor import MonitorThread
+from builds import BUILD_MODES
+from sources import FastClock, RealClock, open_replay_source
+
+
+def replay_recording(recording_path, save_path, threshold=5.0, fps=2.0, realtime=False, status_callback=None, ignore_regions=None, live_pdf=False, auto_threshold=False, build_mode="off", slide_region="off"):
+    """
+    用与实时监控完全相同的检测逻辑回放一段录像（视频文件或帧图片文件夹），把检测到的幻灯片保存到 save_path。
+    :param recording_path: 视频文件路径，或帧图片所在文件夹。
+    :param save_path: 截图保存文件夹。
+    :param threshold: 检测灵敏度（百分比），与界面滑块含义相同。
+    :param fps: 图片序列的帧率（对视频文件无效）。
+    :param realtime: True 时按真实时间回放，默认尽快回放。
+    :param ignore_regions: 不参与检测的区域 [(x, y, w, h), ...]，按画面宽高的比例表示。
+    :param live_pdf: True 时边提取边追加到 save_path 下的实时 PDF。
+    :param auto_threshold: True 时按画面噪声自动校准阈值，threshold 只在开头几秒使用。
+    :param build_mode: 逐条出现的动画的处理方式，见 builds.BUILD_MODES。
+    :param slide_region: 只提取幻灯片区域："auto" 自动检测，或 (x, y, w, h) 按画面宽高的比例；"off" 为完整画面。
+    :return: 保存的截图数量。
+    """
+    os.makedirs(save_path, exist_ok=True)
+    source = open_replay_source(recording_path, fps=fps)
+    clock = RealClock() if realtime else FastClock()
+    saved = []
+
+    monitor = MonitorThread(
+        source, save_path, threshold,
+        hotkey=None, hotkey_timeout=0, is_auto_mode=True,
+        status_callback=status_callback or (lambda message: logging.info(message)),
+        saved_callback=lambda: saved.append(1),
+        clock=clock,
+        ignore_regions=ignore_regions,
+        live_pdf=live_pdf,
+        auto_threshold=auto_threshold,
+        build_mode=build_mode,
+        slide_region=slide_region,
+    )
+    # 直接在当前线程运行主循环，回放结束（来源返回 None）时自动退出
+    monitor.run()
+    return len(saved)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPTSlicer 录像回放：从录像中提取幻灯片截图")
+    parser.add_argument("recording", help="视频文件或帧图片文件夹")
+    parser.add_argument("save_path", help="截图保存文件夹")
+    parser.add_argument("--threshold", type=float, default=5.0, help="检测灵敏度 (百分比)")
+    parser.add_argument("--fps", type=float, default=2.0, help="图片序列的帧率")
+    parser.add_argument("--realtime", action="store_true", help="按真实时间回放")
+    parser.add_argument("--auto-threshold", action="store_true", help="按画面噪声自动校准阈值")
+    parser.add_argument("--builds", choices=BUILD_MODES, default="off",
+                        help="逐条出现的动画: coalesce 下一步覆盖上一步 / deltas 另存中间步骤的差量 / off 不合并（超过阈值的步骤各自保存，变化低于阈值的步骤不会触发）")
+    parser.add_argument("--ignore", action="append", default=[], metavar="X,Y,W,H",
+                        help="不参与检测的区域，按画面宽高的比例表示，可重复指定")
+    parser.add_argument("--live-pdf", action="store_true", help="边提取边追加到保存目录下的 pptslicer_live.pdf")
+    parser.add_argument("--slide-region", default="off", metavar="auto|off|X,Y,W,H",
+                        help="只提取幻灯片区域：auto 自动检测，或按画面宽高的比例指定")
+    parser.add_argument("--metrics", metavar="PREFIX", help="记录各阶段耗时，结束后导出为 PREFIX.json / PREFIX.prom")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    metrics.registry.enabled = bool(args.metrics)
+    start = time.perf_counter()
+    ignore_regions = [tuple(float(v) for v in region.split(",")) for region in args.ignore]
+    count = replay_recording(args.recording, args.save_path, args.threshold, args.fps, args.realtime,
+                             status_callback=print, ignore_regions=ignore_regions, live_pdf=args.live_pdf,
+                             auto_threshold=args.auto_threshold, build_mode=args.builds,
+                             slide_region=args.slide_region if args.slide_region in ("auto", "off") else
+                             tuple(float(v) for v in args.slide_region.split(",")))
+    print(f"[+] 回放完成：保存 {count} 张，耗时 {time.perf_counter() - start:.1f} 秒。")
+    if args.metrics:
+        metrics.registry.export(args.metrics)
+        print(f"[+] 各阶段平均耗时: {metrics.registry.summary_line()}")
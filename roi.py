@@ -0,0 +1,212 @@
+import math
+import logging
+import cv2
+import numpy as np
+
+# ---------------------------------------------------
+#  幻灯片区域
+#  截取整个窗口时，演讲者视图的备注和下一张预览、上下或左右的黑边、标题栏、会议软件的工具栏和侧边栏
+#  都会被截下来：每次轮询都参与比较，每张截图里都有，导出的 PDF 也不干净。
+#  这里从完整画面中找出真正的幻灯片矩形，之后来源只截取这一块（像素越少，截图、比较、编码越快，文件越小）：
+#  - 边缘轮廓：幻灯片与周围背景之间有一圈清晰的边界，轮廓接近矩形，长宽比接近常见的幻灯片比例，且面积足够大；
+#    轮廓以外还必须像黑边或软件界面（整体偏暗，或比幻灯片暗且几乎没有文字），
+#    全屏放映的幻灯片里带边框的图表、照片外面是幻灯片自己的标题和正文，不会被当成幻灯片；
+#  - 黑边：全屏放映时幻灯片比例与屏幕不同，上下或左右是纯黑的条带，去掉即可；
+#  - 相邻两次检测结果一致才采用，窗口缩放时来源自动恢复截取完整画面并重新检测，
+#    另外每隔一段时间读一次完整画面复查（演讲者切换视图、或曾把幻灯片里的大图误认为幻灯片时可以自行纠正）。
+#  默认截取整个窗口 ("off")；settings.json 中设为 "auto" 自动检测，或手动指定区域（按窗口宽高的比例）。
+# ---------------------------------------------------
+
+# 常见幻灯片长宽比：16:9、16:10、4:3、A4 横向
+SLIDE_RATIOS = (16 / 9, 16 / 10, 4 / 3, math.sqrt(2))
+
+
+def _matches_ratio(width, height, ratios, tolerance):
+    return height > 0 and any(abs(width / height / ratio - 1) <= tolerance for ratio in ratios)
+
+
+def _looks_like_surround(gray, edges, rect, dark=60, contrast=16, max_edges=0.015):
+    """
+    rect 以外的部分是否像黑边或软件界面：大部分是暗色（黑边、演讲者视图、深色界面），
+    或者明显比 rect 内暗且几乎没有边缘（浅色界面、窗口边框）；幻灯片自己的正文区域两者都不满足。
+    """
+    x, y, w, h = rect
+    outside = np.ones(gray.shape, bool)
+    outside[y:y + h, x:x + w] = False
+    if not outside.any():
+        return False
+    surround = float(np.median(gray[outside]))
+    if surround < dark:
+        return True
+    inside = float(np.median(gray[y:y + h, x:x + w]))
+    return surround <= inside - contrast and np.count_nonzero(edges[outside]) <= max_edges * np.count_nonzero(outside)
+
+
+def _outlined_rect(gray, min_area, ratios, tolerance):
+    """边界清晰、接近矩形、比例合适、外面像黑边或软件界面的最大轮廓的外接矩形"""
+    height, width = gray.shape
+    raw = cv2.Canny(gray, 40, 120)
+    # 闭合边界上的细小缺口
+    edges = cv2.dilate(raw, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    best, best_area = None, 0
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        area = w * h
+        if area < min_area or area <= best_area or (w >= width - 2 and h >= height - 2):
+            continue
+        # 轮廓包围的面积接近外接矩形，才是一圈完整的矩形边界
+        if cv2.contourArea(contour) < 0.9 * area or not _matches_ratio(w, h, ratios, tolerance):
+            continue
+        if not _looks_like_surround(gray, raw, (x, y, w, h)):
+            continue
+        best, best_area = (x, y, w, h), area
+    return best
+
+
+def _letterboxed_rect(gray, min_area, ratios, tolerance, dark=40, flatness=8):
+    """去掉四周纯黑的条带后剩下的矩形；没有黑边时返回 None"""
+    def bars(profile_max, profile_min, profile_mean):
+        flat = (profile_max - profile_min <= flatness) & (profile_mean < dark)
+        leading = int(np.argmin(flat)) if not flat.all() else len(flat)
+        trailing = int(np.argmin(flat[::-1])) if not flat.all() else 0
+        return leading, trailing
+
+    top, bottom = bars(gray.max(axis=1), gray.min(axis=1), gray.mean(axis=1))
+    left, right = bars(gray.max(axis=0), gray.min(axis=0), gray.mean(axis=0))
+    if top + bottom + left + right == 0:
+        return None
+    height, width = gray.shape
+    w, h = width - left - right, height - top - bottom
+    if w <= 0 or h <= 0 or w * h < min_area or not _matches_ratio(w, h, ratios, tolerance):
+        return None
+    return left, top, w, h
+
+
+def _strongest_edge(profile, center, radius):
+    """profile 在 center 附近变化最大的位置 i（边界位于 i-1 与 i 之间）；位于画面边缘的边不动"""
+    if center <= 0 or center >= len(profile):
+        return center
+    lo, hi = max(1, center - radius), min(len(profile) - 1, center + radius)
+    if lo > hi:
+        return center
+    steps = np.abs(np.diff(profile[lo - 1:hi + 1]))
+    return lo + int(np.argmax(steps))
+
+
+def _refine(gray, rect, radius):
+    """在全分辨率灰度图上把矩形的四条边对齐到附近最明显的亮度跳变"""
+    x0, y0, x1, y1 = rect
+    # 只用每条边中间 80% 的范围求平均，避开角上的圆角和阴影
+    mx, my = (x1 - x0) // 10, (y1 - y0) // 10
+    rows = gray[:, x0 + mx:max(x0 + mx + 1, x1 - mx)].mean(axis=1)
+    cols = gray[y0 + my:max(y0 + my + 1, y1 - my), :].mean(axis=0)
+    return (_strongest_edge(cols, x0, radius), _strongest_edge(rows, y0, radius),
+            _strongest_edge(cols, x1, radius), _strongest_edge(rows, y1, radius))
+
+
+def detect_slide_region(bgr, min_fraction=0.25, ratios=SLIDE_RATIOS, tolerance=0.06, max_width=640):
+    """
+    在完整画面中找出幻灯片矩形。
+    :param min_fraction: 幻灯片至少占画面面积的比例。
+    :param ratios: 可接受的长宽比。
+    :param tolerance: 长宽比的相对误差。
+    :param max_width: 检测时先缩小到这个宽度，节省时间。
+    :return: (x, y, w, h) 像素坐标；整个画面就是幻灯片或找不到时返回 None。
+    """
+    height, width = bgr.shape[:2]
+    scale = min(1.0, max_width / width)
+    small = cv2.resize(bgr, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    min_area = min_fraction * gray.shape[0] * gray.shape[1]
+
+    rect = _outlined_rect(gray, min_area, ratios, tolerance)
+    if rect is None:
+        rect = _letterboxed_rect(gray, min_area, ratios, tolerance)
+    if rect is None:
+        return None
+    x, y, w, h = rect
+    rect = (round(x / scale), round(y / scale), round((x + w) / scale), round((y + h) / scale))
+    if scale < 1.0 or rect[0] > 0 or rect[1] > 0:
+        # 缩小后的位置有几个像素的误差（轮廓还包含加粗的边界线），回到原图上精确对齐
+        rect = _refine(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), rect, math.ceil(2 / scale) + 2)
+    x0, y0, x1, y1 = max(0, rect[0]), max(0, rect[1]), min(width, rect[2]), min(height, rect[3])
+    if x1 - x0 < 16 or y1 - y0 < 16 or (x1 - x0) * (y1 - y0) >= 0.98 * width * height:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def region_from_fractions(fractions, size):
+    """按比例 (x, y, w, h) 指定的区域换算为 size = (高, 宽) 画面上的像素坐标"""
+    height, width = size
+    x, y, w, h = fractions
+    x0, y0 = int(x * width), int(y * height)
+    x1, y1 = min(width, int(round((x + w) * width))), min(height, int(round((y + h) * height)))
+    if x1 - x0 < 16 or y1 - y0 < 16:
+        raise ValueError(f"幻灯片区域太小: {fractions}")
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _same_region(a, b, tolerance=4):
+    if a is None or b is None:
+        return a is None and b is None
+    return max(abs(p - q) for p, q in zip(a, b)) <= tolerance
+
+
+class SlideRegionTracker:
+    """
+    决定来源应截取的幻灯片区域（设置到 source.set_region 上）。
+    :param mode: "auto" 自动检测，或手动指定的 [x, y, w, h]（按完整画面宽高的比例）。
+    :param recheck_interval: 自动检测时每隔多少秒读一次完整画面复查。
+    """
+    def __init__(self, mode="auto", recheck_interval=60.0):
+        if mode != "auto" and (not isinstance(mode, (list, tuple)) or len(mode) != 4):
+            raise ValueError(f"无效的幻灯片区域设置: {mode}")
+        self.mode = mode
+        self.recheck_interval = recheck_interval
+        self.candidate = None  # (完整画面尺寸, 区域)：等待下一次检测确认
+        self.checked_size = None  # 已确定没有幻灯片区域的完整画面尺寸
+        self.next_check = float("-inf")
+
+    def needs_full_frame(self, source, now):
+        """来源已限定区域时，这一次是否要读取完整画面（等待确认或到了复查时间）"""
+        return self.mode == "auto" and source.region is not None and (self.candidate is not None or now >= self.next_check)
+
+    def update(self, source, bgr, now, previous=None):
+        """
+        bgr 为完整画面：确定幻灯片区域并设置到来源上，返回这一帧应裁剪的区域（None 为不裁剪）。
+        :param previous: 为复查而暂时取消的 (区域, 完整画面尺寸)。
+        """
+        size = bgr.shape[:2]
+        if self.mode != "auto":
+            region = region_from_fractions(self.mode, size)
+            source.set_region(region, size)
+            return region
+        if previous is None and self.candidate is None and self.checked_size == size and now < self.next_check:
+            return None
+
+        found = detect_slide_region(bgr)
+        self.next_check = now + self.recheck_interval
+        current = previous[0] if previous is not None and previous[1] == size else None
+        if _same_region(found, current):
+            self.candidate = None
+            confirmed = current
+        elif self.candidate is not None and self.candidate[0] == size and _same_region(self.candidate[1], found):
+            self.candidate = None
+            confirmed = found
+            if found is None:
+                logging.info(f"未找到幻灯片区域，截取完整画面 ({size[1]}x{size[0]})。")
+            else:
+                logging.info(f"检测到幻灯片区域: {found} (完整画面 {size[1]}x{size[0]})，只截取该区域。")
+        else:
+            # 与当前区域不同：等下一帧确认，期间沿用当前区域
+            self.candidate = (size, found)
+            confirmed = current
+
+        if confirmed is None:
+            self.checked_size = size
+            source.set_region(None, None)
+        else:
+            self.checked_size = None
+            source.set_region(confirmed, size)
+        return confirmed
@@ -0,0 +1,233 @@
+import os
+import time
+import logging
+import cv2
+import numpy as np
+import utils
+
+# ---------------------------------------------------
+#  帧来源 (Frame Source) 与时钟
+#  MonitorThread 只通过 source.read(now) 取帧、通过 clock 控制节奏，
+#  因此同一套检测逻辑既能跑在实时窗口上，也能跑在录像/图片序列上。
+# ---------------------------------------------------
+
+class RealClock:
+    """实时时钟：按真实时间等待（实时窗口监控使用）"""
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class FastClock:
+    """虚拟时钟：sleep 只推进虚拟时间而不真正等待，用于“尽快”回放录像"""
+    def __init__(self, start=0.0):
+        self._now = start
+
+    def now(self):
+        return self._now
+
+    def sleep(self, seconds):
+        self._now += seconds
+
+
+class FrameSource:
+    """
+    帧来源基类。
+    read(now, out) 返回 now 时刻应看到的 BGR 帧 (numpy 数组)，来源失效或已结束时返回 None。
+    out 为调用方提供的缓冲区：尺寸匹配时帧写入 out 并返回 out，否则返回新数组；
+    返回的数组归调用方所有，来源之后不会再修改它。
+    region 不为 None 时只读取完整画面中的这一块（幻灯片区域，见 roi.py）。
+    """
+    is_live = True
+    region = None  # (x, y, w, h)，完整画面上的像素坐标
+    region_size = None  # 确定区域时完整画面的 (高, 宽)
+
+    def read(self, now, out=None):
+        raise NotImplementedError
+
+    def set_region(self, region, size):
+        """只读取完整画面中的 region；完整画面不再是 size（窗口缩放）时自动恢复读取完整画面"""
+        self.region = tuple(region) if region is not None else None
+        self.region_size = tuple(size) if region is not None else None
+
+    def _region_for(self, size):
+        """完整画面为 size = (高, 宽) 时应读取的区域；尺寸已变化时清除区域并返回 None"""
+        if self.region is None:
+            return None
+        if tuple(size) != self.region_size:
+            logging.info(f"{self.describe()} 的画面尺寸变化，恢复读取完整画面。")
+            self.set_region(None, None)
+            return None
+        return self.region
+
+    def _region_rect(self, rect):
+        """桌面矩形 (left, top, right, bottom) 中应截取的部分"""
+        left, top, right, bottom = rect
+        region = self._region_for((bottom - top, right - left))
+        if region is None:
+            return rect
+        x, y, w, h = region
+        return left + x, top + y, left + x + w, top + y + h
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return self.__class__.__name__
+
+
+class WindowSource(FrameSource):
+    """实时窗口来源：忽略时间参数，每次直接截取窗口画面"""
+    is_live = True
+
+    def __init__(self, hwnd):
+        self.hwnd = hwnd
+
+    def read(self, now, out=None):
+        rect = utils.window_rect(self.hwnd)
+        return utils.capture_rect(self._region_rect(rect), out) if rect is not None else None
+
+    def describe(self):
+        return f"窗口 {self.hwnd}"
+
+
+class DisplaySource(FrameSource):
+    """实时显示器来源：截取整块显示器（投影仪、会议共享屏幕等全屏画面）"""
+    is_live = True
+
+    def __init__(self, rect, name=None):
+        self.rect = tuple(rect)
+        self.name = name
+
+    def read(self, now, out=None):
+        return utils.capture_rect(self._region_rect(self.rect), out)
+
+    def describe(self):
+        return self.name or f"显示器 {self.rect}"
+
+
+class _ReplaySource(FrameSource):
+    """回放来源的公共部分：以第一次 read 的时间为录像起点，把时钟时间映射为录像位置"""
+    is_live = False
+
+    def __init__(self):
+        self._origin = None
+
+    def _position(self, now):
+        if self._origin is None:
+            self._origin = now
+        return now - self._origin
+
+    def _deliver(self, frame, out):
+        """把来源内部缓存的帧（限定了区域时只取这一块）复制给调用方（缓存会被后续帧覆盖，不能直接交出去）"""
+        region = self._region_for(frame.shape[:2])
+        if region is not None:
+            x, y, w, h = region
+            frame = frame[y:y + h, x:x + w]
+        if out is not None and out.shape == frame.shape:
+            np.copyto(out, frame)
+            return out
+        return frame.copy()
+
+
+class VideoFileSource(_ReplaySource):
+    """
+    录像文件来源 (cv2.VideoCapture)。
+    :param path: 视频文件路径。
+    :param start: 起始位置（秒）。
+    :param end: 结束位置（秒），None 表示播放到文件末尾。
+    """
+    def __init__(self, path, start=0.0, end=None):
+        super().__init__()
+        self.path = path
+        self.start = start
+        self.end = end
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"无法打开视频文件: {path}")
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 25.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+        self._next_index = 0
+        if start > 0:
+            self._next_index = int(round(start * self.fps))
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self._next_index)
+        self._last_frame = None
+
+    def read(self, now, out=None):
+        position = self.start + self._position(now)
+        if self.end is not None and position >= self.end:
+            return None
+
+        target_index = int(position * self.fps)
+        # 目标帧之前的帧只 grab 不解码，快速跳过
+        while self._next_index < target_index:
+            if not self.capture.grab():
+                return None
+            self._next_index += 1
+
+        if self._next_index == target_index or self._last_frame is None:
+            # 解码到同一块内部缓冲区，不为每帧新建数组
+            ok, frame = self.capture.read(self._last_frame)
+            if not ok:
+                return None
+            self._next_index += 1
+            self._last_frame = frame
+        return self._deliver(self._last_frame, out)
+
+    def close(self):
+        self.capture.release()
+
+    def describe(self):
+        return f"视频 {os.path.basename(self.path)}"
+
+
+class ImageSequenceSource(_ReplaySource):
+    """
+    图片序列来源：按文件名排序的一组帧图片，以固定帧率播放。
+    :param folder: 帧图片所在文件夹。
+    :param fps: 帧率（每秒多少张图片）。
+    """
+    valid_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+    def __init__(self, folder, fps=2.0):
+        super().__init__()
+        self.folder = folder
+        self.fps = fps
+        self.files = sorted(
+            os.path.join(folder, f)
+            for f in os.listdir(folder)
+            if f.lower().endswith(self.valid_extensions)
+        )
+        if not self.files:
+            raise FileNotFoundError(f"在指定文件夹中未找到任何帧图片: {folder}")
+        self._last_index = None
+        self._last_frame = None
+
+    def read(self, now, out=None):
+        index = int(self._position(now) * self.fps)
+        if index >= len(self.files):
+            return None
+        if index != self._last_index:
+            frame = utils.read_image(self.files[index])
+            if frame is None:
+                logging.warning(f"跳过无法解码的帧: {self.files[index]}")
+                frame = self._last_frame
+            self._last_index = index
+            self._last_frame = frame
+        if self._last_frame is None:
+            return None
+        return self._deliver(self._last_frame, out)
+
+    def describe(self):
+        return f"图片序列 {self.folder}"
+
+
+def open_replay_source(path, fps=2.0):
+    """根据路径类型创建回放来源：文件夹 -> 图片序列，文件 -> 视频"""
+    if os.path.isdir(path):
+        return ImageSequenceSource(path, fps=fps)
+    return VideoFileSource(path)
@@ -0,0 +1,323 @@
+import os
+import json
+import math
+import time
+import bisect
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from detection import TiledChangeDetector
+from polling import AdaptivePoller
+from calibration import ThresholdCalibrator
+from sources import open_replay_source
+
+# ---------------------------------------------------
+#  检测参数扫描
+#  触发阈值、稳定阈值、连续静止帧数、最长轮询间隔以前只能在真实课堂上反复试。
+#  这里把一段录像只读一遍：按最短轮询间隔的时间网格取帧，一次算出每一帧与之前若干帧
+#  (覆盖最长轮询间隔加上比较基准最多被固定的时长) 的差异分数（按块成批地用 numpy 计算，不逐帧调用检测器）；
+#  之后每组参数只需在这张差异表上重放 MonitorSession 的轮询与等待静止逻辑（同一个 AdaptivePoller），
+#  不再读取录像，可以多进程并行评估整张参数网格，报告保存张数、检测延迟，
+#  有真值时还报告精确率/召回率，最优的一组可以直接写入 settings.json。
+#
+#  差异在缩略图上计算（与检测器粗比较相同的分块和噪声门限），不含自动屏蔽与自动阈值，
+#  分数与实时检测的全分辨率细比较略有出入，适合比较参数的相对好坏。
+# ---------------------------------------------------
+
+# 默认扫描网格，取值含义与 settings.json 中的同名设置相同
+DEFAULT_GRID = {
+    "threshold": (1.0, 2.0, 3.0, 5.0, 8.0),  # 触发阈值 (百分比)
+    "stable_threshold": (0.2, 0.5, 1.0),  # 稳定阈值 (百分比)
+    "required_stable_count": (1, 2, 3),
+    "max_poll_interval": (0.5, 1.0, 2.0),  # 秒
+}
+
+
+class DiffSeries:
+    """
+    一段录像的差异表：scores[i, g] 为第 i 帧与第 i-g 帧的差异分数（平均像素差 / 255），
+    changed[i, g] 为是否有块超过噪声门限；帧 i 的时间为 i * step，g 超出开头时为 NaN。
+    """
+    def __init__(self, step, scores, changed, shape):
+        self.step = step
+        self.scores = scores
+        self.changed = changed
+        self.shape = shape
+
+    def __len__(self):
+        return len(self.scores)
+
+    @property
+    def max_gap(self):
+        return self.scores.shape[1] - 1
+
+    @property
+    def duration(self):
+        return len(self) * self.step
+
+
+class _Diff:
+    """AdaptivePoller 需要的比较结果字段"""
+    __slots__ = ("score", "changed_count")
+
+    def __init__(self, score, changed):
+        self.score = score
+        self.changed_count = int(changed)
+
+
+def compute_series(recording_path, step=0.1, max_interval=2.0, fps=2.0, ignore_regions=None,
+                   sample_step=4, noise_level=24, block=32, progress=None, max_settle_time=4.0):
+    """
+    读取一遍录像，计算差异表。
+    :param step: 时间网格（秒），即模拟的最短轮询间隔。
+    :param max_interval: 需要覆盖的最长轮询间隔（秒），决定每帧要与之前多少帧比较。
+    :param fps: 图片序列的帧率（对视频文件无效）。
+    :param sample_step: 缩略图的采样间隔，越大越快，差异越粗略。
+    :param block: 每批计算的帧数。
+    :param progress: 进度回调 progress(已读秒数)。
+    :param max_settle_time: 最长等待静止时间（秒）；运动期间比较基准最多固定这么久，差异表也要覆盖。
+    """
+    source = open_replay_source(recording_path, fps=fps)
+    detector = TiledChangeDetector(sample_step=sample_step, noise_level=noise_level, ignore_regions=ignore_regions)
+    # 比较基准最远在 (最长轮询间隔 + 固定的时长 + 一次最短轮询) 之前
+    max_gap = max(1, int(math.ceil((max_interval + max_settle_time) / step - 1e-9)) + 1)
+    history, pending = [], []
+    scores, changed = [], []
+    shape = keep = ignored = None
+    denominator = 0.0
+
+    def flush():
+        stack = np.stack(history + pending)
+        count, base = len(pending), len(history)
+        block_scores = np.full((count, max_gap + 1), np.nan, np.float32)
+        block_changed = np.zeros((count, max_gap + 1), bool)
+        rows, cols = detector.rows, detector.cols
+        height, width = stack.shape[1:]
+        for gap in range(1, max_gap + 1):
+            first = max(0, gap - base)  # 这一批中最早有第 i-gap 帧的位置
+            if first >= count:
+                continue
+            current = stack[base + first:]
+            previous = stack[base + first - gap:base + count - gap]
+            diff = np.maximum(current, previous)
+            diff -= np.minimum(current, previous)
+            if keep is not None:
+                np.bitwise_and(diff, keep, out=diff)
+            tiles = diff.reshape(len(diff), rows, height // rows, cols, width // cols)
+            peak = tiles.max(axis=(2, 4))
+            block_scores[first:, gap] = diff.reshape(len(diff), -1).sum(axis=1, dtype=np.uint64) / denominator
+            block_changed[first:, gap] = ((peak > noise_level) & ~ignored).any(axis=(1, 2))
+        scores.append(block_scores)
+        changed.append(block_changed)
+        history[:] = list(stack[-max_gap:])
+        pending.clear()
+
+    try:
+        index = 0
+        while True:
+            bgr = source.read(index * step)
+            if bgr is None:
+                break
+            frame = detector.frame(bgr)
+            if shape is None:
+                shape = frame.shape
+                keep = detector.thumb_mask(shape)
+                thumb_h, thumb_w = frame.thumb.shape
+                tile_keep = np.ones((detector.rows, detector.cols)) if keep is None else \
+                    (keep > 0).reshape(detector.rows, thumb_h // detector.rows, detector.cols, thumb_w // detector.cols).mean(axis=(1, 3))
+                ignored = tile_keep == 0
+                denominator = float(thumb_h * thumb_w if keep is None else np.count_nonzero(keep)) * 255.0
+            elif frame.shape != shape:
+                frame.release()
+                raise ValueError(f"录像中途分辨率变化: {shape} -> {frame.shape}")
+            pending.append(frame.thumb.copy())
+            frame.release()
+            index += 1
+            if len(pending) == block:
+                flush()
+                if progress is not None:
+                    progress(index * step)
+        if pending:
+            flush()
+    finally:
+        source.close()
+    if shape is None:
+        raise ValueError(f"无法读取录像: {recording_path}")
+    return DiffSeries(step, np.concatenate(scores), np.concatenate(changed), shape)
+
+
+def simulate(series, threshold, stable_threshold, required_stable_count, max_poll_interval, max_settle_time=4.0):
+    """
+    在差异表上重放全自动模式的一次监控（与 MonitorSession 相同的轮询、比较基准、触发、等待静止逻辑）：
+    阈值以下的明显运动期间比较基准固定在运动开始前的一帧，等待静止时与静止计数开始的那一帧比较；
+    空闲画面的噪声高于稳定阈值时同样抬高稳定阈值（不超过触发阈值）。
+    :return: [(保存时间, 从翻页到保存的检测延迟), ...]
+    """
+    poller = AdaptivePoller(min_interval=series.step, max_interval=max_poll_interval,
+                            max_settle_time=max_settle_time, required_stable_count=required_stable_count)
+    trigger = threshold / 100.0
+    stable = manual_stable = stable_threshold / 100.0
+    calibrator = ThresholdCalibrator(warmup=1.0)
+    scores, changed = series.scores, series.changed
+
+    def diff(reference, index):
+        gap = min(series.max_gap, index - reference)
+        return _Diff(float(scores[index, gap]), changed[index, gap])
+
+    reference = last = 0  # 比较基准、上一次轮询的帧
+    motion = motion_start = None  # 运动中最近的一帧及运动开始时间
+    anchor = settling_start = None  # 等待静止时的比较帧及开始等待的时间
+    poller.record_poll(0.0)
+    delay = poller.interval
+    saves = []
+    while True:
+        index = last + min(series.max_gap, max(1, int(round(delay / series.step))))
+        if index >= len(series):
+            break
+        now = index * series.step
+        if settling_start is not None:
+            result = diff(anchor, index)
+            settled = poller.settled(result, stable)
+            timed_out = not settled and now - settling_start >= poller.max_settle_time
+            if settled or timed_out or poller.stable_count == 0:
+                anchor = index
+            if settled or timed_out:
+                settling_start = None
+                saves.append((now, poller.end_transition(now)))
+                reference = anchor
+                delay = poller.interval
+            else:
+                delay = poller.min_interval
+        else:
+            previous_poll = poller.last_poll
+            poller.record_poll(now)
+            result = diff(reference, index)
+            if result.score > trigger:
+                poller.begin_transition(previous_poll)
+                settling_start, anchor, motion = now, index, None
+                delay = poller.min_interval
+            else:
+                poller.observe(result, trigger)
+                moving = result.score >= trigger / 4
+                if motion is not None:
+                    moving = diff(motion, index).changed_count > 0 and now - motion_start < poller.max_settle_time
+                    motion = None
+                elif moving:
+                    motion_start = now
+                if moving:
+                    motion = index
+                else:
+                    reference = index
+                    if calibrator.observe(result.score, min(now - previous_poll, poller.max_interval)):
+                        stable = min(trigger, max(manual_stable, calibrator.stable))
+                delay = poller.interval
+        last = index
+    return saves
+
+
+def load_truth(path):
+    """
+    读取真值，返回应保存的各段 [(完全出现的时间, 结束时间), ...]。
+    支持 synthetic_deck 导出的 ground_truth.json（第一段为监控开始时的画面，不计入），
+    或每张新幻灯片出现的时间（秒）：JSON 列表，或每行一个数字的文本文件。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [float(line) for line in text.split() if line.strip()]
+    if isinstance(data, dict):
+        return [(s["visible"], s["end"]) for s in data["segments"][1:]]
+    times = sorted(float(t) for t in data)
+    return list(zip(times, times[1:] + [math.inf]))
+
+
+def score_saves(saves, truth):
+    """把保存时间与真值匹配：落在某段完全出现之后、下一段开始之前，且这一段尚未匹配的才算命中"""
+    visible = [v for v, _ in truth]
+    matched = set()
+    latencies = []
+    for t, _ in saves:
+        k = bisect.bisect_right(visible, t) - 1
+        if k >= 0 and k not in matched and t < truth[k][1]:
+            matched.add(k)
+            latencies.append(t - truth[k][0])
+    hits = len(matched)
+    precision = hits / len(saves) if saves else 1.0
+    recall = hits / len(truth) if truth else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1, latencies
+
+
+def expand_grid(grid=None):
+    """参数网格的全部组合 [{参数: 取值}, ...]；稳定阈值不低于触发阈值的组合没有意义，略过"""
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    keys = list(grid)
+    configs = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    return [c for c in configs if c["stable_threshold"] < c["threshold"]]
+
+
+_worker_state = None
+
+
+def _init_worker(series, truth):
+    global _worker_state
+    _worker_state = (series, truth)
+
+
+def _evaluate(config):
+    series, truth = _worker_state
+    saves = simulate(series, **config)
+    result = dict(config, saved=len(saves), precision=None, recall=None, f1=None)
+    if truth is not None:
+        result["precision"], result["recall"], result["f1"], latencies = score_saves(saves, truth)
+    else:
+        latencies = [latency for _, latency in saves if latency is not None]
+    result["latency_mean"] = sum(latencies) / len(latencies) if latencies else None
+    result["latency_max"] = max(latencies) if latencies else None
+    return result
+
+
+def rank(results, expected=None):
+    """
+    按优劣排序：有真值时 F1 高者优先；否则给定应保存张数时与之最接近者优先；同分时检测延迟短者优先。
+    两者都没有时无法判断优劣，按延迟排序。
+    """
+    def latency(r):
+        return r["latency_mean"] if r["latency_mean"] is not None else math.inf
+
+    if results and results[0]["f1"] is not None:
+        return sorted(results, key=lambda r: (-r["f1"], latency(r)))
+    if expected is not None:
+        return sorted(results, key=lambda r: (abs(r["saved"] - expected), latency(r)))
+    return sorted(results, key=latency)
+
+
+def sweep(series, configs, truth=None, workers=None, expected=None):
+    """
+    在差异表上评估每一组参数，返回按 rank 排序的结果列表。
+    :param workers: 进程数，默认 CPU 核数；为 1 或参数组很少时在当前进程中评估。
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers > 1 and len(configs) > workers:
+        # 差异表只在每个工作进程启动时传递一次
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(series, truth)) as executor:
+            results = list(executor.map(_evaluate, configs, chunksize=max(1, len(configs) // (workers * 4))))
+    else:
+        _init_worker(series, truth)
+        results = [_evaluate(config) for config in configs]
+    logging.info(f"参数扫描: {len(configs)} 组参数，{workers} 个进程，耗时 {time.perf_counter() - start:.1f} 秒。")
+    return rank(results, expected)
+
+
+def save_best(result):
+    """把一组参数写入 settings.json；扫描得到的是固定阈值，同时关闭自动阈值"""
+    from config import load_settings, save_settings
+    settings = dict(load_settings())
+    for key in DEFAULT_GRID:
+        settings[key] = result[key]
+    settings["auto_threshold"] = False
+    save_settings(settings)
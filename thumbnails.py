@@ -0,0 +1,513 @@
+import io
+import os
+import json
+import time
+import queue
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from PIL import Image
+import metrics
+import utils
+
+# ---------------------------------------------------
+#  缩略图缓存与概览图
+#  回看一次课的截图要逐张打开全分辨率 PNG，想显示预览的工具也都得把每张图重新解码一遍。
+#  截图目录下的 pptslicer_thumbs/ 按内容缓存每张截图的多级缩略图（宽 160 / 320 / 640 的 JPEG）：
+#  - 以文件内容的 SHA-1 为键，相同内容的截图共用一份；index.json 记下每个文件的 mtime 与哈希，
+#    mtime 未变时不必重新读取文件，变了（build 动画覆盖、手动编辑）才重新计算哈希；
+#  - 监控时写入器保存一张截图后，由后台线程直接从内存中的画面生成缩略图，不再解码；
+#  - 缓存总大小有上限，超出时先删除已没有文件引用的缩略图，再按最近使用时间淘汰；
+#  - 概览图（每页若干张缩略图排成网格）只读取缓存中的缩略图，缺失的缩略图和各页的拼合都在进程池中完成，
+#    几百张截图的目录重新生成预览只需几秒。
+#  缓存随时可以整个删除，下次使用时重新生成。
+# ---------------------------------------------------
+
+THUMBNAIL_DIRNAME = "pptslicer_thumbs"
+THUMBNAIL_SIZES = (160, 320, 640)  # 缩略图宽度，逐级缩小生成
+THUMBNAIL_QUALITY = 85
+INDEX_FILENAME = "index.json"
+
+
+def make_pyramid(bgr, sizes=THUMBNAIL_SIZES, quality=THUMBNAIL_QUALITY):
+    """
+    从一张 BGR 画面生成各级缩略图，返回 {宽度: JPEG 数据}。
+    从最大的一级开始，每一级都由上一级缩小得到；画面本身更窄时不放大。
+    """
+    levels = {}
+    image = bgr
+    for size in sorted(sizes, reverse=True):
+        height, width = image.shape[:2]
+        if width > size:
+            image = cv2.resize(image, (size, max(1, round(height * size / width))), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise IOError("缩略图编码失败")
+        levels[size] = buffer.tobytes()
+    return levels
+
+
+# JPEG 可以在解码时按 1/2、1/4、1/8 缩小 (只做部分 IDCT)，比解码全图再缩小快得多
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def _decode(data, max_width):
+    """解码图片文件内容为 BGR 数组，返回 (画面, (原图高, 原图宽))；只读文件头确定格式和尺寸"""
+    with Image.open(io.BytesIO(data)) as img:
+        image_format = img.format
+        width, height = img.size
+        flag = cv2.IMREAD_COLOR
+        if image_format == "JPEG":
+            flag = next((f for factor, f in _REDUCED_FLAGS if width // factor >= max_width), flag)
+        bgr = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+        if bgr is None:
+            # OpenCV 不支持的格式 (如 GIF) 交给 PIL
+            bgr = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+    return bgr, (height, width)
+
+
+def _write_atomic(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _build_from_file(image_path, cache_path, sizes, quality):
+    """
+    在工作进程中为一个图片文件生成缩略图并写入缓存目录。
+    :return: (sha1, 缩略图总字节数, (原图高, 原图宽))；无法打开时返回 None。
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        sha1 = hashlib.sha1(data).hexdigest()
+        bgr, shape = _decode(data, max(sizes))
+        total = 0
+        for size, jpeg in make_pyramid(bgr, sizes, quality).items():
+            _write_atomic(os.path.join(cache_path, f"{sha1}_{size}.jpg"), jpeg)
+            total += len(jpeg)
+        return sha1, total, shape
+    except Exception as e:
+        logging.warning(f"无法为 {image_path} 生成缩略图: {e}")
+        return None
+
+
+class ThumbnailCache:
+    """
+    截图目录的缩略图缓存。同一时刻只应有一个 ThumbnailCache 写同一个目录（索引以最后写回的为准，
+    丢失的记录只会让对应的缩略图在下次使用时重新生成）。
+    :param folder: 截图文件夹，缓存存放在其中的 pptslicer_thumbs/。
+    :param sizes: 各级缩略图的宽度。
+    :param max_mb: 缓存总大小上限 (MB)。
+    """
+    def __init__(self, folder, sizes=THUMBNAIL_SIZES, max_mb=64, quality=THUMBNAIL_QUALITY):
+        self.folder = folder
+        self.sizes = tuple(sorted(sizes))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.quality = quality
+        self.path = os.path.join(folder, THUMBNAIL_DIRNAME)
+        self.lock = threading.Lock()
+        self.files = {}  # 文件名 -> [mtime_ns, sha1]
+        self.entries = {}  # sha1 -> {"used": 最近使用时间, "bytes": 缩略图总字节数, "width": ..., "height": ...}
+        self.total_bytes = 0
+        self._dirty = False
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        index_path = os.path.join(self.path, INDEX_FILENAME)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.warning(f"缩略图索引损坏，重新建立: {e}")
+            return
+        if tuple(data.get("sizes", ())) != self.sizes:
+            return  # 缩略图尺寸变了，旧的缩略图由淘汰逻辑清理
+        self.files = data.get("files", {})
+        self.entries = data.get("entries", {})
+        self.total_bytes = sum(entry["bytes"] for entry in self.entries.values())
+
+    def save(self):
+        """把索引写回磁盘（临时文件 + 原子重命名）"""
+        with self.lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"sizes": self.sizes, "files": self.files, "entries": self.entries})
+            self._dirty = False
+        _write_atomic(os.path.join(self.path, INDEX_FILENAME), data.encode("utf-8"))
+
+    def thumbnail_path(self, sha1, size):
+        return os.path.join(self.path, f"{sha1}_{size}.jpg")
+
+    def level_for(self, width):
+        """不小于 width 的最小一级缩略图宽度（都不够大时取最大的一级）"""
+        return next((size for size in self.sizes if size >= width), self.sizes[-1])
+
+    def _mtime(self, filename):
+        return os.stat(os.path.join(self.folder, filename)).st_mtime_ns
+
+    def _hash_file(self, filename):
+        digest = hashlib.sha1()
+        with open(os.path.join(self.folder, filename), 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def lookup(self, filename):
+        """
+        已缓存时返回文件内容的 sha1（并更新使用时间），否则返回 None。
+        mtime 与索引一致时直接采用索引中的哈希；不一致时重新计算哈希，内容未变的仍可命中。
+        """
+        try:
+            mtime = self._mtime(filename)
+        except OSError:
+            return None
+        with self.lock:
+            known = self.files.get(filename)
+        if known is not None and known[0] == mtime:
+            sha1 = known[1]
+        else:
+            sha1 = self._hash_file(filename)
+        with self.lock:
+            entry = self.entries.get(sha1)
+            if entry is None or not os.path.exists(self.thumbnail_path(sha1, self.sizes[-1])):
+                return None
+            entry["used"] = time.time()
+            if known != [mtime, sha1]:
+                self.files[filename] = [mtime, sha1]
+            self._dirty = True
+        return sha1
+
+    def _register(self, filename, mtime, sha1, total, shape):
+        with self.lock:
+            self.files[filename] = [mtime, sha1]
+            previous = self.entries.get(sha1)
+            if previous is not None:
+                self.total_bytes -= previous["bytes"]
+            self.entries[sha1] = {"used": time.time(), "bytes": total, "width": shape[1], "height": shape[0]}
+            self.total_bytes += total
+            self._dirty = True
+
+    def add(self, filename, bgr, sha1=None):
+        """
+        用内存中的画面为刚写好的截图生成缩略图（不再读取和解码文件）。
+        :param sha1: 文件内容的哈希（写入器已经算好）；None 时读取文件计算。
+        :return: sha1。
+        """
+        mtime = self._mtime(filename)
+        sha1 = sha1 or self._hash_file(filename)
+        with self.lock:
+            entry = self.entries.get(sha1)
+        if entry is not None and os.path.exists(self.thumbnail_path(sha1, self.sizes[-1])):
+            with self.lock:
+                self.files[filename] = [mtime, sha1]
+                entry["used"] = time.time()
+                self._dirty = True
+            return sha1
+        with metrics.timer("thumbnail"):
+            levels = make_pyramid(bgr, self.sizes, self.quality)
+            for size, jpeg in levels.items():
+                _write_atomic(self.thumbnail_path(sha1, size), jpeg)
+        self._register(filename, mtime, sha1, sum(len(jpeg) for jpeg in levels.values()), bgr.shape)
+        self.evict()
+        return sha1
+
+    def get(self, filename, width):
+        """返回 filename 的缩略图路径（不小于 width 的一级），缓存中没有时当场生成；无法打开时返回 None"""
+        sha1 = self.lookup(filename) or self._build([filename])[0].get(filename)
+        return None if sha1 is None else self.thumbnail_path(sha1, self.level_for(width))
+
+    def build(self, filenames, workers=None, progress_callback=None):
+        """
+        确保一组截图都有缩略图：已缓存的只检查 mtime，缺失的在进程池中读取、解码并生成。
+        :param filenames: 相对于截图文件夹的文件名列表。
+        :param workers: 进程数，None 为 CPU 核数；缺失的很少时直接在当前进程处理。
+        :param progress_callback: progress_callback(已生成张数, 需要生成的张数)。
+        :return: {文件名: sha1}，无法打开的文件不在其中。
+        """
+        start = time.perf_counter()
+        keys, missing = {}, []
+        for filename in filenames:
+            sha1 = self.lookup(filename)
+            if sha1 is None:
+                missing.append(filename)
+            else:
+                keys[filename] = sha1
+        built, failed = self._build(missing, workers, progress_callback)
+        keys.update(built)
+        self.evict(protect=set(keys.values()))
+        self.save()
+        logging.info(f"缩略图: {len(filenames)} 张截图，命中缓存 {len(filenames) - len(missing)} 张，"
+                     f"新生成 {len(built)} 张，失败 {failed} 张，耗时 {time.perf_counter() - start:.1f} 秒。")
+        return keys
+
+    def _build(self, filenames, workers=None, progress_callback=None):
+        """为 filenames 生成缩略图，返回 ({文件名: sha1}, 失败张数)"""
+        workers = workers or os.cpu_count() or 1
+        total = len(filenames)
+        keys = {}
+        # 先取 mtime 再读文件：读取期间文件被覆盖时，记录的 mtime 较旧，下次会重新检查
+        mtimes = {}
+        for filename in filenames:
+            try:
+                mtimes[filename] = self._mtime(filename)
+            except OSError:
+                pass
+        filenames = [f for f in filenames if f in mtimes]
+        args = [(os.path.join(self.folder, f), self.path, self.sizes, self.quality) for f in filenames]
+        if workers > 1 and len(filenames) > workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_build_from_file, *zip(*args), chunksize=max(1, len(args) // (workers * 8)))
+                failed = self._collect(filenames, mtimes, results, keys, progress_callback, total)
+        else:
+            failed = self._collect(filenames, mtimes, (_build_from_file(*a) for a in args), keys, progress_callback, total)
+        return keys, failed + total - len(filenames)
+
+    def _collect(self, filenames, mtimes, results, keys, progress_callback, total):
+        failed = 0
+        for done, (filename, result) in enumerate(zip(filenames, results), 1):
+            if result is None:
+                failed += 1
+            else:
+                sha1, size, shape = result
+                self._register(filename, mtimes[filename], sha1, size, shape)
+                keys[filename] = sha1
+            if progress_callback:
+                progress_callback(done, total)
+        return failed
+
+    def evict(self, protect=()):
+        """
+        缓存超出上限时淘汰缩略图：先删除已没有文件引用的（被覆盖或删除的截图），
+        再按最近使用时间从旧到新删除；protect 中的不删除。
+        """
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            referenced = {sha1 for _, sha1 in self.files.values()}
+            candidates = sorted((sha1 for sha1 in self.entries if sha1 not in protect),
+                                key=lambda sha1: (sha1 in referenced, self.entries[sha1]["used"]))
+            removed = []
+            for sha1 in candidates:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.total_bytes -= self.entries.pop(sha1)["bytes"]
+                removed.append(sha1)
+            if removed:
+                gone = set(removed)
+                self.files = {name: key for name, key in self.files.items() if key[1] not in gone}
+                self._dirty = True
+        for sha1 in removed:
+            for size in self.sizes:
+                try:
+                    os.remove(self.thumbnail_path(sha1, size))
+                except OSError:
+                    pass
+        if removed:
+            logging.info(f"缩略图缓存超出上限，淘汰 {len(removed)} 张 (现 {self.total_bytes / 1e6:.1f} MB)。")
+
+    def shape_of(self, sha1):
+        """原图的 (高, 宽)"""
+        with self.lock:
+            entry = self.entries[sha1]
+            return entry["height"], entry["width"]
+
+
+class ThumbnailBuilder:
+    """
+    监控时在后台生成缩略图：写入器保存一张截图后提交内存中的画面，由单个后台线程生成并登记；
+    队列空闲时写回索引。
+    :param folder: 截图文件夹。
+    :param max_mb: 缓存总大小上限 (MB)。
+    """
+    def __init__(self, folder, max_mb=64, max_queue=16):
+        self.cache = ThumbnailCache(folder, max_mb=max_mb)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self._worker, daemon=True, name="Thumbnails")
+        self.thread.start()
+
+    def submit(self, filename, image, sha1=None):
+        """提交一张已写好的截图（BGR numpy 数组）；队列满时丢弃并返回 False（之后用到时会从文件重新生成）"""
+        try:
+            self.queue.put_nowait((filename, image, sha1))
+            return True
+        except queue.Full:
+            logging.warning(f"缩略图队列已满，跳过 {filename}。")
+            return False
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            filename, image, sha1 = item
+            try:
+                self.cache.add(filename, image, sha1)
+            except Exception as e:
+                logging.error(f"生成缩略图失败: {filename}: {e}")
+            if self.queue.empty():
+                self._save()
+        self._save()
+
+    def _save(self):
+        try:
+            self.cache.save()
+        except Exception as e:
+            logging.error(f"写回缩略图索引失败: {e}")
+
+    def close(self, timeout=None):
+        """等待排队的缩略图生成完毕并写回索引"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+
+# ---------------------------------------------------
+#  概览图 (Contact Sheet)
+# ---------------------------------------------------
+
+SHEET_BACKGROUND = 240
+SHEET_MARGIN = 16
+SHEET_GAP = 12
+SHEET_LABEL = 24  # 每张缩略图下方序号一行的高度
+
+
+def _render_sheet(entries, columns, cell_w, cell_h, quality):
+    """
+    在工作进程中拼合一页概览图：entries 为 [(缩略图路径, 序号), ...]，按行排列。
+    :return: JPEG 数据与尺寸 (宽, 高, 数据)。
+    """
+    rows = -(-len(entries) // columns)
+    width = SHEET_MARGIN * 2 + columns * cell_w + (columns - 1) * SHEET_GAP
+    height = SHEET_MARGIN * 2 + rows * (cell_h + SHEET_LABEL) + (rows - 1) * SHEET_GAP
+    page = np.full((height, width, 3), SHEET_BACKGROUND, np.uint8)
+    for i, (path, number) in enumerate(entries):
+        x = SHEET_MARGIN + (i % columns) * (cell_w + SHEET_GAP)
+        y = SHEET_MARGIN + (i // columns) * (cell_h + SHEET_LABEL + SHEET_GAP)
+        thumb = utils.read_image(path) if path is not None else None
+        if thumb is not None:
+            # 保持比例缩放到格子内并居中
+            h, w = thumb.shape[:2]
+            scale = min(cell_w / w, cell_h / h)
+            tw, th = max(1, round(w * scale)), max(1, round(h * scale))
+            if (tw, th) != (w, h):
+                thumb = cv2.resize(thumb, (tw, th), interpolation=cv2.INTER_AREA)
+            ox, oy = x + (cell_w - tw) // 2, y + (cell_h - th) // 2
+            page[oy:oy + th, ox:ox + tw] = thumb
+            cv2.rectangle(page, (ox - 1, oy - 1), (ox + tw, oy + th), (200, 200, 200), 1)
+        label = str(number)
+        (text_w, _), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.putText(page, label, (x + (cell_w - text_w) // 2, y + cell_h + SHEET_LABEL - 7),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (60, 60, 60), 1, cv2.LINE_AA)
+    ok, buffer = cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise IOError("概览图编码失败")
+    return width, height, buffer.tobytes()
+
+
+def _sheet_outputs(output_path, pages):
+    """图片输出时各页的文件路径：只有一页时就是 output_path，否则在扩展名前加页号"""
+    if pages == 1:
+        return [output_path]
+    stem, extension = os.path.splitext(output_path)
+    return [f"{stem}_{i:03d}{extension}" for i in range(1, pages + 1)]
+
+
+def export_contact_sheet(image_folder, output_path, columns=5, rows=6, thumb_width=320, workers=None,
+                         progress_callback=None, max_mb=64, quality=90):
+    """
+    把截图文件夹导出为概览图：每页 columns x rows 张缩略图，下方标注序号（截取顺序）。
+    :param output_path: .pdf 时每页一页 PDF；.jpg 时每页一张图片（多页时文件名后加页号）。
+    :param thumb_width: 每张缩略图的宽度（像素），从缓存中取不小于它的一级。
+    :param workers: 进程数，None 为 CPU 核数。
+    :param progress_callback: progress_callback(已完成数, 总数)，依次计入需要生成的缩略图和概览图页面。
+    :param max_mb: 缩略图缓存的大小上限 (MB)。
+    :return: 页数。
+    """
+    from pdf_export import folder_images, StreamingPdfWriter, _page_size
+    if columns < 1 or rows < 1 or thumb_width < 16:
+        raise ValueError("概览图的行数、列数或缩略图宽度无效")
+    is_pdf = output_path.lower().endswith(".pdf")
+    if not is_pdf and not output_path.lower().endswith((".jpg", ".jpeg")):
+        raise ValueError(f"概览图只能导出为 PDF 或 JPEG: {output_path}")
+    image_files = folder_images(image_folder)
+    if not image_files:
+        raise FileNotFoundError("在指定文件夹中未找到任何有效的图片文件。")
+    filenames = [os.path.relpath(path, image_folder) for path in image_files]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    cache = ThumbnailCache(image_folder, max_mb=max_mb)
+    per_page = columns * rows
+    page_count = -(-len(filenames) // per_page)
+    offset = [0]
+
+    def on_thumbnail(done, total):
+        offset[0] = total
+        if progress_callback:
+            progress_callback(done, total + page_count)
+
+    keys = cache.build(filenames, workers, on_thumbnail)
+    level = cache.level_for(thumb_width)
+    # 格子按多数截图的比例（中位数）确定，个别比例不同的缩略图在格子内居中
+    ratios = sorted(h / w for h, w in (cache.shape_of(sha1) for sha1 in keys.values())) or [9 / 16]
+    cell_w, cell_h = thumb_width, max(16, round(thumb_width * ratios[len(ratios) // 2]))
+    entries = [(cache.thumbnail_path(keys[f], level) if f in keys else None, i)
+               for i, f in enumerate(filenames, 1)]
+    pages = [entries[i:i + per_page] for i in range(0, len(entries), per_page)]
+
+    outputs = None if is_pdf else _sheet_outputs(output_path, len(pages))
+    temp_path = output_path + ".tmp"
+    writer = StreamingPdfWriter(temp_path) if is_pdf else None
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(pages) > 1 else None
+    try:
+        # 与 PDF 导出相同的有界预取：最多同时拼合 2 * workers 页
+        pending = deque()
+        jobs = iter(pages)
+
+        def submit_next():
+            page = next(jobs, None)
+            if page is None:
+                return False
+            args = (page, columns, cell_w, cell_h, quality)
+            pending.append(executor.submit(_render_sheet, *args) if executor is not None else _render_sheet(*args))
+            return True
+
+        for _ in range(max(2, 2 * workers)):
+            if not submit_next():
+                break
+        done = 0
+        while pending:
+            item = pending.popleft()
+            width, height, data = item.result() if executor is not None else item
+            if writer is not None:
+                page_w, page_h, _ = _page_size(width, height, None)
+                writer.add_page(width, height, "/DeviceRGB", "/DCTDecode", data, page_w, page_h)
+            else:
+                _write_atomic(outputs[done], data)
+            done += 1
+            if progress_callback:
+                progress_callback(offset[0] + done, offset[0] + page_count)
+            submit_next()
+        if writer is not None:
+            writer.close()
+            os.replace(temp_path, output_path)
+    except Exception:
+        if writer is not None:
+            writer.abort()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    metrics.observe("contact_sheet", time.perf_counter() - start)
+    logging.info(f"概览图: {len(filenames)} 张截图，{len(pages)} 页，耗时 {time.perf_counter() - start:.1f} 秒。")
+    return len(pages)
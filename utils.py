@@ -1,21 +1,32 @@
-import win32gui
-import win32con
 import numpy as np
 #  Pillow (PIL) 现在是核心功能的一部分
-from PIL import Image, ImageGrab
+from PIL import Image
 import cv2
-from plyer import notification
-import keyboard
 import threading
-import time
 import os
-import winsound
+import pdf_export
+import metrics
+from effects import EffectScheduler
+
+# Windows 专用模块：在 Linux 上回放录像时不可用，相关功能自动降级
+try:
+    import win32api
+    import win32gui
+    import win32con
+    import winsound
+except ImportError:
+    win32api = win32gui = win32con = winsound = None
+
+# plyer、keyboard、ImageGrab 只在真正用到时才导入：回放、导出等命令行任务不需要它们，
+# 且 keyboard 在导入时就会启动全局键盘钩子
 
 # ... (之前的所有函数: get_visible_windows, capture_window, show_notification_thread, play_sound_async, setup_hotkey, remove_hotkey 都保持不变) ...
 # 为了代码简洁，这里省略了未改动的旧代码，请将新函数添加到文件末尾即可。
 
 def get_visible_windows():
     windows = {}
+    if win32gui is None:
+        return windows
     def enum_windows_callback(hwnd, _):
         if win32gui.IsWindowVisible(hwnd) and win32gui.IsWindowEnabled(hwnd):
             title = win32gui.GetWindowText(hwnd)
@@ -24,100 +35,128 @@ def get_visible_windows():
     win32gui.EnumWindows(enum_windows_callback, None)
     return windows
 
-def capture_window(hwnd):
+def _grab_desktop_bgr():
+    """
+    直接取 Pillow 抓屏的原始数据（BGR、行 4 字节对齐、自底向上），返回 (偏移, 整个虚拟桌面的 numpy 视图)。
+    省去 Pillow 转 RGB 再由我们转回 BGR 的两次整图转换；Pillow 内部接口不可用时返回 None。
+    """
+    grab = getattr(Image.core, "grabscreen_win32", None)
+    if grab is None:
+        return None
+    try:
+        offset, size, data = grab(False, True, 0)
+    except TypeError:
+        offset, size, data = grab(False, True)  # 旧版 Pillow 没有 window 参数
+    width, height = size
+    stride = (width * 3 + 3) & -4
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(height, stride)[::-1, :width * 3]
+    return offset, rows.reshape(height, width, 3)
+
+def capture_window(hwnd, out=None):
+    """
+    截取窗口画面为 BGR numpy 数组。
+    :param out: 可选的预分配缓冲区，尺寸匹配时直接写入并返回它，避免每次新建数组。
+    """
+    rect = window_rect(hwnd)
+    return capture_rect(rect, out) if rect is not None else None
+
+def window_rect(hwnd):
+    """窗口在桌面上的矩形 (left, top, right, bottom)；窗口最小化或已关闭时返回 None"""
+    if win32gui is None:
+        return None
     try:
         if win32gui.IsIconic(hwnd): return None
-        rect = win32gui.GetWindowRect(hwnd)
-        img = ImageGrab.grab(bbox=rect, all_screens=True)
-        img_np = np.array(img)
-        frame = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-        return frame
+        return win32gui.GetWindowRect(hwnd)
     except Exception:
         return None
 
-def show_notification_thread(title, message):
-    def run():
-        notification.notify(title=title, message=message, app_name='PPTSlicer', timeout=4)
-    threading.Thread(target=run, daemon=True).start()
+def capture_rect(rect, out=None):
+    """截取桌面上的矩形区域 (left, top, right, bottom) 为 BGR numpy 数组，out 的用法同 capture_window"""
+    if win32gui is None:
+        return None
+    try:
+        left, top, right, bottom = rect
+        shape = (bottom - top, right - left, 3)
+        if out is None or out.shape != shape:
+            out = np.empty(shape, dtype=np.uint8)
 
-def play_sound_async(sound_path):
-    def run():
-        if os.path.exists(sound_path):
-            try:
-                winsound.PlaySound(sound_path, winsound.SND_FILENAME)
-            except Exception as e:
-                print(f"[-] 播放声音失败: {e}")
-        else:
-            print(f"[!] 声音文件未找到: {sound_path}")
-    threading.Thread(target=run, daemon=True).start()
-
-_current_hotkey = None
-def setup_hotkey(key, callback):
-    global _current_hotkey
+        with metrics.timer("capture"):
+            desktop = _grab_desktop_bgr()
+        if desktop is not None:
+            (x0, y0), pixels = desktop
+            region = pixels[max(0, top - y0):bottom - y0, max(0, left - x0):right - x0]
+            # 窗口部分移出桌面时区域会变小，交给 Pillow 处理（超出部分补黑）
+            if region.shape == shape:
+                with metrics.timer("convert"):
+                    np.copyto(out, region)
+                return out
+
+        from PIL import ImageGrab
+        with metrics.timer("capture"):
+            img = ImageGrab.grab(bbox=rect, all_screens=True)
+        with metrics.timer("convert"):
+            cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR, dst=out)
+        return out
+    except Exception:
+        return None
+
+def get_displays():
+    """枚举显示器，返回 {名称: (left, top, right, bottom)}"""
+    displays = {}
+    if win32api is None:
+        return displays
     try:
-        if _current_hotkey:
-            try: keyboard.remove_hotkey(_current_hotkey)
-            except KeyError: pass
-        keyboard.add_hotkey(key, callback)
-        _current_hotkey = key
-        print(f"[+] 快捷键 '{key}' 已注册。")
-        return True
+        for i, (_, _, rect) in enumerate(win32api.EnumDisplayMonitors()):
+            left, top, right, bottom = rect
+            displays[f"显示器 {i + 1} ({right - left}x{bottom - top})"] = tuple(rect)
     except Exception as e:
-        print(f"[-] 注册快捷键 '{key}' 失败: {e}")
-        return False
+        print(f"[-] 枚举显示器失败: {e}")
+    return displays
+
+def read_image(path, flags=cv2.IMREAD_COLOR):
+    """读取图片为 numpy 数组（np.fromfile + imdecode 以支持中文路径），失败返回 None"""
+    try:
+        return cv2.imdecode(np.fromfile(path, dtype=np.uint8), flags)
+    except Exception:
+        return None
+
+# 声音、通知、快捷键统一交给副作用调度器 (effects.py) 的后台线程，不再每次新开线程。
+# 这里的函数供不属于任何监控会话的调用方使用，共用一个按需创建的调度器；监控会话使用自己的调度器。
+_effects = None
+_effects_lock = threading.Lock()
+
+def default_effects():
+    global _effects
+    with _effects_lock:
+        if _effects is None:
+            _effects = EffectScheduler.platform_default()
+        return _effects
+
+def show_notification_thread(title, message):
+    default_effects().notify(title, message)
 
-def remove_hotkey():
-    global _current_hotkey
-    if _current_hotkey:
-        try: keyboard.remove_hotkey(_current_hotkey)
-        except KeyError: pass
-        finally: _current_hotkey = None
+def play_sound_async(sound_path):
+    default_effects().play_sound(sound_path)
+
+def setup_hotkey(key, callback, owner=None):
+    """注册快捷键（在调度线程中异步完成，失败时记录日志），回调在调度线程中执行"""
+    default_effects().register_hotkey(key, callback, owner)
+
+def remove_hotkey(owner=None):
+    default_effects().remove_hotkey(owner)
 
 # ---------------------------------------------------
 #  vvv 这是本次更新的核心 vvv
 # ---------------------------------------------------
-def export_images_to_pdf(image_folder, output_pdf_path):
+def export_images_to_pdf(image_folder, output_pdf_path, preset="original", progress_callback=None):
     """
-    将指定文件夹中的图片导出为单个PDF文件。
+    将指定文件夹中的图片导出为单个PDF文件（流式写入，内存占用与图片数量无关）。
     :param image_folder: 包含图片的文件夹路径。
     :param output_pdf_path: 输出的PDF文件完整路径。
+    :param preset: PDF 质量预设，见 pdf_export.PDF_PRESETS。
+    :param progress_callback: progress_callback(已完成页数, 总页数)，在调用线程中执行。
     """
-    valid_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
-    image_files = sorted([
-        os.path.join(image_folder, f) 
-        for f in os.listdir(image_folder) 
-        if f.lower().endswith(valid_extensions)
-    ])
-
-    if not image_files:
-        raise FileNotFoundError("在指定文件夹中未找到任何有效的图片文件。")
-
-    # 打开第一张图片以开始
-    try:
-        first_image = Image.open(image_files[0]).convert("RGB")
-    except Exception as e:
-        raise IOError(f"无法打开第一张图片: {image_files[0]}\n错误: {e}")
-
-    # 打开剩余的图片
-    other_images = []
-    for image_path in image_files[1:]:
-        try:
-            img = Image.open(image_path).convert("RGB")
-            other_images.append(img)
-        except Exception as e:
-            print(f"[警告] 跳过无法打开的图片: {image_path}, 错误: {e}")
-
-    # 保存为PDF
-    try:
-        first_image.save(
-            output_pdf_path,
-            "PDF",
-            resolution=100.0,
-            save_all=True,
-            append_images=other_images
-        )
-    except Exception as e:
-        raise IOError(f"保存PDF文件失败。\n错误: {e}")
+    return pdf_export.export_folder(image_folder, output_pdf_path, preset, progress_callback)
 # ---------------------------------------------------
 #  ^^^ 这是本次更新的核心 ^^^
 # ---------------------------------------------------
@@ -0,0 +1,214 @@
+import os
+import re
+import time
+import hashlib
+import queue
+import logging
+import threading
+import cv2
+import metrics
+
+# ---------------------------------------------------
+#  后台截图写入
+#  监控线程只负责把图片放进有界队列，编码和写盘交给少量后台线程，
+#  慢速磁盘/网络共享不会再拖住检测。队列满时先等待一小段时间（背压），
+#  仍然放不进去才丢弃，并把丢弃数量报告给调用方。
+#  同一个文件可以被再次提交（覆盖，如 build 动画的下一步）：还在排队时直接换掉排队的图片，
+#  只写一次；已在写入时，新的写入等前一次完成后才开始，磁盘上最终总是最后提交的内容。
+# ---------------------------------------------------
+
+# 支持的格式: 格式名 -> (扩展名, 编码参数生成函数, 默认质量)
+CODECS = {
+    "png": (".png", lambda q: [cv2.IMWRITE_PNG_COMPRESSION, q], 3),  # 压缩级别 0~9
+    "webp": (".webp", lambda q: [cv2.IMWRITE_WEBP_QUALITY, 101], None),  # 101 = 无损
+    "jpg": (".jpg", lambda q: [cv2.IMWRITE_JPEG_QUALITY, q], 95),  # 质量 0~100
+}
+
+_SEQUENCE_PATTERN = re.compile(r"_(\d{4,})\.\w+$")
+
+
+def sequence_of(filename):
+    """从截图文件名中取出序号，不是截图文件名时返回 None"""
+    match = _SEQUENCE_PATTERN.search(filename)
+    return int(match.group(1)) if match else None
+
+
+class _WriteJob:
+    """一次写入：图片、文件名、写完后的回调；started 之后图片不再被替换"""
+    def __init__(self, image, filename, on_saved, after=None):
+        self.image = image
+        self.filename = filename
+        self.callbacks = [on_saved] if on_saved else []
+        self.after = after  # 同一文件上一次写入的完成事件
+        self.started = False
+        self.done = threading.Event()
+
+
+class ImageWriter:
+    """
+    有界队列 + 线程池的图片写入器。
+    :param save_path: 保存文件夹。
+    :param image_format: "png" / "webp" (无损) / "jpg"。
+    :param quality: PNG 为压缩级别，JPEG 为质量；None 使用默认值。
+    :param workers: 后台写入线程数。
+    :param max_queue: 队列上限（张）。
+    :param block_timeout: 队列满时最多等待多少秒，超时则丢弃。
+    :param status_callback: 用于报告丢弃/失败的状态回调。
+    :param start_sequence: 已用到的最大序号（如从会话清单得到）；None 时扫描保存目录。
+    """
+    def __init__(self, save_path, image_format="png", quality=None, workers=2, max_queue=8,
+                 block_timeout=2.0, prefix="screenshot", status_callback=None, start_sequence=None):
+        if image_format not in CODECS:
+            raise ValueError(f"不支持的图片格式: {image_format}")
+        self.save_path = save_path
+        self.extension, make_params, default_quality = CODECS[image_format]
+        self.params = make_params(default_quality if quality is None else quality)
+        self.block_timeout = block_timeout
+        self.prefix = prefix
+        self.status_callback = status_callback or (lambda message: None)
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.sequence = self._last_sequence() if start_sequence is None else start_sequence
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.peak_depth = 0
+        self.merged = 0
+        self._jobs = {}  # 文件名 -> 尚未写完的最后一次写入
+
+        self.threads = [
+            threading.Thread(target=self._worker, daemon=True, name=f"ImageWriter-{i}")
+            for i in range(workers)
+        ]
+        for t in self.threads:
+            t.start()
+
+    def _last_sequence(self):
+        """从已有文件名中找出最大序号，在同一文件夹继续保存时序号不会重复"""
+        last = 0
+        for name in os.listdir(self.save_path):
+            sequence = sequence_of(name)
+            if name.startswith(self.prefix) and sequence is not None:
+                last = max(last, sequence)
+        return last
+
+    def _next_filename(self):
+        # 文件名在提交时分配，按文件名排序即为截取顺序（与写完的先后无关）
+        with self.lock:
+            self.sequence += 1
+            sequence = self.sequence
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        return f"{self.prefix}_{timestamp}_{sequence:04d}{self.extension}"
+
+    def submit(self, image, on_saved=None, filename=None):
+        """
+        提交一张图片（BGR numpy 数组）。
+        :param on_saved: 写入成功后在后台线程中调用 on_saved(filename, {"bytes": 文件大小, "sha1": 内容哈希})。
+        :param filename: 写入（覆盖）指定的文件，可以带子文件夹；None 时分配新的序号文件名。
+        :return: 文件名；被丢弃时返回 None。
+        """
+        if filename is None:
+            filename = self._next_filename()
+        with self.lock:
+            previous = self._jobs.get(filename)
+            if previous is not None and not previous.started:
+                # 上一次还在排队：换成新图片，两次提交的回调在写完后依次调用
+                previous.image = image
+                if on_saved:
+                    previous.callbacks.append(on_saved)
+                self.merged += 1
+                return filename
+            job = _WriteJob(image, filename, on_saved, previous.done if previous is not None else None)
+            self._jobs[filename] = job
+        try:
+            self.queue.put(job, timeout=self.block_timeout)
+        except queue.Full:
+            job.done.set()
+            with self.lock:
+                if self._jobs.get(filename) is job:
+                    del self._jobs[filename]
+                self.dropped += 1
+                dropped = self.dropped
+            metrics.count("screenshots_dropped")
+            logging.error(f"写入队列已满，丢弃截图 {filename} (累计丢弃 {dropped} 张)")
+            self.status_callback(f"状态：磁盘写入过慢，已丢弃 {dropped} 张截图！")
+            return None
+
+        depth = self.queue.qsize()
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+            if depth >= self.queue.maxsize // 2:
+                logging.warning(f"写入队列积压: {depth}/{self.queue.maxsize}")
+        return filename
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            with self.lock:
+                item.started = True
+            if item.after is not None:
+                item.after.wait()
+            filename = item.filename
+            try:
+                info = self._write(item.image, filename)
+                with self.lock:
+                    self.written += 1
+                metrics.count("screenshots_saved")
+                for on_saved in item.callbacks:
+                    on_saved(filename, info)
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                logging.error(f"保存失败: {filename}: {e}")
+                self.status_callback("状态：保存失败！")
+            finally:
+                item.done.set()
+                with self.lock:
+                    if self._jobs.get(filename) is item:
+                        del self._jobs[filename]
+                self.queue.task_done()
+
+    def _write(self, image, filename):
+        """编码后先写临时文件再原子重命名，中途失败不会留下残缺的图片"""
+        with metrics.timer("encode"):
+            is_success, buffer = cv2.imencode(self.extension, image, self.params)
+        if not is_success:
+            raise IOError("编码失败")
+        filepath = os.path.normpath(os.path.join(self.save_path, filename))
+        if os.path.dirname(filename):
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        temp_path = filepath + ".tmp"
+        try:
+            with metrics.timer("write"):
+                with open(temp_path, 'wb') as f:
+                    f.write(buffer)
+                os.replace(temp_path, filepath)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logging.info(f"保存成功: {filepath}")
+        return {"bytes": len(buffer), "sha1": hashlib.sha1(buffer).hexdigest()}
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queued": self.queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "peak_depth": self.peak_depth,
+                "merged": self.merged,
+            }
+
+    def close(self, timeout=None):
+        """等待队列中的图片写完后停止后台线程"""
+        for _ in self.threads:
+            self.queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self.threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))